@@ -13,6 +13,8 @@ import pandas as pd
 import random
 import math
 
+from wire_format import encode_array, decode_array, OCTET_STREAM
+
 # --- Helper Functions for Data Generation (moved from orchestrate_benchmark.py) ---
 
 def generate_float_matrix(rows, cols, min_val=0.0, max_val=255.0):
@@ -25,6 +27,17 @@ def generate_complex_string_matrix(rows, cols):
 
 # --- Helper Functions for API Interaction and Validation (moved from orchestrate_benchmark.py) ---
 
+def parse_server_timing(response):
+    """
+    Returns the `Server-Timing` phases of a response as {name: milliseconds}.
+    """
+    phases = {}
+    for entry in response.headers.get("server-timing", "").split(","):
+        name, _, params = entry.strip().partition(";")
+        if name and params.startswith("dur="):
+            phases[name] = float(params[len("dur="):])
+    return phases
+
 def validate_response_structure(response_json, expected_keys):
     """Validates if the response JSON has the expected top-level keys."""
     if not isinstance(response_json, dict):
@@ -88,6 +101,8 @@ VIDEOSTREAM_URL = "http://127.0.0.1:8003/frame"
 # JS_IDCT_URL = "http://127.0.0.1:3000/idct" # DISABLED: Persistent issues, not critical for core goal
 SCIPY_DCT_URL = "http://127.0.0.1:8001/dct"
 SCIPY_IDCT_URL = "http://127.0.0.1:8001/idct"
+SCIPY_DCT_BLOCKS_URL = "http://127.0.0.1:8001/dct_blocks"
+SCIPY_IDCT_BLOCKS_URL = "http://127.0.0.1:8001/idct_blocks"
 NUMPY_FFT_URL = "http://127.0.0.1:8002/fft2"
 NUMPY_IFFT_URL = "http://127.0.0.1:8002/ifft2"
 
@@ -153,9 +168,11 @@ def run_dct_benchmark():
 
                 print(f"[benchmark_dct] Benchmarking Resolution: {res_width}x{res_height}, Block Size: {block_size}")
                 
-                dct_times = {'scipy': [], 'numpy': []}
-                idct_times = {'scipy': [], 'numpy': []}
-                reconstruction_errors = {'scipy': [], 'numpy': []}
+                dct_times = {'scipy': [], 'numpy': [], 'scipy_batched': []}
+                idct_times = {'scipy': [], 'numpy': [], 'scipy_batched': []}
+                reconstruction_errors = {'scipy': [], 'numpy': [], 'scipy_batched': []}
+                # Server-side phase breakdown (decode/transform/encode) of the batched requests
+                server_phases = {'dct': [], 'idct': []}
 
                 for i in range(NUM_FRAMES_TO_PROCESS):
                     print(f"[benchmark_dct]   Processing frame {i+1}/{NUM_FRAMES_TO_PROCESS} for {res_width}x{res_height} with block size {block_size}")
@@ -174,7 +191,32 @@ def run_dct_benchmark():
                     # Iterate through blocks
                     num_blocks_x = res_width // block_size
                     num_blocks_y = res_height // block_size
-                    
+                    num_blocks = num_blocks_x * num_blocks_y
+
+                    # SciPy batched DCT/IDCT: the whole frame in one binary request per direction.
+                    # Times are divided by the block count so they stay comparable to the per-block calls.
+                    try:
+                        binary_headers = {"Content-Type": OCTET_STREAM}
+                        start_time = time.perf_counter()
+                        dct_response = requests.post(SCIPY_DCT_BLOCKS_URL, data=encode_array(gray_img, block_size=block_size), headers=binary_headers, timeout=30)
+                        if dct_response.headers.get("content-type") != OCTET_STREAM:
+                            raise RuntimeError(dct_response.json().get("error", "No result in response"))
+                        frame_coeffs, _ = decode_array(dct_response.content)
+                        dct_times['scipy_batched'].append((time.perf_counter() - start_time) / num_blocks)
+                        server_phases['dct'].append(parse_server_timing(dct_response))
+
+                        start_time = time.perf_counter()
+                        idct_response = requests.post(SCIPY_IDCT_BLOCKS_URL, data=encode_array(frame_coeffs, block_size=block_size), headers=binary_headers, timeout=30)
+                        if idct_response.headers.get("content-type") != OCTET_STREAM:
+                            raise RuntimeError(idct_response.json().get("error", "No result in response"))
+                        reconstructed_frame, _ = decode_array(idct_response.content)
+                        idct_times['scipy_batched'].append((time.perf_counter() - start_time) / num_blocks)
+                        server_phases['idct'].append(parse_server_timing(idct_response))
+
+                        reconstruction_errors['scipy_batched'].append(np.mean((gray_img - reconstructed_frame)**2))
+                    except Exception as e:
+                        print(f"[benchmark_dct] SciPy batched DCT/IDCT error: {e}", file=os.sys.stderr)
+
                     for y_block in range(num_blocks_y):
                         for x_block in range(num_blocks_x):
                             x = x_block * block_size
@@ -274,6 +316,13 @@ def run_dct_benchmark():
                             "avg_idct_time_ms": np.mean(idct_times[impl]) * 1000,
                             "avg_reconstruction_error": np.mean(reconstruction_errors[impl])
                         })
+                        if impl == 'scipy_batched':
+                            # Per-frame server time in each phase, to separate parse, compute and serialize cost
+                            for direction, samples in server_phases.items():
+                                phase_names = {name for sample in samples for name in sample}
+                                results[-1][f"server_{direction}_phases_ms"] = {
+                                    name: float(np.mean([sample.get(name, 0.0) for sample in samples])) for name in sorted(phase_names)
+                                }
     return results
 
 def visualize_results(results):
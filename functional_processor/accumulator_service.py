@@ -1,7 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response
 from flask_cors import CORS
 import numpy as np
 import logging
+import os
+import uuid
+
+from frame_codec import accepts_csv, read_frames, frames_response, wants_binary
+from difference_service import _block_grid
+from session_store import SessionStore, session_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
@@ -9,63 +15,270 @@ logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(m
 app = Flask(__name__)
 CORS(app)
 
-# In-memory store for the accumulated frame
-_accumulated_frame_data = None
+# Block size of the DCT service's blockwise mode (see dct_service.py); changes to the accumulated
+# frame are tracked per block of this size. 0 disables the tracking.
+DCT_BLOCK_SIZE = int(os.environ.get('DCT_BLOCK_SIZE', '0'))
 
-def _accumulate(current_data: str | None, new_part: str) -> str:
+class _DirtyBlocks:
     """
-    Pure function to accumulate frame data.
+    Tracks which blocks of the accumulated frame changed, so readers can fetch only those (see
+    /get_accumulated_blocks). Every update bumps `version`, and each block records the version
+    that last changed it: the blocks changed since a reader's version are those stamped later.
+    Unlike a single dirty bitmap, this serves any number of readers, each at its own version.
     """
-    try:
-        new_part_array = np.fromstring(new_part, sep=',')
-
-        if current_data:
-            current_data_array = np.fromstring(current_data, sep=',')
-            max_len = max(len(current_data_array), len(new_part_array))
-            current_data_array = np.pad(current_data_array, (0, max_len - len(current_data_array)), 'constant')
-            new_part_array = np.pad(new_part_array, (0, max_len - len(new_part_array)), 'constant')
-            accumulated_array = current_data_array + new_part_array
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self.version = 0
+        self.block_versions = None
+        # Versions before this one can only be answered with the whole frame
+        self.tracked_since = 0
+
+    def mark(self, frame: np.ndarray, changed: np.ndarray | None = None):
+        """
+        Records an update of `frame` that changed the blocks at the flat indices `changed`
+        (all of them when None).
+        """
+        self.version += 1
+        grid_shape = self._grid_shape(frame)
+        if grid_shape is None or changed is None or self.block_versions is None or self.block_versions.shape != grid_shape:
+            self.block_versions = np.full(grid_shape, self.version, dtype=np.int64) if grid_shape else None
+            self.tracked_since = self.version
         else:
-            accumulated_array = new_part_array
+            np.put(self.block_versions, changed, self.version)
+
+    def reset(self):
+        self.version += 1
+        self.block_versions = None
+        self.tracked_since = self.version
+
+    def changed_since(self, since: int | None) -> np.ndarray | None:
+        """
+        Flat indices of the blocks changed after version `since`, or None if only the whole
+        frame can answer (no blocks tracked, or `since` predates the tracking). Nothing has
+        changed at the current version, whether or not blocks are tracked.
+        """
+        if since is not None and since == self.version:
+            return np.zeros(0, dtype=np.uint32)
+        if self.block_versions is None or since is None or not self.tracked_since <= since <= self.version:
+            return None
+        return np.flatnonzero(self.block_versions > since).astype(np.uint32)
+
+    def _grid_shape(self, frame: np.ndarray) -> tuple[int, int] | None:
+        if not self.block_size or np.ndim(frame) not in (2, 3):
+            return None
+        height, width = np.shape(frame)[:2]
+        if height % self.block_size or width % self.block_size:
+            return None
+        return height // self.block_size, width // self.block_size
+
+    def changed_blocks(self, frame_part: np.ndarray) -> np.ndarray | None:
+        """
+        Flat indices of the blocks where a dense frame part is nonzero (None if it has no blocks).
+        """
+        if self._grid_shape(frame_part) is None:
+            return None
+        grid = _block_grid(np.asarray(frame_part), self.block_size)
+        return np.flatnonzero(np.any(grid.reshape(*grid.shape[:2], -1) != 0, axis=2))
+
+class _Accumulation:
+    """
+    The accumulated frame of one session (a resident float32 array, serialized only when
+    requested) and the tracking of its changed blocks.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.dirty_blocks = _DirtyBlocks(DCT_BLOCK_SIZE)
+        # Identifies this accumulation, so that versions handed out before a restart (or before
+        # the session was evicted and started over) never match the versions of the new one
+        self.state_id = uuid.uuid4().hex[:12]
+
+    def version_tag(self) -> str:
+        """
+        The current version of the accumulated frame, as an opaque token (also used as its ETag).
+        """
+        return f"{self.state_id}-{self.dirty_blocks.version}"
 
-        return ','.join(map(str, accumulated_array))
+    def parse_version_tag(self, tag: str | None) -> int | None:
+        state_id, _, version = (tag or '').rpartition('-')
+        return int(version) if state_id == self.state_id and version.isdigit() else None
+
+# Accumulated frames by session (the `session` query parameter), see session_store.py
+_sessions = SessionStore.from_env(_Accumulation)
+
+@accepts_csv("current_data", "new_part")
+def _accumulate(current_data: np.ndarray | None, new_part: np.ndarray) -> np.ndarray:
+    """
+    Accumulates `new_part` into `current_data` and returns the accumulated frame.
+    When `current_data` is a float32 array of the same shape it is updated in place and
+    returned; otherwise a new float32 array is allocated (zero-padding the shorter input).
+    """
+    try:
+        if current_data is None or not np.size(current_data):
+            # Copy: the new part may be a read-only view of a request body
+            return np.array(new_part, dtype=np.float32)
+
+        if (isinstance(current_data, np.ndarray) and current_data.dtype == np.float32
+                and current_data.flags.writeable and np.shape(current_data) == np.shape(new_part)):
+            return np.add(current_data, new_part, out=current_data, casting='unsafe')
+
+        if np.shape(current_data) == np.shape(new_part):
+            return np.add(current_data, new_part, dtype=np.float32)
+
+        current_data_array, new_part_array = np.ravel(current_data), np.ravel(new_part)
+        accumulated_array = np.zeros(max(current_data_array.size, new_part_array.size), dtype=np.float32)
+        accumulated_array[:current_data_array.size] = current_data_array
+        accumulated_array[:new_part_array.size] += new_part_array
+        return accumulated_array
     except Exception as e:
         logging.error(f"Error in _accumulate: {e}")
         raise
 
+def _accumulate_blocks(current_data: np.ndarray | None, block_indices: np.ndarray, block_data: np.ndarray,
+                       shape: tuple[int, ...], block_size: int) -> np.ndarray:
+    """
+    Adds block-sparse updates (see `difference_service._sparse_dct_difference`) to the blocks
+    of `current_data` they index, and returns the accumulated frame. Blocks that are not listed
+    are left untouched. Updates `current_data` in place when it is a writable float32 array of
+    the frame's shape; otherwise starts from a float32 copy (or from zeros).
+    """
+    try:
+        shape = tuple(shape)
+        if current_data is None or not np.size(current_data):
+            current_data = np.zeros(shape, dtype=np.float32)
+        elif np.shape(current_data) != shape:
+            raise ValueError(f"Sparse update for shape {shape} does not match the accumulated frame {np.shape(current_data)}")
+        elif not (isinstance(current_data, np.ndarray) and current_data.dtype == np.float32 and current_data.flags.writeable):
+            current_data = np.array(current_data, dtype=np.float32)
+
+        grid = _block_grid(current_data, block_size)
+        block_indices = np.asarray(block_indices, dtype=np.intp)
+        if block_indices.size and block_indices.max() >= grid.shape[0] * grid.shape[1]:
+            raise ValueError("Sparse update has block indices outside the frame")
+        if np.unique(block_indices).size != block_indices.size:
+            raise ValueError("Sparse update lists a block more than once")
+        rows, cols = np.divmod(block_indices, grid.shape[1])
+        # Each block appears at most once, so the fancy-indexed add writes every block through
+        grid[rows, cols] += np.asarray(block_data, dtype=np.float32).reshape(len(block_indices), *grid.shape[2:])
+        return current_data
+    except Exception as e:
+        logging.error(f"Error in _accumulate_blocks: {e}")
+        raise
+
 @app.route('/accumulate_frame', methods=['POST'])
 def accumulate_frame():
-    global _accumulated_frame_data
-    data = request.json
-    if not data or 'frame_part' not in data:
-        return jsonify({"error": "Invalid request: 'frame_part' is required."}), 400
+    try:
+        arrays, _ = read_frames(request, ('frame_part',))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    frame_part = data.get('frame_part')
-    
     try:
-        _accumulated_frame_data = _accumulate(_accumulated_frame_data, frame_part)
+        with _sessions.session(session_id(request)) as accumulation:
+            previous_shape = np.shape(accumulation.frame)
+            accumulation.frame = _accumulate(accumulation.frame, arrays['frame_part'])
+            dirty_blocks = accumulation.dirty_blocks
+            changed = dirty_blocks.changed_blocks(arrays['frame_part']) if np.shape(accumulation.frame) == previous_shape else None
+            dirty_blocks.mark(accumulation.frame, changed)
         logging.info(f"Accumulating frame part.")
         return jsonify({"status": "frame accumulated"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/accumulate_blocks', methods=['POST'])
+def accumulate_blocks():
+    """
+    Accumulates a block-sparse difference: 'block_indices' and 'block_data', with the frame
+    'shape' and 'block_size', as returned by the difference service's sparse mode.
+    """
+    try:
+        arrays, meta = read_frames(request, ('block_indices', 'block_data'))
+        if meta.get('shape') is None or not meta.get('block_size'):
+            raise ValueError("Invalid request: 'shape' and 'block_size' are required.")
+        shape = [int(size) for size in meta['shape']]
+        block_size = int(meta['block_size'])
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with _sessions.session(session_id(request)) as accumulation:
+            previous_shape = np.shape(accumulation.frame)
+            accumulation.frame = _accumulate_blocks(accumulation.frame, arrays['block_indices'], arrays['block_data'], shape, block_size)
+            dirty_blocks = accumulation.dirty_blocks
+            same_blocks = block_size == dirty_blocks.block_size and np.shape(accumulation.frame) == previous_shape
+            dirty_blocks.mark(accumulation.frame, arrays['block_indices'] if same_blocks else None)
+        logging.info(f"Accumulating {len(arrays['block_indices'])} changed blocks.")
+        return jsonify({"status": "frame accumulated"}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/get_accumulated_frame', methods=['GET'])
 def get_accumulated_frame():
-    if _accumulated_frame_data is not None:
-        return jsonify({"status": "success", "accumulated_frame": _accumulated_frame_data}), 200
-    else:
-        return jsonify({"error": "Accumulated frame not available"}), 404
+    """
+    Returns the accumulated frame with its 'version', which is also its ETag: a request with a
+    matching If-None-Match gets 304 Not Modified without the frame.
+    """
+    with _sessions.session(session_id(request), create=False) as accumulation:
+        if accumulation is None or accumulation.frame is None:
+            return jsonify({"error": "Accumulated frame not available"}), 404
+        version = accumulation.version_tag()
+        if request.if_none_match.contains(version):
+            return '', 304, {'ETag': f'"{version}"'}
+        response = make_response(frames_response({"accumulated_frame": accumulation.frame}, wants_binary(request), status="success", version=version))
+    response.set_etag(version)
+    return response
+
+@app.route('/get_accumulated_blocks', methods=['GET'])
+def get_accumulated_blocks():
+    """
+    Returns what changed in the accumulated frame since the 'version' given in the 'since' query
+    parameter: the changed blocks as 'block_indices' and 'block_data', with the frame 'shape' and
+    'block_size', or the whole 'accumulated_frame' when the change can't be given block-wise
+    (no 'since', untracked blocks, or a reset or restart since then). Both carry the current
+    'version'.
+    """
+    with _sessions.session(session_id(request), create=False) as accumulation:
+        if accumulation is None or accumulation.frame is None:
+            return jsonify({"error": "Accumulated frame not available"}), 404
+
+        frame, dirty_blocks = accumulation.frame, accumulation.dirty_blocks
+        changed = dirty_blocks.changed_since(accumulation.parse_version_tag(request.args.get('since')))
+        if changed is None:
+            return frames_response({"accumulated_frame": frame}, wants_binary(request), status="success", version=accumulation.version_tag())
+
+        if changed.size:
+            grid = _block_grid(frame, dirty_blocks.block_size)
+            rows, cols = np.divmod(changed.astype(np.intp), grid.shape[1])
+            block_data = grid[rows, cols]
+        else:
+            # Also the answer for untracked blocks, which have no grid to index
+            block_data = np.zeros(0, dtype=np.float32)
+        return frames_response(
+            {"block_indices": changed, "block_data": block_data}, wants_binary(request), status="success",
+            version=accumulation.version_tag(), shape=list(frame.shape), block_size=dirty_blocks.block_size,
+        )
 
 @app.route('/reset_accumulator', methods=['POST'])
 def reset_accumulator():
     """
-    Resets the accumulator to its initial state.
+    Resets the session's accumulator to its initial state.
     """
-    global _accumulated_frame_data
-    _accumulated_frame_data = None
+    with _sessions.session(session_id(request), create=False) as accumulation:
+        if accumulation is not None:
+            accumulation.frame = None
+            accumulation.dirty_blocks.reset()
     logging.info("Accumulator reset.")
     return jsonify({"status": "accumulator reset"}), 200
 
+@app.route('/session_metrics', methods=['GET'])
+def session_metrics():
+    """
+    Returns the session store's counters (sessions held, created and evicted).
+    """
+    return jsonify(_sessions.metrics()), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5005)
 
@@ -0,0 +1,285 @@
+"""
+Asyncio counterpart of `orchestration_service.py`, with the same routes.
+
+Frames are handled concurrently on one event loop: up to `PIPELINE_WINDOW` frames are in flight
+at once, still accumulated in the order they arrived, and independent calls within a frame (the
+forward DCT and the reference frame fetch) are issued at the same time. Calls to each downstream
+service are bounded by a per-service semaphore (`SERVICE_CONCURRENCY`), so many frames in flight
+cannot overload one service.
+The pipeline steps are the Flask service's own (frame_processor.py, reference_manager.py and
+output_retriever.py), run here by an asyncio driver (see service_calls.py).
+
+Run with `uvicorn async_orchestration_service:app --port 5006` in place of the Flask service.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from frame_codec import parse_frames, reshape_frame, parse_frame_batch, OCTET_STREAM
+from frame_pipeline import AsyncFramePipeline
+from fused_pipeline import FusedPipeline
+import frame_processor
+import output_retriever
+import reference_manager
+from output_retriever import frame_response, JPEG
+from service_calls import Compute
+from session_store import DEFAULT_SESSION
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+DCT_SERVICE_URL = "http://localhost:5002"
+REFERENCE_FRAME_SERVICE_URL = "http://localhost:5003"
+DIFFERENCE_SERVICE_URL = "http://localhost:5004"
+ACCUMULATOR_SERVICE_URL = "http://localhost:5005"
+
+# Requests in flight to any single downstream service
+SERVICE_CONCURRENCY = int(os.environ.get("SERVICE_CONCURRENCY", "4"))
+# "services" or "fused", as in orchestration_service.py
+PIPELINE_ENGINE = os.environ.get('PIPELINE_ENGINE', 'services')
+if PIPELINE_ENGINE not in ('services', 'fused'):
+    raise ValueError(f"Unknown PIPELINE_ENGINE: {PIPELINE_ENGINE!r} (expected 'services' or 'fused')")
+# Frames in flight through the services at once. As in the Flask service's streaming mode, they
+# reach the accumulator in the order they arrived (see frame_pipeline.py). More frames than the
+# per-service limit would only queue at the services, so that is the default.
+PIPELINE_WINDOW = int(os.environ.get('PIPELINE_WINDOW', str(SERVICE_CONCURRENCY)))
+
+class ServiceClient:
+    """
+    Shared `httpx.AsyncClient` (keep-alive connection pool) plus one semaphore per downstream
+    service, bounding the calls in flight to it.
+    """
+
+    def __init__(self, concurrency: int = SERVICE_CONCURRENCY, **client_kwargs):
+        client_kwargs.setdefault("timeout", httpx.Timeout(30.0, connect=2.0))
+        client_kwargs.setdefault("limits", httpx.Limits(max_keepalive_connections=concurrency * 4))
+        self.client = httpx.AsyncClient(**client_kwargs)
+        self.concurrency = concurrency
+        self.semaphores = {}
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        service = urlsplit(url).netloc
+        semaphore = self.semaphores.get(service)
+        if semaphore is None:
+            semaphore = self.semaphores[service] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self._semaphore(url):
+            return await self.client.request(method, url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+# Created on startup unless one was provided (e.g. with a mock transport)
+service_client = None
+frame_pipeline = None
+fused_pipeline = FusedPipeline() if PIPELINE_ENGINE == 'fused' else None
+
+async def _transform_frame(frame_id: str, image_data: np.ndarray, session: str | None):
+    return await run_steps(frame_processor.transform_frame_steps(frame_id, image_data, session))
+
+async def _accumulate_frame(update, session: str | None):
+    await run_steps(frame_processor.accumulate_frame_steps(update, session))
+
+def new_frame_pipeline(window: int = PIPELINE_WINDOW) -> AsyncFramePipeline:
+    """
+    A frame pipeline through the services; create it on the event loop that serves the app.
+    """
+    return AsyncFramePipeline(window, _transform_frame, _accumulate_frame)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global service_client, frame_pipeline
+    owned = service_client is None
+    if owned:
+        service_client = ServiceClient()
+    if frame_pipeline is None:
+        frame_pipeline = new_frame_pipeline()
+    try:
+        yield
+    finally:
+        if owned:
+            await service_client.aclose()
+            service_client = None
+
+app = FastAPI(lifespan=lifespan)
+
+async def _make(call):
+    if isinstance(call, Compute):
+        # CPU-bound (inverse DCT, JPEG encoding); keep it off the event loop
+        return await asyncio.to_thread(call.function, *call.args)
+    method = "GET" if call.body is None else "POST"
+    return call.result(await service_client.request(method, call.url, content=call.body, headers=call.headers))
+
+async def run_steps(steps):
+    """
+    Async version of `service_calls.run`: runs pipeline steps with the shared client, making
+    independent calls at the same time (such as a frame's forward DCT and reference frame fetch).
+    """
+    try:
+        call = next(steps)
+        while True:
+            if isinstance(call, tuple):
+                result = tuple(await asyncio.gather(*map(_make, call)))
+            else:
+                result = await _make(call)
+            call = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+async def get_processed_frame_logic(session: str | None = None):
+    """
+    Async version of `output_retriever.get_processed_frame_logic`, sharing its cache.
+    """
+    if output_retriever.OUTPUT_IDCT == 'incremental':
+        # The cached frames are shared with the synchronous retriever, which patches them under
+        # their session's lock
+        return await asyncio.to_thread(output_retriever.get_processed_frame_logic, session)
+
+    # The session's lock is only held to read or replace its cache entry, never across an await
+    with output_retriever._encoded_frames.session(session or DEFAULT_SESSION) as encoded:
+        last = output_retriever._EncodedFrame(encoded.version, encoded.result)
+    version = last.version
+    result = await run_steps(output_retriever.processed_frame_steps(last, session))
+    if last.version != version:
+        with output_retriever._encoded_frames.session(session or DEFAULT_SESSION) as encoded:
+            encoded.version, encoded.result = last.version, last.result
+    return result
+
+async def _run_fused(method, *args):
+    # The fused pipeline locks its own state, so its calls can share the thread pool
+    return await asyncio.to_thread(method, *args)
+
+async def _handle(operation):
+    """
+    Maps pipeline errors to the responses the Flask orchestration service gives.
+    """
+    try:
+        result = await operation
+        return result if isinstance(result, Response) else JSONResponse(result, status_code=200)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except httpx.HTTPError as e:
+        return JSONResponse({"error": f"Service communication error: {e}"}, status_code=500)
+
+def _session(request: Request) -> str | None:
+    """
+    Async version of `orchestration_service._session`.
+    """
+    session = request.query_params.get('session')
+    if session and fused_pipeline is not None:
+        raise ValueError("Sessions need PIPELINE_ENGINE=services; the fused engine serves a single stream.")
+    return session
+
+async def _read_image(request: Request) -> tuple[np.ndarray, dict]:
+    arrays, meta = parse_frames(request.headers.get("content-type"), await request.body(), ('image_data',))
+    return reshape_frame(arrays['image_data'], meta.get('shape')), meta
+
+@app.post('/process_frame')
+async def process_frame(request: Request):
+    async def operation():
+        session = _session(request)
+        image_data, meta = await _read_image(request)
+        if fused_pipeline is not None:
+            return await _run_fused(fused_pipeline.process_frame, meta.get('frame_id'), image_data)
+        return await frame_pipeline.process_frame(meta.get('frame_id'), image_data, session)
+    return await _handle(operation())
+
+@app.post('/process_frames')
+async def process_frames(request: Request):
+    """
+    Processes a batch of frames (see `frame_codec.parse_frame_batch`). As with separate
+    /process_frame calls, up to PIPELINE_WINDOW frames are in flight together, and they are
+    accumulated in batch order.
+    """
+    async def operation():
+        session = _session(request)
+        frames = parse_frame_batch(request.headers.get("content-type"), await request.body())
+        if fused_pipeline is not None:
+            results = await asyncio.gather(*(_run_fused(fused_pipeline.process_frame, frame_id, image_data) for frame_id, image_data in frames))
+        else:
+            results = await frame_pipeline.process_frames(frames, session)
+        return {"status": "frames processed", "frame_ids": [result['frame_id'] for result in results]}
+    return await _handle(operation())
+
+@app.get('/get_processed_frame')
+async def get_processed_frame(request: Request):
+    async def operation():
+        session = _session(request)
+        if fused_pipeline is not None:
+            result = await _run_fused(fused_pipeline.get_processed_frame)
+        else:
+            result = await get_processed_frame_logic(session)
+        return _frame_response(request, result)
+    return await _handle(operation())
+
+def _frame_response(request: Request, result: dict) -> Response:
+    status, body, headers = frame_response(result, request.headers.get('accept'), request.headers.get('if-none-match'))
+    if isinstance(body, dict):
+        return JSONResponse(body, headers=headers)
+    return Response(body, status_code=status, media_type=JPEG if body is not None else None, headers=headers)
+
+@app.post('/set_reference')
+async def set_reference(request: Request):
+    async def operation():
+        session = _session(request)
+        image_data, _ = await _read_image(request)
+        if fused_pipeline is not None:
+            return await _run_fused(fused_pipeline.set_reference, image_data)
+        return await run_steps(reference_manager.set_reference_steps(image_data, session))
+    return await _handle(operation())
+
+@app.post('/reset_accumulator')
+async def reset_accumulator(request: Request):
+    try:
+        _session(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if fused_pipeline is not None:
+        return await _run_fused(fused_pipeline.reset)
+    # The session, like any query parameter, is passed on with the request
+    return await _proxy_request(ACCUMULATOR_SERVICE_URL, 'reset_accumulator', request.url.query, 'POST', {}, None)
+
+# Inter-service router, as in orchestration_service.py: lets the visualizer reach the
+# functional services through this single origin.
+_PROXIED_SERVICES = {
+    'dct_service': DCT_SERVICE_URL,
+    'reference_frame_service': REFERENCE_FRAME_SERVICE_URL,
+    'difference_service': DIFFERENCE_SERVICE_URL,
+    'accumulator_service': ACCUMULATOR_SERVICE_URL,
+}
+
+@app.api_route('/{service}/{subpath:path}', methods=['GET', 'POST'])
+async def proxy_service(service: str, subpath: str, request: Request):
+    if service not in _PROXIED_SERVICES:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    headers = {key: value for key, value in request.headers.items() if key.lower() not in ['content-length', 'host']}
+    data = await request.body() if request.method == 'POST' else None
+    return await _proxy_request(_PROXIED_SERVICES[service], subpath, request.url.query, request.method, headers, data)
+
+async def _proxy_request(base_url: str, subpath: str, query: str, method: str, headers: dict, data: bytes | None):
+    url = f"{base_url}/{subpath}?{query}" if query else f"{base_url}/{subpath}"
+    try:
+        resp = await service_client.request(method, url, headers=headers, content=data)
+        # Versioned responses keep their ETag, so clients can make conditional requests through here
+        etag = {'ETag': resp.headers['ETag']} if 'ETag' in resp.headers else {}
+        if resp.status_code == 304:
+            # Not Modified has no body to convert
+            return Response(status_code=304, headers=etag)
+        if resp.headers.get('Content-Type', '').startswith(OCTET_STREAM):
+            # Binary frame messages are passed through untouched
+            return Response(resp.content, status_code=resp.status_code, media_type=OCTET_STREAM, headers=etag)
+        return JSONResponse(resp.json(), status_code=resp.status_code, headers=etag)
+    except httpx.HTTPError as e:
+        return JSONResponse({"error": f"Proxy communication error with {base_url}: {e}"}, status_code=500)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5006)
@@ -3,6 +3,9 @@ from flask_cors import CORS
 import numpy as np
 from scipy.fftpack import dct, idct
 import logging
+import os
+
+from frame_codec import accepts_csv, read_frames, frames_response, wants_binary
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
@@ -10,57 +13,114 @@ logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(m
 app = Flask(__name__)
 CORS(app)
 
-def _perform_forward_dct(image_data: str, frame_id: str) -> str:
+# Default edge length of the square blocks of the 2D blockwise DCT (8, as in JPEG, the
+# benchmark and the JS worker). 0 transforms the whole frame as one flattened 1D signal.
+# Requests can override it with a 'block_size' field; forward and inverse must agree.
+DCT_BLOCK_SIZE = int(os.environ.get('DCT_BLOCK_SIZE', '0'))
+
+def _block_dct(array: np.ndarray, block_size: int, transform) -> np.ndarray:
+    """
+    Applies `transform` (`dct` or `idct`) to every block_size x block_size block of an (H, W) or
+    (H, W, C) frame at once, as a separable 2D transform, and returns a frame of the same shape.
+    """
+    if array.ndim not in (2, 3):
+        raise ValueError(f"Blockwise DCT needs an (H, W) or (H, W, C) frame, got shape {array.shape}; send a shaped frame or 'shape'")
+    height, width = array.shape[:2]
+    if height % block_size or width % block_size:
+        raise ValueError(f"Frame shape {array.shape} is not divisible by block size {block_size}")
+
+    # (ny, bs, nx, bs, ...) view: axes 1 and 3 run within a block, so each 1D pass covers
+    # every block (and channel) in one vectorized call
+    blocks = array.reshape(height // block_size, block_size, width // block_size, block_size, *array.shape[2:])
+    return transform(transform(blocks, axis=1, norm='ortho'), axis=3, norm='ortho').reshape(array.shape)
+
+def _inverse_dct_blocks(block_data: np.ndarray) -> np.ndarray:
+    """
+    Inverts a (k, block_size, block_size[, C]) stack of blockwise DCT blocks, each as a 2D IDCT.
+    """
+    return idct(idct(np.asarray(block_data, dtype=float), axis=1, norm='ortho'), axis=2, norm='ortho')
+
+def _transform(data, block_size: int | None, shape, transform) -> np.ndarray:
+    array = np.asarray(data, dtype=float)
+    if shape is not None:
+        array = array.reshape(shape)
+    if block_size is None:
+        block_size = DCT_BLOCK_SIZE
+    if block_size < 0:
+        raise ValueError(f"Block size must not be negative, got {block_size}")
+    if block_size == 0:
+        return transform(array.reshape(-1), norm='ortho').reshape(array.shape)
+    return _block_dct(array, block_size, transform)
+
+@accepts_csv("image_data")
+def _perform_forward_dct(image_data: np.ndarray, frame_id: str, block_size: int | None = None, shape: tuple[int, ...] | None = None) -> np.ndarray:
     """
     Pure function to perform a forward Discrete Cosine Transform (DCT).
+    With a block size, each block of the frame gets its own 2D DCT; with 0, the frame is
+    transformed as one flattened 1D signal. `shape` restores the frame shape of flat input.
+    The result keeps the (restored) input shape.
     """
     try:
-        # Convert the input string to a numpy array
-        image_array = np.fromstring(image_data, sep=',')
-        
         # Perform the DCT with orthogonal normalization
-        dct_data = dct(image_array, norm='ortho')
-        
-        # Convert the numpy array to a string for JSON serialization
-        return ','.join(map(str, dct_data))
+        return _transform(image_data, block_size, shape, dct)
     except Exception as e:
         logging.error(f"Error in _perform_forward_dct for frame {frame_id}: {e}")
         raise
 
-def _perform_inverse_dct(dct_data: str, frame_id: str) -> str:
+@accepts_csv("dct_data")
+def _perform_inverse_dct(dct_data: np.ndarray, frame_id: str, block_size: int | None = None, shape: tuple[int, ...] | None = None) -> np.ndarray:
     """
-    Pure function to perform an inverse Discrete Cosine Transform (IDCT).
+    Pure function to perform an inverse Discrete Cosine Transform (IDCT), blockwise or whole-frame
+    as for `_perform_forward_dct`.
     """
     try:
-        # Convert the input string to a numpy array
-        dct_array = np.fromstring(dct_data, sep=',')
-        
         # Perform the IDCT with orthogonal normalization
-        image_data = idct(dct_array, norm='ortho')
-        
-        # Convert the numpy array to a string for JSON serialization
-        return ','.join(map(str, image_data))
+        return _transform(dct_data, block_size, shape, idct)
     except Exception as e:
         logging.error(f"Error in _perform_inverse_dct for frame {frame_id}: {e}")
         raise
 
+def _block_meta(params: dict) -> dict:
+    # Blockwise results say which block size produced them, so they can be inverted with it
+    block_size = params.get('block_size', DCT_BLOCK_SIZE)
+    return {'block_size': block_size} if block_size else {}
+
+def _transform_params(meta: dict) -> dict:
+    """
+    Reads the optional 'block_size' and 'shape' fields of a request.
+    """
+    params = {}
+    if meta.get('block_size') is not None:
+        params['block_size'] = int(meta['block_size'])
+    if meta.get('shape') is not None:
+        params['shape'] = tuple(int(size) for size in meta['shape'])
+    return params
+
 @app.route('/forward_dct', methods=['POST'])
 def forward_dct():
     """
     Performs a forward Discrete Cosine Transform (DCT) on input image data.
-    Expects 'frame_id' and 'image_data' in the request body.
+    Expects 'frame_id' and 'image_data' in the request body, either as JSON (comma-separated
+    'image_data') or as a binary frame message (see frame_codec.py).
+    Optional 'block_size' selects the 2D blockwise DCT (0 for the whole-frame 1D DCT), and
+    optional 'shape' gives the frame shape of flat (e.g. comma-separated) 'image_data'.
     """
-    data = request.json
-    if not data or 'frame_id' not in data or 'image_data' not in data:
-        return jsonify({"error": "Invalid request: 'frame_id' and 'image_data' are required."}), 400
+    try:
+        arrays, meta = read_frames(request, ('image_data',))
+        if 'frame_id' not in meta:
+            raise ValueError("Invalid request: 'frame_id' is required.")
+        params = _transform_params(meta)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
 
-    frame_id = data.get('frame_id')
-    image_data = data.get('image_data')
+    frame_id = meta['frame_id']
 
     try:
-        dct_data = _perform_forward_dct(image_data, frame_id)
+        dct_data = _perform_forward_dct(arrays['image_data'], frame_id, **params)
         logging.info(f"Performing forward DCT for frame: {frame_id}")
-        return jsonify({"status": "forward DCT complete", "frame_id": frame_id, "dct_data": dct_data}), 200
+        return frames_response({"dct_data": dct_data}, wants_binary(request), status="forward DCT complete", frame_id=frame_id, **_block_meta(params))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -68,19 +128,25 @@ def forward_dct():
 def inverse_dct():
     """
     Performs an inverse Discrete Cosine Transform (IDCT) on input DCT data.
-    Expects 'frame_id' and 'dct_data' in the request body.
+    Expects 'frame_id' and 'dct_data' in the request body, as JSON or as a binary frame message.
+    Takes the same optional 'block_size' and 'shape' as /forward_dct.
     """
-    data = request.json
-    if not data or 'frame_id' not in data or 'dct_data' not in data:
-        return jsonify({"error": "Invalid request: 'frame_id' and 'dct_data' are required."}), 400
+    try:
+        arrays, meta = read_frames(request, ('dct_data',))
+        if 'frame_id' not in meta:
+            raise ValueError("Invalid request: 'frame_id' is required.")
+        params = _transform_params(meta)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
 
-    frame_id = data.get('frame_id')
-    dct_data = data.get('dct_data')
+    frame_id = meta['frame_id']
 
     try:
-        image_data = _perform_inverse_dct(dct_data, frame_id)
+        image_data = _perform_inverse_dct(arrays['dct_data'], frame_id, **params)
         logging.info(f"Performing inverse DCT for frame: {frame_id}")
-        return jsonify({"status": "inverse DCT complete", "frame_id": frame_id, "image_data": image_data}), 200
+        return frames_response({"image_data": image_data}, wants_binary(request), status="inverse DCT complete", frame_id=frame_id, **_block_meta(params))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
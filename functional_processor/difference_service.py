@@ -3,45 +3,100 @@ from flask_cors import CORS
 import numpy as np
 import logging
 
+from frame_codec import accepts_csv, read_frames, frames_response, wants_binary
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 
 app = Flask(__name__)
 CORS(app)
 
-def _calculate_dct_difference(dct1: str, dct2: str) -> str:
+@accepts_csv("dct1", "dct2")
+def _calculate_dct_difference(dct1: np.ndarray, dct2: np.ndarray) -> np.ndarray:
     """
     Pure function to calculate the difference between two DCTs.
     """
     try:
-        dct1_array = np.fromstring(dct1, sep=',')
-        dct2_array = np.fromstring(dct2, sep=',')
-        
+        dct1_array = np.asarray(dct1, dtype=float)
+        dct2_array = np.asarray(dct2, dtype=float)
+
         # Ensure arrays have the same shape before subtraction
         if dct1_array.shape != dct2_array.shape:
+            dct1_array, dct2_array = dct1_array.reshape(-1), dct2_array.reshape(-1)
             max_len = max(len(dct1_array), len(dct2_array))
             dct1_array = np.pad(dct1_array, (0, max_len - len(dct1_array)), 'constant')
             dct2_array = np.pad(dct2_array, (0, max_len - len(dct2_array)), 'constant')
 
-        difference_array = dct1_array - dct2_array
-        return ','.join(map(str, difference_array))
+        return dct1_array - dct2_array
     except Exception as e:
         logging.error(f"Error in _calculate_dct_difference: {e}")
         raise
 
+def _block_grid(frame: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    Views an (H, W) or (H, W, C) frame as an (ny, nx, block_size, block_size[, C]) block grid,
+    without copying. Writes to the grid write through to the frame.
+    """
+    if block_size <= 0:
+        raise ValueError(f"Block size must be positive, got {block_size}")
+    if frame.ndim not in (2, 3):
+        raise ValueError(f"Block-sparse differences need an (H, W) or (H, W, C) frame, got shape {frame.shape}")
+    height, width = frame.shape[:2]
+    if height % block_size or width % block_size:
+        raise ValueError(f"Frame shape {frame.shape} is not divisible by block size {block_size}")
+    return frame.reshape(height // block_size, block_size, width // block_size, block_size, *frame.shape[2:]).swapaxes(1, 2)
+
+def _sparse_dct_difference(dct1: np.ndarray, dct2: np.ndarray, block_size: int, threshold: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pure function to calculate the difference between two DCTs of the same shape, keeping only
+    the blocks that changed: those whose energy (sum of squared coefficients, over all channels)
+    exceeds `threshold`. Returns `(block_indices, block_data)`, the row-major indices of the
+    changed blocks in the block grid and their (k, block_size, block_size[, C]) coefficients.
+    """
+    try:
+        dct1_array = np.asarray(dct1, dtype=np.float32)
+        dct2_array = np.asarray(dct2, dtype=np.float32)
+        if dct1_array.shape != dct2_array.shape:
+            raise ValueError(f"Block-sparse differences need DCTs of the same shape, got {dct1_array.shape} and {dct2_array.shape}")
+
+        grid = _block_grid(dct1_array - dct2_array, block_size)
+        blocks = grid.reshape(-1, *grid.shape[2:])
+        energy = np.square(blocks).reshape(len(blocks), -1).sum(axis=1)
+        block_indices = np.flatnonzero(energy > threshold).astype(np.uint32)
+        return block_indices, blocks[block_indices]
+    except Exception as e:
+        logging.error(f"Error in _sparse_dct_difference: {e}")
+        raise
+
 @app.route('/calculate_difference', methods=['POST'])
 def calculate_difference():
-    data = request.json
-    if not data or 'dct1' not in data or 'dct2' not in data:
-        return jsonify({"error": "Invalid request: 'dct1' and 'dct2' are required."}), 400
+    """
+    Calculates the difference 'dct1' - 'dct2'. With a 'block_size' field, only
+    the blocks whose energy exceeds 'threshold' (default 0) are returned, as 'block_indices' and
+    'block_data' plus the frame 'shape' and 'block_size', for the accumulator's /accumulate_blocks.
+    """
+    try:
+        arrays, meta = read_frames(request, ('dct1', 'dct2'))
+        block_size = int(meta['block_size']) if meta.get('block_size') else None
+        threshold = float(meta.get('threshold') or 0.0)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    if block_size is not None:
+        try:
+            block_indices, block_data = _sparse_dct_difference(arrays['dct1'], arrays['dct2'], block_size, threshold)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        logging.info(f"Calculating block-sparse difference: {len(block_indices)} changed blocks.")
+        return frames_response(
+            {"block_indices": block_indices, "block_data": block_data}, wants_binary(request),
+            status="sparse difference calculated", shape=list(arrays['dct1'].shape), block_size=block_size,
+        )
 
-    dct1 = data.get('dct1')
-    dct2 = data.get('dct2')
-    
     try:
-        difference_data = _calculate_dct_difference(dct1, dct2)
+        difference_data = _calculate_dct_difference(arrays['dct1'], arrays['dct2'])
         logging.info(f"Calculating difference between two DCTs.")
-        return jsonify({"status": "difference calculated", "difference_data": difference_data}), 200
+        return frames_response({"difference_data": difference_data}, wants_binary(request), status="difference calculated")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
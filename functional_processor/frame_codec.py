@@ -0,0 +1,239 @@
+"""
+Binary frame format shared by the functional processor services.
+
+A message is sent with `Content-Type: application/octet-stream` and carries one or more named
+arrays, one per field of the equivalent JSON request (e.g. `image_data`, or `dct1` and `dct2`):
+
+    MAGIC (4 bytes) | header length (uint32, little-endian) | JSON header | array payloads
+
+The JSON header has an `arrays` list of `{"name", "dtype", "shape"}` entries, in payload order.
+Any other keys are the remaining request/response fields (e.g. `frame_id`, `status`). Payloads
+are padded to 8-byte boundaries so they can be viewed without copying. With `"compression":
+"zlib"` in the header, everything after the header is zlib-compressed instead.
+
+The comma-separated string form the services used originally is still accepted and emitted
+for JSON clients, as a legacy fallback.
+"""
+import functools
+import inspect
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+from flask import Response, jsonify
+
+import http_client
+
+OCTET_STREAM = "application/octet-stream"
+MAGIC = b"NDAR"
+
+# Set to "zlib" to compress the messages this process sends; both forms are always accepted.
+COMPRESSION = os.environ.get("FRAME_CODEC_COMPRESSION") or None
+# zlib level for compressed messages; 1 favors speed, which matters more than ratio per hop
+COMPRESSION_LEVEL = 1
+
+_PREFIX = struct.Struct("<4sI")
+_ALIGNMENT = 8
+
+def _padding(size: int) -> bytes:
+    return b" " * (-size % _ALIGNMENT)
+
+def encode_frames(arrays: dict[str, np.ndarray], compression: str | None = COMPRESSION, **meta) -> bytes:
+    """
+    Serializes named arrays (plus the other message fields) into a single binary message.
+    """
+    entries, payloads = [], []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ValueError(f"Cannot encode arrays of dtype {array.dtype}")
+        entries.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape)})
+        payloads += [array.reshape(-1).view(np.uint8), _padding(array.nbytes)]
+
+    header = {"arrays": entries, **meta}
+    body = b"".join(payloads)
+    if compression == "zlib":
+        header["compression"] = "zlib"
+        body = zlib.compress(body, COMPRESSION_LEVEL)
+    elif compression is not None:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    header = json.dumps(header).encode("utf-8")
+    header += _padding(_PREFIX.size + len(header))
+    return b"".join([_PREFIX.pack(MAGIC, len(header)), header, body])
+
+def decode_frames(buffer: bytes) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Parses a binary message into read-only arrays keyed by name, plus the other message fields.
+    """
+    if len(buffer) < _PREFIX.size:
+        raise ValueError("Binary payload is too short to contain a header")
+    magic, header_len = _PREFIX.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("Binary payload does not start with the expected magic bytes")
+    offset = _PREFIX.size + header_len
+    meta = json.loads(bytes(buffer[_PREFIX.size:offset]))
+
+    compression = meta.pop("compression", None)
+    if compression == "zlib":
+        buffer, offset = zlib.decompress(buffer[offset:]), 0
+    elif compression is not None:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    arrays = {}
+    for entry in meta.pop("arrays", []):
+        dtype = np.dtype(entry["dtype"])
+        if dtype.hasobject:
+            raise ValueError(f"Cannot decode arrays of dtype {dtype}")
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        if len(buffer) - offset < count * dtype.itemsize:
+            raise ValueError(f"Binary payload is shorter than its header says (array {entry['name']!r})")
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(entry["shape"])
+        arrays[entry["name"]] = array
+        offset += array.nbytes + len(_padding(array.nbytes))
+    if offset != len(buffer):
+        raise ValueError("Binary payload size does not match header")
+    return arrays, meta
+
+def from_csv(text: str) -> np.ndarray:
+    """
+    Parses the legacy comma-separated form into a 1D float array.
+    """
+    return np.fromstring(text, sep=',')
+
+def to_csv(array: np.ndarray) -> str:
+    """
+    Formats an array in the legacy comma-separated form (flattened).
+    """
+    return ','.join(map(str, np.ravel(array)))
+
+def accepts_csv(*array_params: str):
+    """
+    Lets a pure function written for ndarrays also be called the legacy way: when any of the
+    named parameters is passed as a comma-separated string, those strings are parsed and the
+    result is formatted back into one.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            legacy = False
+            for name in array_params:
+                if isinstance(bound.arguments.get(name), str):
+                    bound.arguments[name] = from_csv(bound.arguments[name])
+                    legacy = True
+            result = fn(*bound.args, **bound.kwargs)
+            return to_csv(result) if legacy else result
+        return wrapper
+    return decorator
+
+def is_binary(req) -> bool:
+    return (req.content_type or "").startswith(OCTET_STREAM)
+
+def wants_binary(req) -> bool:
+    """
+    Binary requests get binary responses, as do requests that ask for one with `Accept`.
+    """
+    return is_binary(req) or OCTET_STREAM in req.headers.get("Accept", "")
+
+def read_frames(req, fields: tuple[str, ...]) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Reads the named array fields of a Flask request in either form. Returns `(arrays, meta)`,
+    where `meta` holds the remaining fields. Raises ValueError if a field is missing or malformed.
+    """
+    return parse_frames(req.content_type, req.get_data(), fields)
+
+def parse_frames(content_type: str | None, body: bytes, fields: tuple[str, ...]) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Framework-independent core of `read_frames`, for a request body and its content type.
+    """
+    if (content_type or "").startswith(OCTET_STREAM):
+        arrays, meta = decode_frames(body)
+    else:
+        try:
+            data = json.loads(body or b"null")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object or a binary frame message")
+        meta = {key: value for key, value in data.items() if key not in fields}
+        arrays = {field: from_csv(data[field]) for field in fields if data.get(field) is not None}
+
+    missing = [field for field in fields if field not in arrays]
+    if missing:
+        raise ValueError(f"Invalid request: {', '.join(repr(field) for field in missing)} required.")
+    return arrays, meta
+
+def reshape_frame(image_data: np.ndarray, shape) -> np.ndarray:
+    """
+    Gives a flat frame (e.g. comma-separated JSON 'image_data') the frame shape its client sent
+    with it as 'shape'; without one, the frame is returned as it is. Raises ValueError if the
+    shape does not fit the frame.
+    """
+    if shape is None:
+        return image_data
+    try:
+        return np.reshape(image_data, [int(size) for size in shape])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid request: 'shape' {shape!r} does not fit 'image_data' of {np.size(image_data)} values.") from None
+
+def parse_frame_batch(content_type: str | None, body: bytes) -> list[tuple[str, np.ndarray]]:
+    """
+    Reads a batch of frames as `(frame_id, image_data)` pairs: a binary message whose 'image_data'
+    stacks the frames along its first axis, with their ids in 'frame_ids', or JSON with a 'frames'
+    list of `{"frame_id", "image_data"}` objects (each with an optional 'shape', see
+    `reshape_frame`). Raises ValueError if the batch is malformed.
+    """
+    if (content_type or "").startswith(OCTET_STREAM):
+        arrays, meta = parse_frames(content_type, body, ('image_data',))
+        frame_ids = meta.get('frame_ids')
+        if not isinstance(frame_ids, list) or len(frame_ids) != len(arrays['image_data']):
+            raise ValueError("Invalid request: 'frame_ids' must list one id per frame of 'image_data'.")
+        return [(str(frame_id), image_data) for frame_id, image_data in zip(frame_ids, arrays['image_data'])]
+
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        data = None
+    frames = data.get('frames') if isinstance(data, dict) else None
+    if not isinstance(frames, list) or not all(isinstance(frame, dict) for frame in frames):
+        raise ValueError("Invalid request: 'frames' must be a list of frame objects.")
+    return [(frame.get('frame_id'), reshape_frame(from_csv(frame.get('image_data') or ''), frame.get('shape'))) for frame in frames]
+
+def frames_response(arrays: dict[str, np.ndarray], binary: bool, status_code: int = 200, **meta):
+    """
+    Builds a Flask response carrying named arrays: a binary message, or JSON with each array in
+    the legacy comma-separated form.
+    """
+    if binary:
+        return Response(encode_frames(arrays, **meta), status=status_code, mimetype=OCTET_STREAM)
+    return jsonify({**meta, **{name: to_csv(array) for name, array in arrays.items()}}), status_code
+
+def decode_response(response) -> tuple[dict[str, np.ndarray], dict]:
+    # Endpoints that return no arrays (e.g. status acknowledgements) reply with plain JSON
+    if not (response.headers.get("Content-Type") or "").startswith(OCTET_STREAM):
+        return {}, response.json()
+    return decode_frames(response.content)
+
+def post_frames(url: str, arrays: dict[str, np.ndarray], **meta) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Client side: POSTs named arrays to a service as a binary message and decodes the reply.
+    """
+    response = http_client.post(url, data=encode_frames(arrays, **meta), headers={"Content-Type": OCTET_STREAM, "Accept": OCTET_STREAM})
+    response.raise_for_status()
+    return decode_response(response)
+
+def get_frames(url: str) -> tuple[dict[str, np.ndarray], dict] | None:
+    """
+    Client side: GETs named arrays from a service as a binary message. Returns None if the
+    service has nothing to return yet (404).
+    """
+    response = http_client.get(url, headers={"Accept": OCTET_STREAM})
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return decode_response(response)
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from frame_processor import transform_frame_logic, accumulate_frame_logic
+
+class FramePipeline:
+    """
+    Streams frames through the functional services with up to `window` frames in flight. While
+    one frame is being differenced and accumulated, the next ones are already in the forward
+    DCT, so throughput approaches that of the slowest stage instead of the sum of all of them.
+
+    Frames are numbered in submission order and reach the accumulator strictly in that order,
+    whatever order their DCT and difference steps finish in. `submit` blocks while the window
+    is full, which holds back the client instead of queueing frames without bound.
+    """
+
+    def __init__(self, window: int, transform=transform_frame_logic, accumulate=accumulate_frame_logic):
+        if window < 1:
+            raise ValueError(f"Pipeline window must be at least 1, got {window}")
+        self.window = window
+        self._transform = transform
+        self._accumulate = accumulate
+        # One worker per slot, so every frame admitted to the window is running and the frame
+        # whose turn it is to accumulate can never be stuck behind later ones
+        self._executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='frame-pipeline')
+        self._slots = threading.BoundedSemaphore(window)
+        self._submit_lock = threading.Lock()
+        self._turn = threading.Condition()
+        self._next_sequence = 0
+        self._next_to_accumulate = 0
+
+    def submit(self, frame_id: str, image_data: np.ndarray | str, session: str | None = None) -> Future:
+        """
+        Queues a frame of `session` and returns a future for its `process_frame_logic` result.
+        """
+        if not frame_id or image_data is None or not np.size(image_data):
+            raise ValueError("Invalid request: 'frame_id' and 'image_data' are required.")
+
+        self._slots.acquire()
+        try:
+            with self._submit_lock:
+                sequence = self._next_sequence
+                self._next_sequence += 1
+                future = self._executor.submit(self._run, sequence, frame_id, image_data, session)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, sequence: int, frame_id: str, image_data, session: str | None):
+        try:
+            update = self._transform(frame_id, image_data, session)
+        except BaseException:
+            # A failed frame still takes its turn, or every frame after it would wait forever
+            self._take_turn(sequence, None, session)
+            raise
+        self._take_turn(sequence, update, session)
+        return {"status": "frame processed", "frame_id": frame_id}
+
+    def _take_turn(self, sequence: int, update, session: str | None):
+        with self._turn:
+            self._turn.wait_for(lambda: self._next_to_accumulate == sequence)
+        try:
+            if update is not None:
+                self._accumulate(update, session)
+        finally:
+            with self._turn:
+                self._next_to_accumulate += 1
+                self._turn.notify_all()
+
+    def process_frames(self, frames: list[tuple[str, np.ndarray | str]], session: str | None = None) -> list[dict]:
+        """
+        Runs a batch of `(frame_id, image_data)` frames of `session` through the pipeline and
+        returns their results in order. Raises the first error, once every frame of the batch has
+        finished.
+        """
+        futures = [self.submit(frame_id, image_data, session) for frame_id, image_data in frames]
+        for future in futures:
+            future.exception()
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+class AsyncFramePipeline:
+    """
+    Asyncio counterpart of `FramePipeline`, for async_orchestration_service.py: up to `window`
+    frames are in flight at once, and they reach the accumulator strictly in submission order.
+    `transform` and `accumulate` are coroutine functions with the signatures of
+    `transform_frame_logic` and `accumulate_frame_logic`. Create it on the event loop that uses it.
+    """
+
+    def __init__(self, window: int, transform, accumulate):
+        if window < 1:
+            raise ValueError(f"Pipeline window must be at least 1, got {window}")
+        self.window = window
+        self._transform = transform
+        self._accumulate = accumulate
+        self._slots = asyncio.Semaphore(window)
+        self._turn = asyncio.Condition()
+        self._next_sequence = 0
+        self._next_to_accumulate = 0
+
+    async def submit(self, frame_id: str, image_data: np.ndarray | str, session: str | None = None) -> asyncio.Task:
+        """
+        Queues a frame of `session` and returns a task for its `process_frame_logic` result.
+        Waits while the window is full.
+        """
+        if not frame_id or image_data is None or not np.size(image_data):
+            raise ValueError("Invalid request: 'frame_id' and 'image_data' are required.")
+
+        await self._slots.acquire()
+        # Numbered only once admitted, so a frame never waits for the turn of one still outside the window
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        task = asyncio.create_task(self._run(sequence, frame_id, image_data, session))
+        task.add_done_callback(lambda _: self._slots.release())
+        return task
+
+    async def _run(self, sequence: int, frame_id: str, image_data, session: str | None):
+        try:
+            update = await self._transform(frame_id, image_data, session)
+        except BaseException:
+            # A failed frame still takes its turn, or every frame after it would wait forever
+            await self._take_turn(sequence, None, session)
+            raise
+        await self._take_turn(sequence, update, session)
+        return {"status": "frame processed", "frame_id": frame_id}
+
+    async def _take_turn(self, sequence: int, update, session: str | None):
+        async with self._turn:
+            await self._turn.wait_for(lambda: self._next_to_accumulate == sequence)
+        try:
+            if update is not None:
+                await self._accumulate(update, session)
+        finally:
+            async with self._turn:
+                self._next_to_accumulate += 1
+                self._turn.notify_all()
+
+    async def process_frame(self, frame_id: str, image_data: np.ndarray | str, session: str | None = None) -> dict:
+        return await (await self.submit(frame_id, image_data, session))
+
+    async def process_frames(self, frames: list[tuple[str, np.ndarray | str]], session: str | None = None) -> list[dict]:
+        """
+        As `FramePipeline.process_frames`: returns the batch's results in order, and raises the
+        first error once every frame of the batch has finished.
+        """
+        tasks = [await self.submit(frame_id, image_data, session) for frame_id, image_data in frames]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return [task.result() for task in tasks]
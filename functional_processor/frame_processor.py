@@ -1,45 +1,85 @@
-import requests
-import json
+import os
 import numpy as np
 
+from frame_codec import from_csv
+from service_calls import PostFrames, GetFrames, run
+from session_store import session_query
+
 # Define the URLs for the functional services
 DCT_SERVICE_URL = "http://localhost:5002"
 REFERENCE_FRAME_SERVICE_URL = "http://localhost:5003"
 DIFFERENCE_SERVICE_URL = "http://localhost:5004"
 ACCUMULATOR_SERVICE_URL = "http://localhost:5005"
 
-def process_frame_logic(frame_id: str, image_data: str):
+# With a block size, only the blocks that changed from the reference frame (energy above the
+# threshold) are sent to the accumulator, instead of the whole dense difference.
+SPARSE_BLOCK_SIZE = int(os.environ.get('SPARSE_DIFFERENCE_BLOCK_SIZE', '0'))
+SPARSE_THRESHOLD = float(os.environ.get('SPARSE_DIFFERENCE_THRESHOLD', '0'))
+
+def process_frame_logic(frame_id: str, image_data: np.ndarray | str, session: str | None = None):
     """
     Orchestrates the processing of a single video frame.
     1. Performs forward DCT on the input image.
     2. Calculates the difference with the reference frame.
     3. Accumulates the difference.
+    Frames travel between the services as binary frame messages (see frame_codec.py). The
+    reference frame and the accumulated frame are those of `session` (see session_store.py).
     """
-    if not frame_id or not image_data:
-        raise ValueError("Invalid request: 'frame_id' and 'image_data' are required.")
+    return run(process_frame_steps(frame_id, image_data, session))
 
-    # 1. Perform forward DCT
-    dct_response = requests.post(f"{DCT_SERVICE_URL}/forward_dct", json={'frame_id': frame_id, 'image_data': image_data})
-    dct_response.raise_for_status()
-    dct_data = dct_response.json().get('dct_data')
-
-    # Get the current reference frame
-    ref_frame_response = requests.get(f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame")
-    ref_frame_response.raise_for_status()
-    reference_frame_data = ref_frame_response.json().get('reference_frame')
-
-    if reference_frame_data:
-        # 2. Calculate the difference with the reference frame
-        diff_response = requests.post(f"{DIFFERENCE_SERVICE_URL}/calculate_difference", json={'dct1': dct_data, 'dct2': reference_frame_data})
-        diff_response.raise_for_status()
-        difference_data = diff_response.json().get('difference_data')
-
-        # 3. Accumulate the difference
-        accumulate_response = requests.post(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame", json={'frame_part': difference_data})
-        accumulate_response.raise_for_status()
-    else:
-        # If no reference frame, just accumulate the DCT data directly
-        accumulate_response = requests.post(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame", json={'frame_part': dct_data})
-        accumulate_response.raise_for_status()
+def transform_frame_logic(frame_id: str, image_data: np.ndarray | str, session: str | None = None) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Steps 1 and 2 of `process_frame_logic`: returns the accumulator update, as `(arrays, meta)`
+    of either a dense 'frame_part' or a block-sparse difference. These steps do not depend on
+    other frames, so several frames can be in them at once.
+    """
+    return run(transform_frame_steps(frame_id, image_data, session))
+
+def accumulate_frame_logic(update: tuple[dict[str, np.ndarray], dict], session: str | None = None):
+    """
+    Step 3 of `process_frame_logic`: sends an update from `transform_frame_logic` to the
+    accumulator service.
+    """
+    run(accumulate_frame_steps(update, session))
 
+# The steps themselves, for either orchestrator (see service_calls.py)
+
+def process_frame_steps(frame_id: str, image_data: np.ndarray | str, session: str | None = None):
+    update = yield from transform_frame_steps(frame_id, image_data, session)
+    yield from accumulate_frame_steps(update, session)
     return {"status": "frame processed", "frame_id": frame_id}
+
+def transform_frame_steps(frame_id: str, image_data: np.ndarray | str, session: str | None = None):
+    if not frame_id or image_data is None or not np.size(image_data):
+        raise ValueError("Invalid request: 'frame_id' and 'image_data' are required.")
+    if isinstance(image_data, str):
+        image_data = from_csv(image_data)
+
+    # 1. Perform forward DCT, and get the current reference frame (independent of each other)
+    (dct_arrays, _), reference = yield (
+        PostFrames(f"{DCT_SERVICE_URL}/forward_dct", {'image_data': image_data}, frame_id=frame_id),
+        GetFrames(f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame{session_query(session)}"),
+    )
+    dct_data = dct_arrays['dct_data']
+
+    if reference is None:
+        # If no reference frame, the DCT data is accumulated directly
+        return {'frame_part': dct_data}, {}
+    reference_frame_data = reference[0]['reference_frame']
+
+    # 2. Calculate the difference with the reference frame
+    if SPARSE_BLOCK_SIZE:
+        diff_arrays, diff_meta = yield PostFrames(
+            f"{DIFFERENCE_SERVICE_URL}/calculate_difference", {'dct1': dct_data, 'dct2': reference_frame_data},
+            block_size=SPARSE_BLOCK_SIZE, threshold=SPARSE_THRESHOLD,
+        )
+        return diff_arrays, {'shape': diff_meta['shape'], 'block_size': diff_meta['block_size']}
+    diff_arrays, _ = yield PostFrames(f"{DIFFERENCE_SERVICE_URL}/calculate_difference", {'dct1': dct_data, 'dct2': reference_frame_data})
+    return {'frame_part': diff_arrays['difference_data']}, {}
+
+def accumulate_frame_steps(update: tuple[dict[str, np.ndarray], dict], session: str | None = None):
+    arrays, meta = update
+    if 'block_indices' in arrays:
+        yield PostFrames(f"{ACCUMULATOR_SERVICE_URL}/accumulate_blocks{session_query(session)}", arrays, **meta)
+    else:
+        yield PostFrames(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame{session_query(session)}", arrays)
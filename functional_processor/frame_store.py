@@ -0,0 +1,185 @@
+"""
+Bounded frame store for the image input service.
+
+Frames are kept in memory in least-recently-used order, within a byte budget and a frame count
+cap. When either is exceeded, the least recently used frames are evicted: to the spill tier if
+one is configured (files in a directory, with a byte budget of their own), and otherwise
+dropped. Memory use therefore stays flat however long ingest runs. Spilled ndarray frames are
+read back as read-only memory maps, paged in on access; spilled str and bytes frames (all the
+image input service stores) are read back into memory whole, as the service has to return them
+as strings anyway. The spill tier's files are in a private directory, removed by `close` or at
+exit.
+
+    FRAME_STORE_MAX_BYTES        in-memory byte budget (default 256 MiB)
+    FRAME_STORE_MAX_FRAMES       in-memory frame count cap (default 300, 10 s at 30 fps)
+    FRAME_STORE_SPILL_DIR        directory in which the spill tier creates its own (default: no spill tier)
+    FRAME_STORE_SPILL_MAX_BYTES  spill tier byte budget (default 1 GiB)
+"""
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+class FrameStore:
+    """
+    LRU mapping of frame id to frame data (str, bytes or ndarray), bounded in bytes and frames.
+    Safe to use from several request threads.
+    """
+
+    def __init__(self, max_bytes: int, max_frames: int, spill_dir: str | None = None, spill_max_bytes: int = 0):
+        if max_bytes <= 0 or max_frames <= 0:
+            raise ValueError("Frame store limits must be positive")
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        self.spill_max_bytes = spill_max_bytes if spill_dir else 0
+        # A private directory, so that files of other stores (or earlier runs) are never touched
+        self._spill_dir = tempfile.mkdtemp(prefix='frame_store_', dir=spill_dir) if spill_dir else None
+        # Removed when the store is closed or collected, or at exit at the latest
+        self._remove_spill_dir = weakref.finalize(self, shutil.rmtree, self._spill_dir, ignore_errors=True) if spill_dir else None
+        self._frames = OrderedDict()  # frame_id -> (value, size)
+        self._spilled = OrderedDict()  # frame_id -> (path, kind, size)
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._spill_count = 0
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('hits', 'spill_hits', 'misses', 'evictions', 'spills', 'spill_evictions'), 0)
+
+    @classmethod
+    def from_env(cls) -> 'FrameStore':
+        return cls(
+            max_bytes=int(os.environ.get('FRAME_STORE_MAX_BYTES', str(256 * 1024 * 1024))),
+            max_frames=int(os.environ.get('FRAME_STORE_MAX_FRAMES', '300')),
+            spill_dir=os.environ.get('FRAME_STORE_SPILL_DIR') or None,
+            spill_max_bytes=int(os.environ.get('FRAME_STORE_SPILL_MAX_BYTES', str(1024 * 1024 * 1024))),
+        )
+
+    def put(self, frame_id, value):
+        size = _sizeof(value)
+        with self._lock:
+            self._discard(frame_id)
+            self._frames[frame_id] = (value, size)
+            self._bytes += size
+            # The newest frame always stays, even if it alone exceeds the budget
+            while len(self._frames) > 1 and (self._bytes > self.max_bytes or len(self._frames) > self.max_frames):
+                old_id, (old_value, old_size) = self._frames.popitem(last=False)
+                self._bytes -= old_size
+                self._counters['evictions'] += 1
+                self._spill(old_id, old_value, old_size)
+
+    def get(self, frame_id, default=None):
+        with self._lock:
+            if frame_id in self._frames:
+                self._frames.move_to_end(frame_id)
+                self._counters['hits'] += 1
+                return self._frames[frame_id][0]
+            if frame_id in self._spilled:
+                self._spilled.move_to_end(frame_id)
+                self._counters['spill_hits'] += 1
+                path, kind, _ = self._spilled[frame_id]
+                return _load(path, kind)
+            self._counters['misses'] += 1
+            return default
+
+    def __setitem__(self, frame_id, value):
+        self.put(frame_id, value)
+
+    def __getitem__(self, frame_id):
+        value = self.get(frame_id, _MISSING)
+        if value is _MISSING:
+            raise KeyError(frame_id)
+        return value
+
+    def __contains__(self, frame_id) -> bool:
+        with self._lock:
+            return frame_id in self._frames or frame_id in self._spilled
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames) + len(self._spilled)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                'frames': len(self._frames), 'bytes': self._bytes,
+                'max_frames': self.max_frames, 'max_bytes': self.max_bytes,
+                'spilled_frames': len(self._spilled), 'spilled_bytes': self._spill_bytes,
+                'spill_max_bytes': self.spill_max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            for frame_id in list(self._frames) + list(self._spilled):
+                self._discard(frame_id)
+
+    def close(self):
+        """
+        Drops every frame and removes the spill directory.
+        """
+        self.clear()
+        if self._remove_spill_dir:
+            self._remove_spill_dir()
+
+    def _discard(self, frame_id):
+        if frame_id in self._frames:
+            self._bytes -= self._frames.pop(frame_id)[1]
+        if frame_id in self._spilled:
+            path, _, size = self._spilled.pop(frame_id)
+            self._spill_bytes -= size
+            _remove(path)
+
+    def _spill(self, frame_id, value, size):
+        if not self.spill_max_bytes or size > self.spill_max_bytes:
+            return
+        while self._spilled and self._spill_bytes + size > self.spill_max_bytes:
+            _, (path, _, old_size) = self._spilled.popitem(last=False)
+            self._spill_bytes -= old_size
+            self._counters['spill_evictions'] += 1
+            _remove(path)
+
+        self._spill_count += 1
+        path = os.path.join(self._spill_dir, f"{self._spill_count}.frame")
+        kind = _dump(path, value)
+        self._spilled[frame_id] = (path, kind, size)
+        self._spill_bytes += size
+        self._counters['spills'] += 1
+
+_MISSING = object()
+
+def _sizeof(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, str):
+        # The service stores ASCII (base64 or comma-separated) frames, where this is exact
+        return len(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    raise TypeError(f"Cannot store frames of type {type(value).__name__}")
+
+def _dump(path: str, value) -> str:
+    if isinstance(value, np.ndarray):
+        np.save(path, value, allow_pickle=False)
+        os.replace(path + '.npy', path)
+        return 'ndarray'
+    with open(path, 'wb') as f:
+        f.write(value.encode('utf-8') if isinstance(value, str) else value)
+    return 'str' if isinstance(value, str) else 'bytes'
+
+def _load(path: str, kind: str):
+    if kind == 'ndarray':
+        # Paged in on access rather than read up front
+        return np.load(path, mmap_mode='r')
+    # Read whole: the service returns these frames as strings, so a view would be copied anyway
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data.decode('utf-8') if kind == 'str' else data
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
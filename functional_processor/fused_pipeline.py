@@ -0,0 +1,83 @@
+import threading
+import uuid
+
+import numpy as np
+
+from dct_service import _perform_forward_dct, _perform_inverse_dct
+from difference_service import _calculate_dct_difference
+from accumulator_service import _accumulate
+from reference_frame_service import _set_reference_frame_data
+from output_retriever import encode_frame_result
+
+class FusedPipeline:
+    """
+    Runs the whole DCT -> difference -> accumulate -> IDCT chain in this process, by calling the
+    services' pure functions on ndarrays directly. It mirrors `process_frame_logic`,
+    `set_reference_logic` and `get_processed_frame_logic`, but keeps the reference frame and the
+    accumulated frame in its own state instead of in the reference frame and accumulator services.
+    That state is guarded by a lock, so one pipeline can serve concurrent request threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reference_frame_data = None
+        self.accumulated_frame_data = None
+        # Bumped on every change of the accumulated frame; the encoded result is kept per version
+        self._state_id = uuid.uuid4().hex[:12]
+        self._version = 0
+        self._result = None
+
+    @property
+    def version(self) -> str:
+        return f"{self._state_id}-{self._version}"
+
+    def process_frame(self, frame_id: str, image_data: np.ndarray):
+        if not frame_id or image_data is None or not np.size(image_data):
+            raise ValueError("Invalid request: 'frame_id' and 'image_data' are required.")
+
+        # The forward DCT touches no shared state, so frames are transformed concurrently
+        dct_data = _perform_forward_dct(image_data, frame_id)
+        with self._lock:
+            if self.reference_frame_data is not None:
+                dct_data = _calculate_dct_difference(dct_data, self.reference_frame_data)
+            self.accumulated_frame_data = _accumulate(self.accumulated_frame_data, dct_data)
+            self._version += 1
+
+        return {"status": "frame processed", "frame_id": frame_id}
+
+    def set_reference(self, image_data: np.ndarray):
+        if image_data is None or not np.size(image_data):
+            raise ValueError("Invalid request: 'image_data' is required.")
+
+        reference_frame_data = _set_reference_frame_data(_perform_forward_dct(image_data, 'reference'))
+        with self._lock:
+            self.reference_frame_data = reference_frame_data
+
+        return {"status": "reference frame set"}
+
+    def get_processed_frame(self):
+        # Only the snapshot is taken under the lock; the inverse DCT and JPEG encode run outside
+        # it, so frames keep being processed while an output frame is rendered
+        with self._lock:
+            if self.accumulated_frame_data is None or not self.accumulated_frame_data.size:
+                return {"status": "no accumulated data"}
+            if self._result is not None and self._result['version'] == self.version:
+                return self._result
+            version = self.version
+            accumulated_frame_data = self.accumulated_frame_data.copy()
+
+        result = encode_frame_result(_perform_inverse_dct(accumulated_frame_data, 'accumulated'))
+        if result['status'] != 'success':
+            return result
+        result = {**result, "version": version}
+        with self._lock:
+            # Kept only while still current; a newer frame may have arrived meanwhile
+            if version == self.version:
+                self._result = result
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.accumulated_frame_data = None
+            self._version += 1
+        return {"status": "accumulator reset"}
@@ -0,0 +1,75 @@
+"""
+Pooled HTTP client for calls between the functional processor services.
+
+Each downstream service (scheme + host + port) gets its own `requests.Session`, so connections
+are kept alive and reused across frames instead of paying a TCP handshake on every hop. Pool
+size, timeouts and retries are configured through environment variables:
+
+    HTTP_POOL_SIZE        connections kept per service (default 10)
+    HTTP_CONNECT_TIMEOUT  seconds to establish a connection (default 2)
+    HTTP_READ_TIMEOUT     seconds to wait for a response (default 30)
+    HTTP_RETRIES          retries on connection errors, and on 502/503/504 for GETs (default 2)
+
+Use `get`, `post` and `request` in place of the `requests` functions of the same name.
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+TIMEOUT = (float(os.environ.get("HTTP_CONNECT_TIMEOUT", "2")), float(os.environ.get("HTTP_READ_TIMEOUT", "30")))
+RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def _new_session() -> requests.Session:
+    # Only idempotent requests are retried on bad gateway responses; a POST is retried only
+    # when it never reached the service (connection errors)
+    retry = Retry(
+        total=RETRIES, connect=RETRIES, read=0, status=RETRIES,
+        status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET", "HEAD"}),
+        backoff_factor=0.05, raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def session_for(url: str) -> requests.Session:
+    """
+    Returns the shared session of the service that `url` points to, creating it on first use.
+    """
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = _new_session()
+    return session
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", TIMEOUT)
+    return session_for(url).request(method, url, **kwargs)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+def close_all():
+    """
+    Closes every pooled session (e.g. on shutdown, or after forking).
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
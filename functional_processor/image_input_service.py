@@ -2,20 +2,25 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import logging
 
+from frame_store import FrameStore
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 
 app = Flask(__name__)
 CORS(app)
 
-# In-memory store for frame data
-frame_store = {}
+# Bounded store for frame data: least recently used frames are evicted (or spilled to disk)
+# once the byte budget or frame count cap is reached, see frame_store.py
+frame_store = FrameStore.from_env()
 
 @app.route('/input_frame', methods=['POST'])
 def input_frame():
     """
     Receives a video frame as JSON data and stores it.
-    Expects 'frame_id' and 'frame_data' in the request body.
+    Expects 'frame_id' and 'frame_data' in the request body. 'frame_data' must be a string
+    (e.g. base64 or comma-separated); other JSON values are rejected with 400, as the frame
+    store only sizes and keeps string frames.
     """
     data = request.json
     if not data or 'frame_id' not in data or 'frame_data' not in data:
@@ -25,6 +30,9 @@ def input_frame():
     frame_id = data.get('frame_id')
     frame_data = data.get('frame_data')
     
+    if not isinstance(frame_data, str):
+        return jsonify({"error": "Invalid request: 'frame_data' must be a string."}), 400
+
     frame_store[frame_id] = frame_data
     logging.info(f"Stored frame {frame_id}. Data size: {len(frame_data) if isinstance(frame_data, str) else 'N/A'} bytes.")
 
@@ -35,13 +43,21 @@ def get_frame(frame_id):
     """
     Retrieves a stored frame by its ID.
     """
-    if frame_id in frame_store:
+    frame_data = frame_store.get(frame_id)
+    if frame_data is not None:
         logging.info(f"Retrieved frame {frame_id}.")
-        return jsonify({"status": "success", "frame_id": frame_id, "frame_data": frame_store[frame_id]})
+        return jsonify({"status": "success", "frame_id": frame_id, "frame_data": frame_data})
     else:
         logging.warning(f"Frame {frame_id} not found.")
         return jsonify({"error": "Frame not found"}), 404
 
+@app.route('/frame_store_metrics', methods=['GET'])
+def frame_store_metrics():
+    """
+    Reports the frame store's occupancy and its hit, miss, eviction and spill counters.
+    """
+    return jsonify(frame_store.metrics()), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001)
 
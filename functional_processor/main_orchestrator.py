@@ -1,6 +1,12 @@
-import requests
+import hashlib
 import json
+import os
+import sys
+import threading
 import time
+from collections import OrderedDict
+
+import http_client
 
 # Service URLs
 IMAGE_INPUT_SERVICE = "http://localhost:5001"
@@ -10,53 +16,127 @@ DIFFERENCE_SERVICE = "http://localhost:5004"
 ACCUMULATOR_SERVICE = "http://localhost:5005"
 OUTPUT_SERVICE = "http://localhost:5006"
 
-# Simple memoization cache for DCT results
-dct_cache = {}
+class DCTCache:
+    """
+    LRU memo of forward DCT results, keyed by a hash of the frame content rather than its id,
+    so a frame that comes back under a new id (e.g. the mock video stream's ping-pong replay)
+    still skips the DCT. Bounded by the total size of the cached results in bytes of memory held
+    (see `sizeof`); entries older than `ttl` seconds are treated as misses.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # content hash -> (dct_data, size, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @staticmethod
+    def key(frame_data) -> str:
+        if isinstance(frame_data, str):
+            frame_data = frame_data.encode('utf-8')
+        return hashlib.blake2b(frame_data, digest_size=16).hexdigest()
+
+    @staticmethod
+    def sizeof(dct_data) -> int:
+        # Bytes the cached object holds, header included, rather than its length in characters
+        if isinstance(dct_data, str):
+            return sys.getsizeof(dct_data)
+        return sys.getsizeof(json.dumps(dct_data))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[2] > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, dct_data):
+        size = self.sizeof(dct_data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (dct_data, size, self._clock())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions, "expirations": self.expirations,
+                "entries": len(self._entries), "bytes": self._bytes,
+            }
+
+# Memoization cache for DCT results; DCT_CACHE_MAX_BYTES is in bytes of memory held
+dct_cache = DCTCache(
+    max_bytes=int(os.environ.get("DCT_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    ttl=float(os.environ.get("DCT_CACHE_TTL", "300")),
+)
 
 def process_video_frame(frame_id, frame_data):
     print(f"Orchestrator: Processing frame {frame_id}")
 
     # 1. Send frame to Image Input Service
-    response = requests.post(f"{IMAGE_INPUT_SERVICE}/input_frame", json={"frame_id": frame_id, "frame_data": frame_data})
+    response = http_client.post(f"{IMAGE_INPUT_SERVICE}/input_frame", json={"frame_id": frame_id, "frame_data": frame_data})
     print(f"Image Input Service response: {response.json()}")
 
-    # 2. Perform Forward DCT (with memoization)
-    if frame_id in dct_cache:
-        dct_data = dct_cache[frame_id]
+    # 2. Perform Forward DCT (memoized on the frame content)
+    cache_key = dct_cache.key(frame_data)
+    dct_data = dct_cache.get(cache_key)
+    if dct_data is not None:
         print(f"Forward DCT for frame {frame_id} retrieved from cache.")
     else:
-        response = requests.post(f"{DCT_SERVICE}/forward_dct", json={"frame_id": frame_id, "image_data": frame_data})
+        response = http_client.post(f"{DCT_SERVICE}/forward_dct", json={"frame_id": frame_id, "image_data": frame_data})
         dct_data = response.json().get("dct_data")
-        dct_cache[frame_id] = dct_data # Store in cache
+        if dct_data is not None:
+            dct_cache.put(cache_key, dct_data) # Store in cache
         print(f"Forward DCT Service response: {response.json()}")
 
     # 3. Get Reference Frame (for simplicity, let's assume it's already set or we set it once)
     # In a real scenario, you might have logic to update the reference frame
-    response = requests.get(f"{REFERENCE_FRAME_SERVICE}/get_reference_frame")
+    response = http_client.get(f"{REFERENCE_FRAME_SERVICE}/get_reference_frame")
     reference_dct_data = response.json().get("reference_frame")
     print(f"Reference Frame Service response: {response.json()}")
 
     # If no reference frame is set, set the first frame's DCT as reference
     if not reference_dct_data:
         print(f"No reference frame found. Setting current frame {frame_id} as reference.")
-        requests.post(f"{REFERENCE_FRAME_SERVICE}/set_reference_frame", json={"frame_data": dct_data})
+        http_client.post(f"{REFERENCE_FRAME_SERVICE}/set_reference_frame", json={"frame_data": dct_data})
         reference_dct_data = dct_data # Set for current processing
 
     # 4. Calculate Difference
-    response = requests.post(f"{DIFFERENCE_SERVICE}/calculate_difference", json={"dct1": dct_data, "dct2": reference_dct_data})
+    response = http_client.post(f"{DIFFERENCE_SERVICE}/calculate_difference", json={"dct1": dct_data, "dct2": reference_dct_data})
     difference_data = response.json().get("difference_data")
     print(f"Difference Service response: {response.json()}")
 
     # 5. Accumulate Frame
-    response = requests.post(f"{ACCUMULATOR_SERVICE}/accumulate_frame", json={"frame_part": difference_data})
+    response = http_client.post(f"{ACCUMULATOR_SERVICE}/accumulate_frame", json={"frame_part": difference_data})
     print(f"Accumulator Service response: {response.json()}")
 
     # 6. Get Accumulated Frame and Display (simplified for demo)
-    response = requests.get(f"{ACCUMULATOR_SERVICE}/get_accumulated_frame")
+    response = http_client.get(f"{ACCUMULATOR_SERVICE}/get_accumulated_frame")
     final_frame_data = response.json().get("accumulated_frame")
     print(f"Accumulated Frame: {final_frame_data}")
 
-    response = requests.post(f"{OUTPUT_SERVICE}/display_video", json={"video_data": final_frame_data})
+    response = http_client.post(f"{OUTPUT_SERVICE}/display_video", json={"video_data": final_frame_data})
     print(f"Output Service response: {response.json()}")
 
 if __name__ == '__main__':
@@ -65,3 +145,4 @@ if __name__ == '__main__':
         mock_frame_data = f"frame_content_{i}"
         process_video_frame(i, mock_frame_data)
         time.sleep(1) # Simulate time between frames
+    print(f"DCT cache: {dct_cache.stats()}")
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import requests
 import logging
@@ -6,14 +6,21 @@ from logging.handlers import RotatingFileHandler
 import os
 
 from frame_processor import process_frame_logic
-from output_retriever import get_processed_frame_logic
+from output_retriever import get_processed_frame_logic, frame_response, JPEG
 from reference_manager import set_reference_logic
+from frame_codec import read_frames, reshape_frame, parse_frame_batch, OCTET_STREAM
+from fused_pipeline import FusedPipeline
+from frame_pipeline import FramePipeline
+import http_client
 
 app = Flask(__name__)
 CORS(app)
 
-# Configure logging
-if not app.debug:
+# Configure logging. The log file is only attached when the service is run, not when the module
+# is imported (as the tests do), so importing it never writes to logs/.
+def _configure_file_logging():
+    if app.debug:
+        return
     if not os.path.exists('logs'):
         os.mkdir('logs')
     file_handler = RotatingFileHandler('logs/orchestration_service.log', maxBytes=10240, backupCount=10)
@@ -30,39 +37,112 @@ REFERENCE_FRAME_SERVICE_URL = "http://localhost:5003"
 DIFFERENCE_SERVICE_URL = "http://localhost:5004"
 ACCUMULATOR_SERVICE_URL = "http://localhost:5005"
 
+# "services" (the default) runs each pipeline step on its microservice over HTTP.
+# "fused" runs the whole chain inside this process and needs none of the other services.
+PIPELINE_ENGINE = os.environ.get('PIPELINE_ENGINE', 'services')
+if PIPELINE_ENGINE not in ('services', 'fused'):
+    raise ValueError(f"Unknown PIPELINE_ENGINE: {PIPELINE_ENGINE!r} (expected 'services' or 'fused')")
+fused_pipeline = FusedPipeline() if PIPELINE_ENGINE == 'fused' else None
+
+# Streaming mode: with a window above 1, up to that many frames are in flight through the
+# services at once (frame N+1's forward DCT overlaps frame N's difference and accumulation),
+# and frames still reach the accumulator in the order they arrived.
+PIPELINE_WINDOW = int(os.environ.get('PIPELINE_WINDOW', '1'))
+frame_pipeline = FramePipeline(PIPELINE_WINDOW) if fused_pipeline is None and PIPELINE_WINDOW > 1 else None
+
+def _session():
+    """
+    The stream a request belongs to, by its `session` query parameter (see session_store.py),
+    or None for the default one. The fused engine holds the state of a single stream.
+    """
+    session = request.args.get('session')
+    if session and fused_pipeline is not None:
+        raise ValueError("Sessions need PIPELINE_ENGINE=services; the fused engine serves a single stream.")
+    return session
+
+def _process_frame(frame_id, image_data, session):
+    if fused_pipeline is not None:
+        return fused_pipeline.process_frame(frame_id, image_data)
+    if frame_pipeline is not None:
+        return frame_pipeline.submit(frame_id, image_data, session).result()
+    return process_frame_logic(frame_id, image_data, session)
+
 @app.route('/process_frame', methods=['POST'])
 def process_frame():
     try:
-        data = request.json
-        frame_id = data.get('frame_id')
-        image_data = data.get('image_data')
-        result = process_frame_logic(frame_id, image_data)
+        # JSON with comma-separated 'image_data' (and its 'shape'), or a binary frame message
+        arrays, meta = read_frames(request, ('image_data',))
+        result = _process_frame(meta.get('frame_id'), reshape_frame(arrays['image_data'], meta.get('shape')), _session())
         return jsonify(result), 200
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"Service communication error: {e}"}), 500
 
+@app.route('/process_frames', methods=['POST'])
+def process_frames():
+    try:
+        session = _session()
+        frames = parse_frame_batch(request.content_type, request.get_data())
+        if frame_pipeline is not None:
+            results = frame_pipeline.process_frames(frames, session)
+        else:
+            results = [_process_frame(frame_id, image_data, session) for frame_id, image_data in frames]
+        return jsonify({"status": "frames processed", "frame_ids": [result['frame_id'] for result in results]}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": f"Service communication error: {e}"}), 500
+
 @app.route('/get_processed_frame', methods=['GET'])
 def get_processed_frame():
+    """
+    Returns the reconstructed frame as a raw image/jpeg body, or as the JSON status with a base64
+    encoded JPEG to clients that only accept JSON. The accumulator 'version' it shows is its
+    ETag, so pollers that send If-None-Match get 304 until something is accumulated.
+    """
     try:
-        result = get_processed_frame_logic()
-        return jsonify(result), 200
+        session = _session()
+        if fused_pipeline is not None:
+            result = fused_pipeline.get_processed_frame()
+        else:
+            result = get_processed_frame_logic(session)
+        status, body, headers = frame_response(result, request.headers.get('Accept'), request.headers.get('If-None-Match'))
+        if isinstance(body, dict):
+            return jsonify(body), status, headers
+        return Response(body, status=status, mimetype=JPEG if body is not None else None, headers=headers)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"Service communication error: {e}"}), 500
 
 @app.route('/set_reference', methods=['POST'])
 def set_reference():
     try:
-        data = request.json
-        image_data = data.get('image_data')
-        result = set_reference_logic(image_data)
+        session = _session()
+        arrays, meta = read_frames(request, ('image_data',))
+        image_data = reshape_frame(arrays['image_data'], meta.get('shape'))
+        if fused_pipeline is not None:
+            result = fused_pipeline.set_reference(image_data)
+        else:
+            result = set_reference_logic(image_data, session)
         return jsonify(result), 200
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"Service communication error: {e}"}), 500
 
+@app.route('/reset_accumulator', methods=['POST'])
+def reset_accumulator():
+    try:
+        _session()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if fused_pipeline is not None:
+        return jsonify(fused_pipeline.reset()), 200
+    # The session, like any query parameter, is passed on with the request
+    return _proxy_request(ACCUMULATOR_SERVICE_URL, 'reset_accumulator')
+
 # This section defines routes that act as an inter-service router.
 # Its functional role is to proxy requests from the visualizer (or other clients)
 # to specific functional processing services (e.g., DCT, Difference, Accumulator).
@@ -90,19 +170,31 @@ def proxy_accumulator_service(subpath):
 # and managing potential communication errors.
 def _proxy_request(base_url, subpath):
     url = f"{base_url}/{subpath}"
+    if request.query_string:
+        url = f"{url}?{request.query_string.decode()}"
     method = request.method
     headers = {key: value for key, value in request.headers if key.lower() not in ['content-length', 'host']}
     data = request.get_data() if method == 'POST' else None
 
     try:
-        resp = requests.request(method, url, headers=headers, data=data)
+        resp = http_client.request(method, url, headers=headers, data=data)
+        # Versioned responses keep their ETag, so clients can make conditional requests through here
+        etag = {'ETag': resp.headers['ETag']} if 'ETag' in resp.headers else {}
+        if resp.status_code == 304:
+            # Not Modified has no body to convert
+            return Response(status=304, headers=etag)
+        if resp.headers.get('Content-Type', '').startswith(OCTET_STREAM):
+            # Binary frame messages are passed through untouched
+            return Response(resp.content, status=resp.status_code, mimetype=OCTET_STREAM, headers=etag)
         response = jsonify(resp.json())
         response.status_code = resp.status_code
+        response.headers.update(etag)
         return response
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"Proxy communication error with {base_url}: {e}"}), 500
 
 if __name__ == '__main__':
+    _configure_file_logging()
     app.run(port=5006)
 
 # This service is typically started by `functional_processor/start_functional_processors.sh` or `start_functional_processors_orchestration.sh`.
@@ -1,64 +1,220 @@
-import requests
-import json
+import os
+import threading
 import numpy as np
 import cv2
 import base64
 
+from frame_codec import get_frames
+from service_calls import PostFrames, GetFrames, Compute, NOT_MODIFIED, run
+from dct_service import _perform_inverse_dct, _inverse_dct_blocks
+from difference_service import _block_grid
+from session_store import SessionStore, DEFAULT_SESSION, session_query
+
 # Define the URLs for the functional services
 DCT_SERVICE_URL = "http://localhost:5002"
 ACCUMULATOR_SERVICE_URL = "http://localhost:5005"
 
-# Assuming the video dimensions from videostream_mock_server.py
-# These should ideally be passed along the pipeline or configured globally
-VIDEO_WIDTH = 1920
-VIDEO_HEIGHT = 1080
+# Frames carry their shape through the pipeline; these dimensions (from videostream_mock_server.py)
+# are only used for flat frames that lost it
+VIDEO_WIDTH = int(os.environ.get('VIDEO_WIDTH', '1920'))
+VIDEO_HEIGHT = int(os.environ.get('VIDEO_HEIGHT', '1080'))
+
+# "service" sends the accumulated frame to the DCT service's /inverse_dct. "local" inverts it in
+# this process with the same (blockwise, per DCT_BLOCK_SIZE) transform and skips that round trip.
+# "incremental" also inverts locally, but keeps the reconstructed frame between calls and only
+# re-inverts the blocks the accumulator reports as changed since the previous call.
+OUTPUT_IDCT = os.environ.get('OUTPUT_IDCT', 'service')
+if OUTPUT_IDCT not in ('service', 'local', 'incremental'):
+    raise ValueError(f"Unknown OUTPUT_IDCT: {OUTPUT_IDCT!r} (expected 'service', 'local' or 'incremental')")
+
+# Processed frames are served as raw JPEG bodies; the base64 JSON form is kept for clients that ask for it
+JPEG = "image/jpeg"
 
-def get_processed_frame_logic():
+class _EncodedFrame:
     """
-    Retrieves the currently accumulated frame data, performs inverse DCT,
-    and returns the reconstructed image data as a base64 encoded JPEG.
+    A session's last result, with the accumulator version it was made from.
     """
-    # Get the accumulated frame data
-    accumulated_response = requests.get(f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame")
-    accumulated_response.raise_for_status()
-    accumulated_data_str = accumulated_response.json().get('accumulated_frame')
 
-    if not accumulated_data_str:
+    def __init__(self, version: str | None = None, result: dict | None = None):
+        self.version = version
+        self.result = result
+
+# Last results by session. The session's lock also makes its concurrent pollers wait for one
+# encode instead of each doing their own.
+_encoded_frames = SessionStore.from_env(_EncodedFrame)
+
+def get_processed_frame_logic(session: str | None = None):
+    """
+    Retrieves the currently accumulated frame data (of `session`), performs inverse DCT,
+    and returns the reconstructed image as JPEG bytes ('image_jpeg'; see `json_result`).
+    The result carries the accumulator 'version' it shows, and is reused for as long as the
+    accumulator reports that version unchanged.
+    """
+    if OUTPUT_IDCT == 'incremental':
+        with _incremental_frames.session(session or DEFAULT_SESSION) as frame:
+            return frame.render(session)
+    with _encoded_frames.session(session or DEFAULT_SESSION) as encoded:
+        return run(processed_frame_steps(encoded, session))
+
+def processed_frame_steps(encoded: _EncodedFrame, session: str | None = None):
+    """
+    The steps of `get_processed_frame_logic` (other than in "incremental" mode), for either
+    orchestrator (see service_calls.py). `encoded` is the session's last result, which they
+    replace when they make a new one.
+    """
+    # Get the accumulated frame data, unless it is still the version of the last result
+    update = yield GetFrames(f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame{session_query(session)}", version=encoded.version)
+    if update is NOT_MODIFIED:
+        return encoded.result
+    if update is None or not update[0].get('accumulated_frame', np.empty(0)).size:
         return {"status": "no accumulated data"}
+    arrays, meta = update
+    accumulated_data = arrays['accumulated_frame']
 
     # Perform inverse DCT on the accumulated data
     # We need a dummy frame_id for the IDCT service
-    idct_response = requests.post(f"{DCT_SERVICE_URL}/inverse_dct", json={'frame_id': 'accumulated', 'dct_data': accumulated_data_str})
-    idct_response.raise_for_status()
-    reconstructed_1d_str = idct_response.json().get('image_data')
+    if OUTPUT_IDCT == 'local':
+        reconstructed_array = yield Compute(_perform_inverse_dct, accumulated_data, 'accumulated')
+    else:
+        idct_arrays, _ = yield PostFrames(f"{DCT_SERVICE_URL}/inverse_dct", {'dct_data': accumulated_data}, frame_id='accumulated')
+        reconstructed_array = idct_arrays.get('image_data')
 
-    if not reconstructed_1d_str:
+    if reconstructed_array is None or not reconstructed_array.size:
         return {"status": "failed to reconstruct image data"}
 
-    # Convert the reconstructed 1D string to a numpy array
-    reconstructed_array = np.fromstring(reconstructed_1d_str, sep=',')
+    result = yield Compute(encode_frame_result, reconstructed_array)
+    if meta.get('version') and result['status'] == 'success':
+        result = {**result, "version": meta['version']}
+        encoded.version, encoded.result = meta['version'], result
+    return result
+
+class _IncrementalFrame:
+    """
+    A session's reconstructed (spatial-domain) frame as of accumulator version `version`. Each `render`
+    fetches only the blocks changed since then, inverts and patches in just those, and re-encodes
+    the JPEG only if something changed.
+    """
+
+    def __init__(self):
+        self.clear()
 
-    # Ensure the array has the correct number of elements for a BGR image
-    expected_elements = VIDEO_WIDTH * VIDEO_HEIGHT * 3
-    if len(reconstructed_array) != expected_elements:
-        # This indicates a mismatch in data size, which needs to be handled
-        # For now, we'll log an error and return
-        print(f"Error: Reconstructed array length ({len(reconstructed_array)}) does not match expected ({expected_elements})")
-        return {"status": "error", "message": "Reconstructed image data size mismatch"}
+    def clear(self):
+        self.version = None
+        self.image = None
+        self.result = None
 
-    # Reshape the 1D array into a 2D image array (Height, Width, Channels)
-    # Ensure data type is uint8 and values are clamped to 0-255
-    reconstructed_image = reconstructed_array.reshape((VIDEO_HEIGHT, VIDEO_WIDTH, 3)).astype(np.uint8)
-    reconstructed_image = np.clip(reconstructed_image, 0, 255) # Clamp values
+    def render(self, session: str | None = None):
+        update = get_frames(f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_blocks{session_query(session, since=self.version)}")
+        if update is None:
+            self.clear()
+            return {"status": "no accumulated data"}
+        arrays, meta = update
 
-    # Encode the numpy array as a JPEG image
-    ret, jpeg = cv2.imencode('.jpg', reconstructed_image)
+        if 'accumulated_frame' in arrays:
+            if not arrays['accumulated_frame'].size:
+                self.clear()
+                return {"status": "no accumulated data"}
+            self.image = np.array(_perform_inverse_dct(arrays['accumulated_frame'], 'accumulated'), dtype=np.float32)
+            self.result = None
+        elif len(arrays['block_indices']):
+            grid = _block_grid(self.image, meta['block_size'])
+            rows, cols = np.divmod(arrays['block_indices'].astype(np.intp), grid.shape[1])
+            grid[rows, cols] = _inverse_dct_blocks(arrays['block_data'])
+            self.result = None
+        self.version = meta['version']
+
+        if self.result is None:
+            self.result = encode_frame_result(self.image)
+        if self.result['status'] == 'success' and self.result.get('version') != self.version:
+            self.result = {**self.result, "version": self.version}
+        return self.result
+
+# Reconstructed frames by session; the session's lock serializes its renders
+_incremental_frames = SessionStore.from_env(_IncrementalFrame)
+
+class _ImageBuffers:
+    """
+    Scratch buffers for the float -> uint8 conversion before JPEG encoding, kept between calls
+    so polling for frames does not allocate two frame-sized arrays every time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clipped = None
+        self._image = None
+
+    def to_uint8(self, array: np.ndarray) -> np.ndarray:
+        dtype = np.result_type(array.dtype, np.float32)
+        if self._image is None or self._image.shape != array.shape or self._clipped.dtype != dtype:
+            self._clipped = np.empty(array.shape, dtype=dtype)
+            self._image = np.empty(array.shape, dtype=np.uint8)
+        np.clip(array, 0, 255, out=self._clipped)
+        np.copyto(self._image, self._clipped, casting='unsafe')
+        return self._image
+
+_image_buffers = _ImageBuffers()
+
+def encode_frame_result(reconstructed_array: np.ndarray):
+    """
+    Turns a reconstructed frame into the `get_processed_frame` result: the encoded JPEG, as
+    bytes under 'image_jpeg'. (H, W) frames, which the blockwise DCT also accepts, are encoded
+    as grayscale JPEGs.
+    """
+    if reconstructed_array.ndim not in (2, 3):
+        # Flat frames carry no shape, so fall back to the configured video dimensions
+        expected_elements = VIDEO_WIDTH * VIDEO_HEIGHT * 3
+        if reconstructed_array.size != expected_elements:
+            # This indicates a mismatch in data size, which needs to be handled
+            # For now, we'll log an error and return
+            print(f"Error: Reconstructed array length ({reconstructed_array.size}) does not match expected ({expected_elements})")
+            return {"status": "error", "message": "Reconstructed image data size mismatch"}
+        reconstructed_array = reconstructed_array.reshape((VIDEO_HEIGHT, VIDEO_WIDTH, 3))
+
+    with _image_buffers.lock:
+        # Clamp values to 0-255 and convert to uint8, into buffers reused across calls
+        reconstructed_image = _image_buffers.to_uint8(reconstructed_array)
+
+        # Encode the numpy array as a JPEG image
+        ret, jpeg = cv2.imencode('.jpg', reconstructed_image)
 
     if not ret:
         print("Error: cv2.imencode failed to encode image to JPEG.")
         return {"status": "error", "message": "Failed to encode image to JPEG"}
 
-    # Base64 encode the JPEG bytes
-    encoded_jpeg_b64 = base64.b64encode(jpeg.tobytes()).decode('utf-8')
+    return {"status": "success", "image_jpeg": jpeg.tobytes()}
 
-    return {"status": "success", "image_data_b64": encoded_jpeg_b64}
+def wants_json(accept: str | None) -> bool:
+    """
+    Whether a client's `Accept` header asks for the base64 JSON form of a processed frame rather
+    than the raw JPEG: only when it names JSON and no image type, so browsers (`*/*`) get JPEG.
+    """
+    accept = accept or ""
+    return "application/json" in accept and "image/" not in accept
+
+def json_result(result: dict) -> dict:
+    """
+    The JSON form of a `get_processed_frame` result, with the JPEG base64 encoded under
+    'image_data_b64'.
+    """
+    if "image_jpeg" not in result:
+        return result
+    result = dict(result)
+    result["image_data_b64"] = base64.b64encode(result.pop("image_jpeg")).decode('utf-8')
+    return result
+
+def frame_response(result: dict, accept: str | None, if_none_match: str | None) -> tuple[int, bytes | dict | None, dict]:
+    """
+    How the orchestrators answer a get_processed_frame request with `result`: as
+    `(status, body, headers)`, where the body is the raw JPEG, the JSON form (a dict) for clients
+    that only accept JSON, or None. The accumulator 'version' is the ETag, and requests whose
+    If-None-Match already names it get 304 with no body.
+    """
+    headers = {'Vary': 'Accept'}
+    if result.get('version'):
+        headers['ETag'] = f'"{result["version"]}"'
+        tags = [tag.strip().removeprefix('W/') for tag in (if_none_match or '').split(',')]
+        if headers['ETag'] in tags or '*' in tags:
+            return 304, None, headers
+    if 'image_jpeg' in result and not wants_json(accept):
+        return 200, result['image_jpeg'], headers
+    return 200, json_result(result), headers
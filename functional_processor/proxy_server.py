@@ -1,19 +1,19 @@
 from flask import Flask, Response
 from flask_cors import CORS
-import requests
+import http_client
 
 app = Flask(__name__)
 CORS(app)
 
 @app.route('/')
 def visualizer_proxy():
-    r = requests.get('http://localhost:8080/')
+    r = http_client.get('http://localhost:8080/')
     return Response(r.content, content_type = r.headers['content-type'])
 
 @app.route('/<path:subpath>')
 def service_proxy(subpath):
     # This will proxy all other requests to the orchestration_service
-    r = requests.get(f'http://localhost:5006/{subpath}')
+    r = http_client.get(f'http://localhost:5006/{subpath}')
     return Response(r.content, content_type = r.headers['content-type'])
 
 if __name__ == '__main__':
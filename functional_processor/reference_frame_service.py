@@ -3,38 +3,50 @@ from flask_cors import CORS
 import numpy as np
 import logging
 
+from frame_codec import accepts_csv, read_frames, frames_response, wants_binary
+from session_store import SessionStore, session_id
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 
 app = Flask(__name__)
 CORS(app)
 
-# In-memory store for the reference frame
-_reference_frame_data = None
+class _Reference:
+    """
+    The reference frame of one session: a resident float32 array, serialized only when requested.
+    """
+
+    def __init__(self):
+        self.frame = None
+
+# Reference frames by session (the `session` query parameter), see session_store.py
+_sessions = SessionStore.from_env(_Reference)
 
-def _set_reference_frame_data(frame_data: str) -> str:
+@accepts_csv("frame_data")
+def _set_reference_frame_data(frame_data: np.ndarray) -> np.ndarray:
     """
     Pure function to validate and prepare reference frame data.
+    Returns an owned float32 copy, since the input may be a read-only view of a request body.
     """
     try:
-        # Validate that the data can be converted to a numpy array
-        frame_array = np.fromstring(frame_data, sep=',')
-        return ','.join(map(str, frame_array))
+        # Validate that the data is numeric
+        return np.array(frame_data, dtype=np.float32)
     except Exception as e:
         logging.error(f"Error processing reference frame data: {e}")
         raise
 
 @app.route('/set_reference_frame', methods=['POST'])
 def set_reference_frame():
-    global _reference_frame_data
-    data = request.json
-    if not data or 'frame_data' not in data:
-        return jsonify({"error": "Invalid request: 'frame_data' is required."}), 400
+    try:
+        arrays, _ = read_frames(request, ('frame_data',))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    frame_data = data.get('frame_data')
-    
     try:
-        _reference_frame_data = _set_reference_frame_data(frame_data)
+        frame = _set_reference_frame_data(arrays['frame_data'])
+        with _sessions.session(session_id(request)) as reference:
+            reference.frame = frame
         logging.info(f"Reference frame set.")
         return jsonify({"status": "reference frame set"}), 200
     except Exception as e:
@@ -42,10 +54,17 @@ def set_reference_frame():
 
 @app.route('/get_reference_frame', methods=['GET'])
 def get_reference_frame():
-    if _reference_frame_data is not None:
-        return jsonify({"status": "success", "reference_frame": _reference_frame_data}), 200
-    else:
-        return jsonify({"error": "Reference frame not set"}), 404
+    with _sessions.session(session_id(request), create=False) as reference:
+        if reference is not None and reference.frame is not None:
+            return frames_response({"reference_frame": reference.frame}, wants_binary(request), status="success")
+    return jsonify({"error": "Reference frame not set"}), 404
+
+@app.route('/session_metrics', methods=['GET'])
+def session_metrics():
+    """
+    Returns the session store's counters (sessions held, created and evicted).
+    """
+    return jsonify(_sessions.metrics()), 200
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5003)
@@ -1,26 +1,34 @@
-import requests
-import json
 import numpy as np
 
+from frame_codec import from_csv
+from service_calls import PostFrames, run
+from session_store import session_query
+
 # Define the URLs for the functional services
 DCT_SERVICE_URL = "http://localhost:5002"
 REFERENCE_FRAME_SERVICE_URL = "http://localhost:5003"
 
-def set_reference_logic(image_data: str):
+def set_reference_logic(image_data: np.ndarray | str, session: str | None = None):
     """
-    Sets the reference frame for the processing pipeline.
+    Sets the reference frame for the processing pipeline (of `session`).
     Expects 'image_data' in the request body.
     """
-    if not image_data:
+    return run(set_reference_steps(image_data, session))
+
+def set_reference_steps(image_data: np.ndarray | str, session: str | None = None):
+    """
+    The steps of `set_reference_logic`, for either orchestrator (see service_calls.py).
+    """
+    if image_data is None or not np.size(image_data):
         raise ValueError("Invalid request: 'image_data' is required.")
+    if isinstance(image_data, str):
+        image_data = from_csv(image_data)
 
     # First, perform forward DCT on the image data to get the reference frame in DCT domain
-    dct_response = requests.post(f"{DCT_SERVICE_URL}/forward_dct", json={'frame_id': 'reference', 'image_data': image_data})
-    dct_response.raise_for_status()
-    reference_dct_data = dct_response.json().get('dct_data')
+    dct_arrays, _ = yield PostFrames(f"{DCT_SERVICE_URL}/forward_dct", {'image_data': image_data}, frame_id='reference')
+    reference_dct_data = dct_arrays['dct_data']
 
     # Then, set this DCT data as the reference frame
-    set_ref_response = requests.post(f"{REFERENCE_FRAME_SERVICE_URL}/set_reference_frame", json={'frame_data': reference_dct_data})
-    set_ref_response.raise_for_status()
+    yield PostFrames(f"{REFERENCE_FRAME_SERVICE_URL}/set_reference_frame{session_query(session)}", {'frame_data': reference_dct_data})
 
     return {"status": "reference frame set"}
@@ -0,0 +1,81 @@
+"""
+The orchestration logic's calls to the functional services, described as data, so that the
+logic is written once and runs under both orchestrators.
+
+The pipeline steps (in frame_processor.py, reference_manager.py and output_retriever.py) are
+generators: they yield the calls they need and are sent back the results, and return their own
+result at the end. `run` makes the calls with the pooled blocking client (http_client.py), for
+the Flask orchestrator; async_orchestration_service.py drives the same generators with its
+asyncio client. A yielded tuple holds independent calls, which a driver may make concurrently;
+it is sent back a tuple of their results.
+"""
+import http_client
+from frame_codec import encode_frames, decode_response, OCTET_STREAM
+
+# Result of a conditional `GetFrames` whose version is still current (304)
+NOT_MODIFIED = object()
+
+class PostFrames:
+    """
+    POSTs named arrays to a service as a binary frame message. Results in the decoded reply,
+    `(arrays, meta)`.
+    """
+
+    def __init__(self, url: str, arrays: dict, **meta):
+        self.url = url
+        self.body = encode_frames(arrays, **meta)
+        self.headers = {"Content-Type": OCTET_STREAM, "Accept": OCTET_STREAM}
+
+    def result(self, response):
+        response.raise_for_status()
+        return decode_response(response)
+
+class GetFrames:
+    """
+    GETs named arrays from a service as a binary frame message. Results in `(arrays, meta)`, None
+    if the service has nothing to return yet (404), or NOT_MODIFIED if `version` is given and
+    still current.
+    """
+    body = None
+
+    def __init__(self, url: str, version: str | None = None):
+        self.url = url
+        self.headers = {"Accept": OCTET_STREAM}
+        if version is not None:
+            self.headers["If-None-Match"] = f'"{version}"'
+
+    def result(self, response):
+        if response.status_code == 304:
+            return NOT_MODIFIED
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return decode_response(response)
+
+class Compute:
+    """
+    CPU-bound work done in this process, such as a local inverse DCT or the JPEG encode; the
+    async driver runs it off the event loop. Results in `function(*args)`.
+    """
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+def _make(call):
+    if isinstance(call, Compute):
+        return call.function(*call.args)
+    if call.body is None:
+        return call.result(http_client.get(call.url, headers=call.headers))
+    return call.result(http_client.post(call.url, data=call.body, headers=call.headers))
+
+def run(steps):
+    """
+    Runs pipeline steps, making their calls one after the other, and returns their result.
+    """
+    try:
+        call = next(steps)
+        while True:
+            call = steps.send(tuple(map(_make, call)) if isinstance(call, tuple) else _make(call))
+    except StopIteration as stop:
+        return stop.value
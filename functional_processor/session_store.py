@@ -0,0 +1,128 @@
+"""
+Per-session state for the stateful services (reference frame and accumulator), and for the
+orchestrators' caches of their output.
+
+Each video stream names its session with the `session` query parameter (which the
+orchestrators pass on to the services, see `session_query`); requests without one
+use the "default" session, so single-stream clients need no changes. Every session has its own
+state object and lock, so streams never see each other's frames and requests for different
+streams do not wait on each other. Sessions not used for a while are evicted, as are the least
+recently used ones beyond the session cap, so abandoned streams do not hold frames forever.
+Sessions in use and the default session are never evicted.
+
+    SESSION_IDLE_TIMEOUT  seconds a session may go unused before it is evicted (default 300)
+    SESSION_MAX_SESSIONS  sessions kept at once (default 64)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+DEFAULT_SESSION = "default"
+
+def session_id(req) -> str:
+    """
+    The session a Flask request belongs to.
+    """
+    return req.args.get('session') or DEFAULT_SESSION
+
+def session_query(session: str | None, **params) -> str:
+    """
+    Client side: the query string ('?...', or '' if empty) naming `session` to a stateful
+    service, followed by the other `params` that are not None.
+    """
+    query = {key: value for key, value in {'session': session, **params}.items() if value is not None}
+    return f"?{urlencode(query)}" if query else ""
+
+class _Session:
+    def __init__(self, state, now: float):
+        self.state = state
+        self.lock = threading.Lock()
+        self.last_used = now
+        # Requests holding or waiting for `lock`; changed under the store's lock
+        self.users = 0
+
+class SessionStore:
+    """
+    Mapping of session id to a state object made by `factory`, in least-recently-used order.
+    Safe to use from several request threads.
+    """
+
+    def __init__(self, factory, idle_timeout: float, max_sessions: int, clock=time.monotonic):
+        if idle_timeout <= 0 or max_sessions <= 0:
+            raise ValueError("Session store limits must be positive")
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions = OrderedDict()  # session_id -> _Session
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('created', 'idle_evictions', 'evictions'), 0)
+
+    @classmethod
+    def from_env(cls, factory) -> 'SessionStore':
+        return cls(
+            factory,
+            idle_timeout=float(os.environ.get('SESSION_IDLE_TIMEOUT', '300')),
+            max_sessions=int(os.environ.get('SESSION_MAX_SESSIONS', '64')),
+        )
+
+    @contextmanager
+    def session(self, session_id: str, create: bool = True):
+        """
+        Holds the session's lock and yields its state, creating the session if needed. With
+        `create=False`, yields None for a session that does not exist instead.
+        """
+        with self._lock:
+            now = self.clock()
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            if entry is None and create:
+                entry = self._sessions[session_id] = _Session(self.factory(), now)
+                self._counters['created'] += 1
+                self._evict(now)
+            if entry is not None:
+                self._sessions.move_to_end(session_id)
+                entry.last_used = now
+                # Counted before the store lock is released, so eviction can't race the caller
+                entry.users += 1
+
+        if entry is None:
+            yield None
+            return
+        try:
+            with entry.lock:
+                yield entry.state
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = self.clock()
+
+    def _evictable(self, session_id: str, entry: _Session) -> bool:
+        # Sessions in use are never evicted, nor is the default session: every caller that
+        # names no session relies on it
+        return not entry.users and session_id != DEFAULT_SESSION
+
+    def _evict(self, now: float):
+        for session_id, entry in list(self._sessions.items()):
+            if now - entry.last_used > self.idle_timeout and self._evictable(session_id, entry):
+                del self._sessions[session_id]
+                self._counters['idle_evictions'] += 1
+        # The most recently used session always stays
+        for session_id, entry in list(self._sessions.items())[:-1]:
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if self._evictable(session_id, entry):
+                del self._sessions[session_id]
+                self._counters['evictions'] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'idle_timeout': self.idle_timeout,
+                **self._counters,
+            }
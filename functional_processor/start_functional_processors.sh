@@ -18,7 +18,12 @@ nohup uv run python dct_service.py > logs/dct_service.log 2>&1 &
 nohup uv run python reference_frame_service.py > logs/reference_frame_service.log 2>&1 &
 nohup uv run python difference_service.py > logs/difference_service.log 2>&1 &
 nohup uv run python accumulator_service.py > logs/accumulator_service.log 2>&1 &
-nohup uv run python orchestration_service.py > logs/orchestration_service.log 2>&1 &
+# ORCHESTRATOR=async runs the asyncio orchestrator on the same port instead of the Flask one
+if [ "$ORCHESTRATOR" = "async" ]; then
+    nohup uv run python async_orchestration_service.py > logs/orchestration_service.log 2>&1 &
+else
+    nohup uv run python orchestration_service.py > logs/orchestration_service.log 2>&1 &
+fi
 nohup uv run python proxy_server.py > logs/proxy_server.log 2>&1 &
 # I will create this visualizer service next
 nohup uv run python visualizer_service.py > logs/visualizer_service.log 2>&1 &
@@ -1,6 +1,9 @@
 import unittest
 import numpy as np
-from accumulator_service import _accumulate
+from unittest.mock import patch
+import accumulator_service
+from accumulator_service import app, _accumulate, _accumulate_blocks, _DirtyBlocks
+from frame_codec import encode_frames, decode_frames, OCTET_STREAM
 
 class TestAccumulatorService(unittest.TestCase):
 
@@ -59,5 +62,157 @@ class TestAccumulatorService(unittest.TestCase):
 
         self.assertTrue(np.allclose(accumulated_array, expected_accumulation))
 
+    def test_accumulate_arrays_in_place(self):
+        current_data = np.zeros((2, 3), dtype=np.float32)
+        new_part = np.arange(6, dtype=np.float64).reshape(2, 3)
+        new_part.flags.writeable = False
+
+        accumulated = _accumulate(current_data, new_part)
+        accumulated = _accumulate(accumulated, new_part)
+
+        self.assertIs(accumulated, current_data)
+        self.assertTrue(np.array_equal(accumulated, 2 * new_part))
+
+    def test_accumulate_first_part_is_owned_float32_copy(self):
+        new_part = np.arange(4, dtype=np.uint8)
+        new_part.flags.writeable = False
+
+        accumulated = _accumulate(None, new_part)
+
+        self.assertEqual(accumulated.dtype, np.float32)
+        self.assertTrue(accumulated.flags.writeable)
+        self.assertFalse(np.shares_memory(accumulated, new_part))
+
+    def test_accumulate_arrays_grows_to_longer_part(self):
+        accumulated = _accumulate(np.ones(2, dtype=np.float32), np.ones(3))
+
+        self.assertTrue(np.array_equal(accumulated, [2, 2, 1]))
+        self.assertEqual(accumulated.dtype, np.float32)
+
+    def test_accumulate_blocks_updates_listed_blocks_in_place(self):
+        current_data = np.ones((8, 12, 3), dtype=np.float32)
+        block_data = np.stack([np.full((4, 4, 3), 2.0), np.full((4, 4, 3), 3.0)])
+
+        accumulated = _accumulate_blocks(current_data, np.array([1, 5], dtype=np.uint32), block_data, (8, 12, 3), 4)
+
+        self.assertIs(accumulated, current_data)
+        self.assertTrue(np.all(accumulated[0:4, 4:8] == 3.0))
+        self.assertTrue(np.all(accumulated[4:8, 8:12] == 4.0))
+        self.assertEqual(np.count_nonzero(accumulated != 1.0), 2 * 4 * 4 * 3)
+
+    def test_accumulate_blocks_starts_from_zeros(self):
+        accumulated = _accumulate_blocks(None, np.array([0]), np.ones((1, 2, 2)), (2, 4), 2)
+
+        self.assertEqual(accumulated.dtype, np.float32)
+        self.assertTrue(np.array_equal(accumulated, [[1, 1, 0, 0], [1, 1, 0, 0]]))
+        with self.assertRaises(ValueError):
+            _accumulate_blocks(accumulated, np.array([0]), np.ones((1, 2, 2)), (4, 4), 2)
+        with self.assertRaises(ValueError):
+            _accumulate_blocks(accumulated, np.array([2]), np.ones((1, 2, 2)), (2, 4), 2)
+        with self.assertRaises(ValueError):
+            _accumulate_blocks(accumulated, np.array([1, 1]), np.ones((2, 2, 2)), (2, 4), 2)
+
+    def test_dirty_blocks_track_versions(self):
+        dirty = _DirtyBlocks(4)
+        frame = np.zeros((8, 8))
+        dirty.mark(frame)
+        dirty.mark(frame, np.array([3]))
+        dirty.mark(frame, np.array([1, 3]))
+
+        self.assertEqual(dirty.changed_since(1).tolist(), [1, 3])
+        self.assertEqual(dirty.changed_since(2).tolist(), [1, 3])
+        self.assertEqual(dirty.changed_since(3).tolist(), [])
+        self.assertIsNone(dirty.changed_since(0))
+        self.assertIsNone(dirty.changed_since(None))
+        dirty.reset()
+        self.assertIsNone(dirty.changed_since(3))
+        self.assertEqual(dirty.changed_blocks(np.pad(np.ones((4, 4)), ((4, 0), (0, 4)))).tolist(), [2])
+        self.assertIsNone(_DirtyBlocks(0).changed_blocks(frame))
+
+    def test_untracked_blocks_report_no_change_at_current_version(self):
+        dirty = _DirtyBlocks(0)
+        dirty.mark(np.zeros(6))
+
+        self.assertEqual(dirty.changed_since(1).tolist(), [])
+        self.assertIsNone(dirty.changed_since(0))
+        dirty.mark(np.zeros(6))
+        self.assertIsNone(dirty.changed_since(1))
+
+        client = app.test_client()
+        client.post('/accumulate_frame?session=untracked', json={'frame_part': '1,2'})
+        _, meta = decode_frames(client.get('/get_accumulated_blocks?session=untracked', headers={'Accept': OCTET_STREAM}).data)
+        arrays, _ = decode_frames(client.get(f'/get_accumulated_blocks?session=untracked&since={meta["version"]}', headers={'Accept': OCTET_STREAM}).data)
+        self.assertEqual(arrays['block_indices'].tolist(), [])
+        self.assertNotIn('accumulated_frame', arrays)
+        client.post('/reset_accumulator?session=untracked')
+
+    def test_get_accumulated_blocks_returns_changed_blocks(self):
+        client = app.test_client()
+        frame_part = np.zeros((8, 8, 3))
+        frame_part[4:, 4:] = 1.0
+        headers = {'Accept': OCTET_STREAM}
+
+        with patch.object(accumulator_service, 'DCT_BLOCK_SIZE', 4):
+            client.post('/accumulate_frame?session=blocks', data=encode_frames({'frame_part': np.ones((8, 8, 3))}), content_type=OCTET_STREAM)
+            arrays, meta = decode_frames(client.get('/get_accumulated_blocks?session=blocks', headers=headers).data)
+            self.assertEqual(list(arrays), ['accumulated_frame'])
+            version = meta['version']
+
+            client.post('/accumulate_frame?session=blocks', data=encode_frames({'frame_part': frame_part}), content_type=OCTET_STREAM)
+            arrays, meta = decode_frames(client.get(f'/get_accumulated_blocks?session=blocks&since={version}', headers=headers).data)
+            self.assertEqual(arrays['block_indices'].tolist(), [3])
+            self.assertTrue(np.all(arrays['block_data'] == 2.0))
+            self.assertEqual((meta['shape'], meta['block_size']), ([8, 8, 3], 4))
+            self.assertNotEqual(meta['version'], version)
+
+            client.post('/accumulate_blocks?session=blocks', data=encode_frames({'block_indices': np.array([0], dtype=np.uint32), 'block_data': np.ones((1, 4, 4, 3))}, shape=[8, 8, 3], block_size=4), content_type=OCTET_STREAM)
+            arrays, _ = decode_frames(client.get(f'/get_accumulated_blocks?session=blocks&since={version}', headers=headers).data)
+            self.assertEqual(arrays['block_indices'].tolist(), [0, 3])
+            # Versions from another accumulator state (e.g. before a restart) get the whole frame
+            arrays, _ = decode_frames(client.get('/get_accumulated_blocks?session=blocks&since=other-1', headers=headers).data)
+            self.assertEqual(list(arrays), ['accumulated_frame'])
+            client.post('/reset_accumulator?session=blocks')
+
+    def test_get_accumulated_frame_conditional(self):
+        client = app.test_client()
+        client.post('/reset_accumulator')
+        client.post('/accumulate_frame', json={'frame_part': '1,2'})
+
+        response = client.get('/get_accumulated_frame', headers={'Accept': OCTET_STREAM})
+        _, meta = decode_frames(response.data)
+        self.assertEqual(response.headers['ETag'], f'"{meta["version"]}"')
+
+        response = client.get('/get_accumulated_frame', headers={'If-None-Match': f'"{meta["version"]}"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        client.post('/accumulate_frame', json={'frame_part': '1,2'})
+        response = client.get('/get_accumulated_frame', headers={'If-None-Match': f'"{meta["version"]}"'})
+        self.assertEqual(response.status_code, 200)
+        client.post('/reset_accumulator')
+
+    def test_sessions_accumulate_separately(self):
+        client = app.test_client()
+        client.post('/accumulate_frame?session=a', json={'frame_part': '1,2'})
+        client.post('/accumulate_frame?session=a', json={'frame_part': '1,2'})
+        client.post('/accumulate_frame?session=b', json={'frame_part': '5,5'})
+
+        frames = {}
+        for session in ('a', 'b'):
+            arrays, meta = decode_frames(client.get(f'/get_accumulated_frame?session={session}', headers={'Accept': OCTET_STREAM}).data)
+            frames[session] = (arrays['accumulated_frame'].tolist(), meta['version'])
+        self.assertEqual(frames['a'][0], [2, 4])
+        self.assertEqual(frames['b'][0], [5, 5])
+        # Versions belong to their session
+        self.assertNotEqual(frames['a'][1].rpartition('-')[0], frames['b'][1].rpartition('-')[0])
+        response = client.get('/get_accumulated_frame?session=b', headers={'If-None-Match': f'"{frames["a"][1]}"'})
+        self.assertEqual(response.status_code, 200)
+
+        client.post('/reset_accumulator?session=a')
+        self.assertEqual(client.get('/get_accumulated_frame?session=a').status_code, 404)
+        self.assertEqual(client.get('/get_accumulated_frame?session=b').status_code, 200)
+        self.assertEqual(client.get('/get_accumulated_frame?session=unknown').status_code, 404)
+        client.post('/reset_accumulator?session=b')
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,286 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import base64
+import json
+import httpx
+import numpy as np
+import async_orchestration_service
+from async_orchestration_service import app, ServiceClient, DCT_SERVICE_URL, REFERENCE_FRAME_SERVICE_URL, DIFFERENCE_SERVICE_URL, ACCUMULATOR_SERVICE_URL
+from frame_codec import encode_frames, decode_frames, OCTET_STREAM
+from fused_pipeline import FusedPipeline
+import output_retriever
+from output_retriever import _EncodedFrame
+from session_store import SessionStore
+
+def _binary_response(**arrays):
+    return httpx.Response(200, content=encode_frames(arrays), headers={'Content-Type': OCTET_STREAM})
+
+class FakeServices:
+    """
+    Stands in for the downstream services: answers each URL from `routes`, records the decoded
+    requests, and tracks how many calls are in flight per service.
+    """
+
+    def __init__(self, routes, delay=0.0):
+        self.routes = routes
+        self.delay = delay
+        self.calls = []
+        self.in_flight = {}
+        self.max_in_flight = {}
+
+    async def __call__(self, request):
+        host = request.url.netloc.decode()
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        self.max_in_flight[host] = max(self.max_in_flight.get(host, 0), self.in_flight[host])
+        try:
+            await asyncio.sleep(self.delay)
+            url = str(request.url)
+            body = decode_frames(request.content) if request.headers.get('Content-Type') == OCTET_STREAM else None
+            self.calls.append((request.method, url, body))
+            return self.routes[url]()
+        finally:
+            self.in_flight[host] -= 1
+
+    def posted(self, url):
+        for method, call_url, body in self.calls:
+            if method == 'POST' and call_url == url:
+                return body
+        raise AssertionError(f"No POST to {url}")
+
+class TestAsyncOrchestrationService(unittest.TestCase):
+
+    def _run(self, services, requests, concurrency=4, window=4):
+        """
+        Sends `requests` (method, path, kwargs) to the app concurrently, with the downstream
+        services replaced by `services`. Returns the responses in order.
+        """
+        async def run():
+            async_orchestration_service.service_client = ServiceClient(concurrency, transport=httpx.MockTransport(services))
+            async_orchestration_service.frame_pipeline = async_orchestration_service.new_frame_pipeline(window)
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+                    return await asyncio.gather(*(client.request(method, path, **kwargs) for method, path, kwargs in requests))
+            finally:
+                await async_orchestration_service.service_client.aclose()
+                async_orchestration_service.service_client = None
+                async_orchestration_service.frame_pipeline = None
+        return asyncio.run(run())
+
+    def _frame_routes(self, reference=True):
+        routes = {
+            f"{DCT_SERVICE_URL}/forward_dct": lambda: _binary_response(dct_data=np.array([0.1, 0.2])),
+            f"{DIFFERENCE_SERVICE_URL}/calculate_difference": lambda: _binary_response(difference_data=np.array([0.05, 0.1])),
+            f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame": lambda: httpx.Response(200, json={'status': 'frame accumulated'}),
+        }
+        if reference:
+            routes[f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame"] = lambda: _binary_response(reference_frame=np.array([0.05, 0.1]))
+        else:
+            routes[f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame"] = lambda: httpx.Response(404, json={'error': 'Reference frame not set'})
+        return routes
+
+    def test_process_frame_with_reference(self):
+        services = FakeServices(self._frame_routes())
+        [response] = self._run(services, [('POST', '/process_frame', {'json': {'frame_id': '1', 'image_data': '1,2'}})])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'frame processed', 'frame_id': '1'})
+
+        arrays, meta = services.posted(f"{DCT_SERVICE_URL}/forward_dct")
+        self.assertTrue(np.array_equal(arrays['image_data'], [1, 2]))
+        self.assertEqual(meta, {'frame_id': '1'})
+        arrays, _ = services.posted(f"{DIFFERENCE_SERVICE_URL}/calculate_difference")
+        self.assertTrue(np.array_equal(arrays['dct1'], [0.1, 0.2]))
+        self.assertTrue(np.array_equal(arrays['dct2'], [0.05, 0.1]))
+        arrays, _ = services.posted(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame")
+        self.assertTrue(np.array_equal(arrays['frame_part'], [0.05, 0.1]))
+
+    def test_process_frame_sparse_difference(self):
+        routes = self._frame_routes()
+        routes[f"{DIFFERENCE_SERVICE_URL}/calculate_difference"] = lambda: httpx.Response(200, content=encode_frames(
+            {'block_indices': np.array([1], dtype=np.uint32), 'block_data': np.ones((1, 4, 4))}, shape=[4, 8], block_size=4,
+        ), headers={'Content-Type': OCTET_STREAM})
+        routes[f"{ACCUMULATOR_SERVICE_URL}/accumulate_blocks"] = lambda: httpx.Response(200, json={'status': 'frame accumulated'})
+        services = FakeServices(routes)
+
+        with patch('frame_processor.SPARSE_BLOCK_SIZE', 4):
+            [response] = self._run(services, [('POST', '/process_frame', {'json': {'frame_id': '1', 'image_data': '1,2'}})])
+        self.assertEqual(response.status_code, 200)
+
+        _, meta = services.posted(f"{DIFFERENCE_SERVICE_URL}/calculate_difference")
+        self.assertEqual(meta, {'block_size': 4, 'threshold': 0.0})
+        arrays, meta = services.posted(f"{ACCUMULATOR_SERVICE_URL}/accumulate_blocks")
+        self.assertEqual(arrays['block_indices'].tolist(), [1])
+        self.assertEqual(meta, {'shape': [4, 8], 'block_size': 4})
+
+    def test_process_frame_with_shape(self):
+        services = FakeServices(self._frame_routes(reference=False))
+        frame = np.arange(16 * 24 * 3) % 256
+        [response] = self._run(services, [('POST', '/process_frame', {'json': {'frame_id': '1', 'image_data': ','.join(map(str, frame)), 'shape': [16, 24, 3]}})])
+        self.assertEqual(response.status_code, 200)
+
+        # The DCT service gets a shaped frame, as its blockwise mode needs
+        arrays, _ = services.posted(f"{DCT_SERVICE_URL}/forward_dct")
+        self.assertEqual(arrays['image_data'].shape, (16, 24, 3))
+
+    def test_sessions_are_passed_to_the_services(self):
+        routes = self._frame_routes(reference=False)
+        routes = {url.replace('get_reference_frame', 'get_reference_frame?session=s1').replace('accumulate_frame', 'accumulate_frame?session=s1'): route for url, route in routes.items()}
+        routes[f"{ACCUMULATOR_SERVICE_URL}/reset_accumulator?session=s1"] = lambda: httpx.Response(200, json={'status': 'accumulator reset'})
+        services = FakeServices(routes)
+
+        responses = self._run(services, [
+            ('POST', '/process_frame?session=s1', {'json': {'frame_id': '1', 'image_data': '1,2'}}),
+            ('POST', '/reset_accumulator?session=s1', {}),
+        ])
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertIn(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame?session=s1", [url for _, url, _ in services.calls])
+
+    def test_process_frame_no_reference(self):
+        services = FakeServices(self._frame_routes(reference=False))
+        frame = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+        [response] = self._run(services, [('POST', '/process_frame', {'content': encode_frames({'image_data': frame}, frame_id='7'), 'headers': {'Content-Type': OCTET_STREAM}})])
+        self.assertEqual(response.json(), {'status': 'frame processed', 'frame_id': '7'})
+
+        arrays, _ = services.posted(f"{DCT_SERVICE_URL}/forward_dct")
+        self.assertEqual(arrays['image_data'].shape, (2, 2, 3))
+        arrays, _ = services.posted(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame")
+        self.assertTrue(np.array_equal(arrays['frame_part'], [0.1, 0.2]))
+        self.assertNotIn(f"{DIFFERENCE_SERVICE_URL}/calculate_difference", [url for _, url, _ in services.calls])
+
+    def test_forward_dct_and_reference_fetch_overlap(self):
+        services = FakeServices(self._frame_routes(), delay=0.05)
+        in_flight = []
+        original = services.__call__
+
+        async def tracking(request):
+            in_flight.append(sum(services.in_flight.values()))
+            return await original(request)
+
+        [response] = self._run(tracking, [('POST', '/process_frame', {'json': {'frame_id': '1', 'image_data': '1,2'}})])
+        self.assertEqual(response.status_code, 200)
+        # The reference fetch starts while the forward DCT is still in flight
+        self.assertEqual(in_flight[:2], [0, 1])
+
+    def test_concurrency_is_bounded_per_service(self):
+        services = FakeServices(self._frame_routes(), delay=0.01)
+        requests = [('POST', '/process_frame', {'json': {'frame_id': str(i), 'image_data': '1,2'}}) for i in range(12)]
+        responses = self._run(services, requests, concurrency=3)
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual([response.json()['frame_id'] for response in responses], [str(i) for i in range(12)])
+        # Frames were in flight together, but no service saw more than 3 calls at once
+        self.assertEqual(max(services.max_in_flight.values()), 3)
+
+    def test_process_frames(self):
+        services = FakeServices(self._frame_routes(reference=False))
+        frames = np.arange(3, dtype=np.uint8)[:, None].repeat(4, axis=1)
+        [response, invalid] = self._run(services, [
+            ('POST', '/process_frames', {'content': encode_frames({'image_data': frames}, frame_ids=list('abc')), 'headers': {'Content-Type': OCTET_STREAM}}),
+            ('POST', '/process_frames', {'json': {'frames': 'not a list'}}),
+        ])
+
+        self.assertEqual(response.json(), {'status': 'frames processed', 'frame_ids': ['a', 'b', 'c']})
+        self.assertEqual([url for _, url, _ in services.calls].count(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame"), 3)
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_process_frames_accumulates_in_batch_order(self):
+        services = FakeServices(self._frame_routes(reference=False))
+
+        async def early_frames_slowest(request):
+            # Echoes the frame as its DCT, later frames first
+            if request.url.path == '/forward_dct':
+                arrays, meta = decode_frames(request.content)
+                await asyncio.sleep(0.01 * (5 - int(meta['frame_id'])))
+                return _binary_response(dct_data=arrays['image_data'].astype(float))
+            return await services(request)
+
+        frames = np.arange(5, dtype=np.uint8)[:, None].repeat(2, axis=1)
+        [response] = self._run(early_frames_slowest, [
+            ('POST', '/process_frames', {'content': encode_frames({'image_data': frames}, frame_ids=[str(i) for i in range(5)]), 'headers': {'Content-Type': OCTET_STREAM}}),
+        ], window=3)
+
+        self.assertEqual(response.status_code, 200)
+        accumulated = [body[0]['frame_part'][0] for _, url, body in services.calls if url == f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame"]
+        self.assertEqual(accumulated, [0, 1, 2, 3, 4])
+
+    def test_get_processed_frame(self):
+        services = FakeServices({
+            f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame": lambda: _binary_response(accumulated_frame=np.zeros((4, 6, 3))),
+            f"{DCT_SERVICE_URL}/inverse_dct": lambda: _binary_response(image_data=np.full((4, 6, 3), 128.0)),
+        })
+        [response, legacy] = self._run(services, [
+            ('GET', '/get_processed_frame', {}),
+            ('GET', '/get_processed_frame', {'headers': {'Accept': 'application/json'}}),
+        ])
+        self.assertEqual(response.headers['Content-Type'], 'image/jpeg')
+        self.assertEqual(base64.b64decode(legacy.json()['image_data_b64']), response.content)
+        arrays, meta = services.posted(f"{DCT_SERVICE_URL}/inverse_dct")
+        self.assertEqual(arrays['dct_data'].shape, (4, 6, 3))
+        self.assertEqual(meta, {'frame_id': 'accumulated'})
+
+    def test_get_processed_frame_conditional(self):
+        responses = iter([
+            httpx.Response(200, content=encode_frames({'accumulated_frame': np.zeros((4, 6, 3))}, version='abc-1'), headers={'Content-Type': OCTET_STREAM}),
+            httpx.Response(304),
+        ])
+        services = FakeServices({
+            f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame": lambda: next(responses),
+            f"{DCT_SERVICE_URL}/inverse_dct": lambda: _binary_response(image_data=np.full((4, 6, 3), 128.0)),
+        })
+        with patch.object(output_retriever, '_encoded_frames', SessionStore(_EncodedFrame, idle_timeout=60, max_sessions=4)):
+            [first] = self._run(services, [('GET', '/get_processed_frame', {})])
+            [second] = self._run(services, [('GET', '/get_processed_frame', {'headers': {'If-None-Match': '"abc-1"'}})])
+
+        self.assertEqual(first.headers['ETag'], '"abc-1"')
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual([url for _, url, _ in services.calls].count(f"{DCT_SERVICE_URL}/inverse_dct"), 1)
+
+    def test_set_reference(self):
+        services = FakeServices({
+            f"{DCT_SERVICE_URL}/forward_dct": lambda: _binary_response(dct_data=np.array([0.1, 0.2])),
+            f"{REFERENCE_FRAME_SERVICE_URL}/set_reference_frame": lambda: httpx.Response(200, json={'status': 'reference frame set'}),
+        })
+        [response] = self._run(services, [('POST', '/set_reference', {'json': {'image_data': '1,2,3'}})])
+        self.assertEqual(response.json(), {'status': 'reference frame set'})
+        arrays, _ = services.posted(f"{REFERENCE_FRAME_SERVICE_URL}/set_reference_frame")
+        self.assertTrue(np.array_equal(arrays['frame_data'], [0.1, 0.2]))
+
+    def test_process_frame_missing_image_data(self):
+        [response] = self._run(FakeServices({}), [('POST', '/process_frame', {'json': {'frame_id': '1'}})])
+        self.assertEqual(response.status_code, 400)
+
+    def test_service_error(self):
+        services = FakeServices({
+            f"{DCT_SERVICE_URL}/forward_dct": lambda: httpx.Response(500, json={'error': 'boom'}),
+            f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame": lambda: httpx.Response(404, json={}),
+        })
+        [response] = self._run(services, [('POST', '/process_frame', {'json': {'frame_id': '1', 'image_data': '1,2'}})])
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('Service communication error', response.json()['error'])
+
+    def test_proxy_passes_binary_through(self):
+        body = encode_frames({'dct_data': np.array([1.0, 2.0])})
+        services = FakeServices({f"{DCT_SERVICE_URL}/forward_dct": lambda: httpx.Response(200, content=body, headers={'Content-Type': OCTET_STREAM})})
+        [response] = self._run(services, [('POST', '/dct_service/forward_dct', {'json': {'image_data': '1,2'}})])
+        self.assertEqual(response.content, body)
+
+    def test_proxy_passes_not_modified_through(self):
+        services = FakeServices({f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame": lambda: httpx.Response(304, headers={'ETag': '"abc-1"'})})
+        [response] = self._run(services, [('GET', '/accumulator_service/get_accumulated_frame', {'headers': {'If-None-Match': '"abc-1"'}})])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], '"abc-1"')
+
+    def test_fused_engine_skips_the_network(self):
+        services = FakeServices({})
+        with patch('async_orchestration_service.fused_pipeline', FusedPipeline()):
+            responses = self._run(services, [
+                ('POST', '/set_reference', {'json': {'image_data': '1,2,3,4'}}),
+                ('POST', '/process_frame', {'json': {'frame_id': '1', 'image_data': '2,3,4,5'}}),
+                ('POST', '/reset_accumulator', {}),
+            ])
+        self.assertEqual(json.loads(responses[1].content), {'status': 'frame processed', 'frame_id': '1'})
+        self.assertEqual(responses[2].json(), {'status': 'accumulator reset'})
+        self.assertEqual(services.calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 import numpy as np
-from scipy.fftpack import dct, idct
-from dct_service import _perform_forward_dct, _perform_inverse_dct
+from scipy.fftpack import dct, idct, dctn
+from dct_service import app, _perform_forward_dct, _perform_inverse_dct
+from frame_codec import encode_frames, decode_frames, OCTET_STREAM
 
 class TestDCTService(unittest.TestCase):
 
@@ -48,5 +49,52 @@ class TestDCTService(unittest.TestCase):
         # Compare the original and reconstructed data
         self.assertTrue(np.allclose(original_image_data, reconstructed_image_data))
 
+    def test_forward_dct_binary_keeps_shape(self):
+        frame = (np.random.rand(4, 6, 3) * 255).astype(np.uint8)
+        client = app.test_client()
+
+        response = client.post('/forward_dct', data=encode_frames({'image_data': frame}, frame_id='f1'), content_type=OCTET_STREAM)
+        arrays, meta = decode_frames(response.data)
+
+        self.assertEqual(response.mimetype, OCTET_STREAM)
+        self.assertEqual(meta, {'status': 'forward DCT complete', 'frame_id': 'f1'})
+        self.assertEqual(arrays['dct_data'].shape, (4, 6, 3))
+        self.assertTrue(np.allclose(arrays['dct_data'].reshape(-1), dct(frame.reshape(-1).astype(float), norm='ortho')))
+
+    def test_forward_dct_json_legacy_form(self):
+        response = app.test_client().post('/forward_dct', json={'frame_id': 'f1', 'image_data': '1,2,3,4'})
+
+        self.assertTrue(np.allclose(np.fromstring(response.get_json()['dct_data'], sep=','), dct([1, 2, 3, 4], norm='ortho')))
+
+    def test_block_dct_transforms_each_block(self):
+        frame = np.random.rand(16, 24, 3) * 255
+
+        dct_data = _perform_forward_dct(frame, "test_frame", block_size=8)
+
+        self.assertEqual(dct_data.shape, (16, 24, 3))
+        for y, x, c in [(0, 0, 0), (8, 16, 2), (0, 8, 1)]:
+            expected = dctn(frame[y:y + 8, x:x + 8, c], norm='ortho')
+            self.assertTrue(np.allclose(dct_data[y:y + 8, x:x + 8, c], expected))
+        self.assertTrue(np.allclose(_perform_inverse_dct(dct_data, "test_frame", block_size=8), frame))
+
+    def test_block_dct_uses_shape_metadata(self):
+        frame = np.random.rand(4, 4)
+        response = app.test_client().post('/forward_dct', json={'frame_id': 'f1', 'image_data': ','.join(map(str, frame.reshape(-1))), 'block_size': 4, 'shape': [4, 4]})
+        result = response.get_json()
+
+        self.assertEqual(result['block_size'], 4)
+        self.assertTrue(np.allclose(np.fromstring(result['dct_data'], sep=','), dctn(frame, norm='ortho').reshape(-1)))
+
+    def test_block_dct_rejects_indivisible_frames(self):
+        client = app.test_client()
+        response = client.post('/forward_dct', data=encode_frames({'image_data': np.zeros((10, 16))}, frame_id='f1', block_size=8), content_type=OCTET_STREAM)
+        self.assertEqual(response.status_code, 400)
+        response = client.post('/inverse_dct', json={'frame_id': 'f1', 'dct_data': '1,2,3,4', 'block_size': 8})
+        self.assertEqual(response.status_code, 400)
+
+    def test_forward_dct_missing_frame_id(self):
+        response = app.test_client().post('/forward_dct', json={'image_data': '1,2'})
+        self.assertEqual(response.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
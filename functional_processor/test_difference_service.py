@@ -1,6 +1,7 @@
 import unittest
 import numpy as np
-from difference_service import _calculate_dct_difference
+from difference_service import app, _calculate_dct_difference, _sparse_dct_difference
+from frame_codec import encode_frames, decode_frames, OCTET_STREAM
 
 class TestDifferenceService(unittest.TestCase):
 
@@ -62,5 +63,33 @@ class TestDifferenceService(unittest.TestCase):
 
         self.assertTrue(np.allclose(actual_diff, expected_diff))
 
+    def test_sparse_difference_keeps_changed_blocks(self):
+        reference = np.random.rand(8, 12, 3).astype(np.float32)
+        frame = reference.copy()
+        frame[0:4, 4:8] += 1.0     # block 1
+        frame[4:8, 8:12, 2] += 0.01  # block 5, below the threshold
+
+        block_indices, block_data = _sparse_dct_difference(frame, reference, 4, threshold=0.1)
+
+        self.assertEqual(block_indices.tolist(), [1])
+        self.assertEqual(block_data.shape, (1, 4, 4, 3))
+        self.assertTrue(np.allclose(block_data[0], 1.0))
+        self.assertEqual(_sparse_dct_difference(frame, reference, 4)[0].tolist(), [1, 5])
+
+    def test_sparse_difference_route(self):
+        reference = np.zeros((8, 8))
+        frame = reference.copy()
+        frame[4:, :4] = 2.0
+
+        response = app.test_client().post('/calculate_difference', data=encode_frames({'dct1': frame, 'dct2': reference}, block_size=4), content_type=OCTET_STREAM)
+        arrays, meta = decode_frames(response.data)
+
+        self.assertEqual(meta, {'status': 'sparse difference calculated', 'shape': [8, 8], 'block_size': 4})
+        self.assertEqual(arrays['block_indices'].tolist(), [2])
+        self.assertTrue(np.array_equal(arrays['block_data'], np.full((1, 4, 4), 2.0)))
+
+        response = app.test_client().post('/calculate_difference', data=encode_frames({'dct1': np.zeros((6, 8)), 'dct2': np.zeros((6, 8))}, block_size=4), content_type=OCTET_STREAM)
+        self.assertEqual(response.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
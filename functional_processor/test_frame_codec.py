@@ -0,0 +1,58 @@
+import unittest
+import json
+import numpy as np
+from frame_codec import encode_frames, decode_frames, accepts_csv, from_csv, to_csv, reshape_frame, parse_frame_batch
+
+class TestFrameCodec(unittest.TestCase):
+
+    def test_round_trip_preserves_names_shapes_and_meta(self):
+        frame = (np.random.rand(4, 6, 3) * 255).astype(np.uint8)
+        coeffs = np.random.rand(5)
+
+        arrays, meta = decode_frames(encode_frames({'image_data': frame, 'dct_data': coeffs}, frame_id='42'))
+
+        self.assertEqual(list(arrays), ['image_data', 'dct_data'])
+        self.assertEqual(arrays['image_data'].dtype, np.uint8)
+        self.assertTrue(np.array_equal(arrays['image_data'], frame))
+        self.assertTrue(np.array_equal(arrays['dct_data'], coeffs))
+        self.assertEqual(meta, {'frame_id': '42'})
+
+    def test_zlib_compression(self):
+        frame = np.zeros((64, 64))
+
+        message = encode_frames({'frame_part': frame}, compression='zlib')
+        arrays, meta = decode_frames(message)
+
+        self.assertLess(len(message), frame.nbytes // 10)
+        self.assertTrue(np.array_equal(arrays['frame_part'], frame))
+        self.assertEqual(meta, {})
+
+    def test_rejects_bad_magic_and_truncation(self):
+        with self.assertRaises(ValueError):
+            decode_frames(b'JUNK' + bytes(16))
+        with self.assertRaises(ValueError):
+            decode_frames(encode_frames({'a': np.zeros(8)})[:-8])
+
+    def test_accepts_csv_keeps_legacy_strings(self):
+        @accepts_csv('values')
+        def double(values, label):
+            return values * 2
+
+        self.assertEqual(double('1.0,2.5', 'x'), '2.0,5.0')
+        self.assertTrue(np.array_equal(double(np.array([1.0, 2.5]), 'x'), [2.0, 5.0]))
+        self.assertTrue(np.array_equal(from_csv(to_csv(np.eye(2))), [1, 0, 0, 1]))
+
+    def test_reshape_frame(self):
+        flat = from_csv(','.join(map(str, range(24))))
+
+        self.assertEqual(reshape_frame(flat, [2, 4, 3]).shape, (2, 4, 3))
+        self.assertIs(reshape_frame(flat, None), flat)
+        with self.assertRaises(ValueError):
+            reshape_frame(flat, [5, 5])
+        with self.assertRaises(ValueError):
+            reshape_frame(flat, 'wide')
+        [(_, frame)] = parse_frame_batch('application/json', json.dumps({'frames': [{'frame_id': '1', 'image_data': '1,2,3,4', 'shape': [2, 2]}]}).encode())
+        self.assertEqual(frame.shape, (2, 2))
+
+if __name__ == '__main__':
+    unittest.main()
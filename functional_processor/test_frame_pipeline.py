@@ -0,0 +1,116 @@
+import unittest
+import asyncio
+import threading
+import time
+import numpy as np
+from frame_pipeline import FramePipeline, AsyncFramePipeline
+
+class TestFramePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.accumulated = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _transform(self, frame_id, image_data, session):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Later frames finish their transform first
+            time.sleep(0.02 / (int(frame_id) + 1))
+            if frame_id == '2':
+                raise ValueError("bad frame")
+            return np.asarray(image_data) * 10
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _accumulate(self, frame_part, session):
+        self.accumulated.append(int(frame_part[0]))
+
+    def test_frames_accumulate_in_submission_order(self):
+        pipeline = FramePipeline(4, transform=self._transform, accumulate=self._accumulate)
+        futures = [pipeline.submit(str(i), np.array([i])) for i in range(8)]
+        results = [future.exception() or future.result() for future in futures]
+        pipeline.shutdown()
+
+        self.assertEqual(self.accumulated, [0, 10, 30, 40, 50, 60, 70])
+        self.assertIsInstance(results[2], ValueError)
+        self.assertEqual(results[3], {'status': 'frame processed', 'frame_id': '3'})
+
+    def test_window_bounds_frames_in_flight(self):
+        pipeline = FramePipeline(3, transform=self._transform, accumulate=self._accumulate)
+        futures = [pipeline.submit(str(i), np.array([i])) for i in range(3, 12)]
+        for future in futures:
+            future.result()
+        pipeline.shutdown()
+
+        self.assertLessEqual(self.max_in_flight, 3)
+        self.assertGreater(self.max_in_flight, 1)
+        self.assertEqual(self.accumulated, [i * 10 for i in range(3, 12)])
+
+    def test_process_frames_raises_after_the_batch_finishes(self):
+        pipeline = FramePipeline(2, transform=self._transform, accumulate=self._accumulate)
+        with self.assertRaises(ValueError):
+            pipeline.process_frames([(str(i), np.array([i])) for i in range(5)])
+        pipeline.shutdown()
+        self.assertEqual(self.accumulated, [0, 10, 30, 40])
+
+    def test_invalid_frames_are_rejected(self):
+        pipeline = FramePipeline(2, transform=self._transform, accumulate=self._accumulate)
+        with self.assertRaises(ValueError):
+            pipeline.submit('', np.array([1]))
+        with self.assertRaises(ValueError):
+            FramePipeline(0)
+        pipeline.shutdown()
+
+class TestAsyncFramePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.accumulated = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _transform(self, frame_id, image_data, session):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Later frames finish their transform first
+            await asyncio.sleep(0.02 / (int(frame_id) + 1))
+            if frame_id == '2':
+                raise ValueError("bad frame")
+            return np.asarray(image_data) * 10
+        finally:
+            self.in_flight -= 1
+
+    async def _accumulate(self, frame_part, session):
+        self.accumulated.append(int(frame_part[0]))
+
+    def _run(self, window, frames):
+        async def run():
+            pipeline = AsyncFramePipeline(window, self._transform, self._accumulate)
+            return await pipeline.process_frames([(str(i), np.array([i])) for i in frames])
+        return asyncio.run(run())
+
+    def test_frames_accumulate_in_submission_order_within_the_window(self):
+        results = self._run(3, range(3, 12))
+
+        self.assertEqual(self.accumulated, [i * 10 for i in range(3, 12)])
+        self.assertEqual(results[0], {'status': 'frame processed', 'frame_id': '3'})
+        self.assertEqual(self.max_in_flight, 3)
+
+    def test_process_frames_raises_after_the_batch_finishes(self):
+        with self.assertRaises(ValueError):
+            self._run(2, range(5))
+        self.assertEqual(self.accumulated, [0, 10, 30, 40])
+
+    def test_invalid_frames_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self._run(2, [''])
+        with self.assertRaises(ValueError):
+            AsyncFramePipeline(0, self._transform, self._accumulate)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import patch
+import gc
+import os
+import tempfile
+import numpy as np
+from frame_store import FrameStore
+import image_input_service
+
+class TestFrameStore(unittest.TestCase):
+
+    def test_evicts_least_recently_used_over_frame_cap(self):
+        store = FrameStore(max_bytes=1000, max_frames=2)
+        store['a'] = 'aaa'
+        store['b'] = 'bbb'
+        store.get('a')
+        store['c'] = 'ccc'
+
+        self.assertNotIn('b', store)
+        self.assertEqual(store['a'], 'aaa')
+        self.assertIsNone(store.get('b'))
+        metrics = store.metrics()
+        self.assertEqual((metrics['frames'], metrics['bytes'], metrics['evictions'], metrics['misses']), (2, 6, 1, 1))
+
+    def test_evicts_over_byte_budget_but_keeps_newest(self):
+        store = FrameStore(max_bytes=10, max_frames=100)
+        store['a'] = 'x' * 6
+        store['b'] = 'y' * 6
+        self.assertEqual(list(store._frames), ['b'])
+
+        store['c'] = 'z' * 50
+        self.assertEqual(store['c'], 'z' * 50)
+        self.assertEqual(len(store), 1)
+
+    def test_replacing_a_frame_updates_its_size(self):
+        store = FrameStore(max_bytes=100, max_frames=10)
+        store['a'] = 'x' * 40
+        store['a'] = 'x' * 10
+        self.assertEqual(store.metrics()['bytes'], 10)
+
+    def test_spills_evicted_frames_to_disk(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            store = FrameStore(max_bytes=100, max_frames=1, spill_dir=spill_dir, spill_max_bytes=64)
+            array = np.arange(6, dtype=np.float32).reshape(2, 3)
+            store['a'] = 'first'
+            store['b'] = array
+            store['c'] = b'third'
+
+            self.assertEqual(store['a'], 'first')
+            spilled = store['b']
+            self.assertIsInstance(spilled, np.memmap)
+            self.assertTrue(np.array_equal(spilled, array))
+            self.assertEqual(store['c'], b'third')
+
+            # A 60 byte frame leaves room for nothing else in the spill tier
+            store['d'] = 'd' * 60
+            store['e'] = 'e'
+            self.assertNotIn('a', store)
+            self.assertNotIn('b', store)
+            self.assertEqual(store['d'], 'd' * 60)
+
+            metrics = store.metrics()
+            self.assertEqual(metrics['spills'], 4)
+            self.assertEqual(metrics['spill_evictions'], 3)
+            self.assertEqual((metrics['spilled_frames'], metrics['spilled_bytes']), (1, 60))
+
+            store.close()
+            self.assertEqual(os.listdir(spill_dir), [])
+
+    def test_spill_directory_is_removed_with_the_store(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            store = FrameStore(max_bytes=100, max_frames=1, spill_dir=spill_dir, spill_max_bytes=64)
+            store['a'] = 'first'
+            store['b'] = 'second'
+            self.assertEqual(len(os.listdir(spill_dir)), 1)
+
+            del store
+            gc.collect()
+            self.assertEqual(os.listdir(spill_dir), [])
+
+class TestImageInputServiceFrameStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = FrameStore(max_bytes=1000, max_frames=2)
+        patcher = patch('image_input_service.frame_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = image_input_service.app.test_client()
+
+    def test_input_frame_requires_string_frame_data(self):
+        response = self.app.post('/input_frame', json={'frame_id': '1', 'frame_data': [1, 2, 3]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("'frame_data' must be a string", response.get_json()['error'])
+        self.assertNotIn('1', self.store)
+
+    def test_frame_store_metrics(self):
+        for frame_id in 'abc':
+            self.assertEqual(self.app.post('/input_frame', json={'frame_id': frame_id, 'frame_data': 'xyz'}).status_code, 200)
+        self.assertEqual(self.app.get('/get_frame/c').get_json()['frame_data'], 'xyz')
+        self.assertEqual(self.app.get('/get_frame/a').status_code, 404)
+
+        metrics = self.app.get('/frame_store_metrics').get_json()
+        self.assertEqual((metrics['frames'], metrics['bytes'], metrics['max_frames']), (2, 6, 2))
+        self.assertEqual((metrics['hits'], metrics['misses'], metrics['evictions']), (1, 1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
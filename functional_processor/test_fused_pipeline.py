@@ -0,0 +1,103 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import numpy as np
+import cv2
+from scipy.fftpack import dct, idct
+from fused_pipeline import FusedPipeline
+
+class TestFusedPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.pipeline = FusedPipeline()
+
+    def test_process_frame_without_reference_accumulates_dct(self):
+        frame = np.random.rand(2, 4, 3) * 255
+
+        self.pipeline.process_frame('1', frame)
+        self.pipeline.process_frame('2', frame)
+
+        expected = 2 * dct(frame.reshape(-1), norm='ortho')
+        self.assertEqual(self.pipeline.accumulated_frame_data.shape, (2, 4, 3))
+        self.assertTrue(np.allclose(self.pipeline.accumulated_frame_data.reshape(-1), expected, atol=1e-3))
+
+    def test_process_frame_accumulates_difference_to_reference(self):
+        reference = np.random.rand(8) * 255
+        frame = np.random.rand(8) * 255
+
+        self.pipeline.set_reference(reference)
+        self.pipeline.process_frame('1', frame)
+
+        expected = dct(frame, norm='ortho') - dct(reference, norm='ortho')
+        self.assertTrue(np.allclose(self.pipeline.accumulated_frame_data, expected, atol=1e-3))
+        self.assertTrue(np.allclose(idct(self.pipeline.accumulated_frame_data, norm='ortho'), frame - reference, atol=1e-3))
+
+    def test_get_processed_frame(self):
+        self.assertEqual(self.pipeline.get_processed_frame(), {"status": "no accumulated data"})
+
+        self.pipeline.process_frame('1', np.full((4, 4, 3), 100.0))
+        result = self.pipeline.get_processed_frame()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertIn('image_jpeg', result)
+
+    @patch('dct_service.DCT_BLOCK_SIZE', 4)
+    def test_get_processed_frame_grayscale(self):
+        self.pipeline.process_frame('1', np.full((8, 12), 100.0))
+        result = self.pipeline.get_processed_frame()
+
+        self.assertEqual(result['status'], 'success')
+        decoded = cv2.imdecode(np.frombuffer(result['image_jpeg'], np.uint8), cv2.IMREAD_UNCHANGED)
+        self.assertEqual(decoded.shape, (8, 12))
+
+    def test_get_processed_frame_is_cached_per_version(self):
+        self.pipeline.process_frame('1', np.full((4, 4, 3), 100.0))
+        first = self.pipeline.get_processed_frame()
+        self.assertIs(self.pipeline.get_processed_frame(), first)
+        self.assertEqual(first['version'], self.pipeline.version)
+
+        self.pipeline.process_frame('2', np.full((4, 4, 3), 100.0))
+        second = self.pipeline.get_processed_frame()
+        self.assertNotEqual(second['version'], first['version'])
+
+    def test_get_processed_frame_renders_outside_the_lock(self):
+        self.pipeline.process_frame('1', np.full((4, 4, 3), 100.0))
+        processed = []
+
+        def inverse_dct(data, frame_id):
+            # A frame arriving mid-render is neither blocked nor mixed into this render
+            self.pipeline.process_frame('2', np.full((4, 4, 3), 100.0))
+            processed.append(frame_id)
+            return idct(data.reshape(-1), norm='ortho').reshape(data.shape)
+
+        with patch('fused_pipeline._perform_inverse_dct', side_effect=inverse_dct):
+            result = self.pipeline.get_processed_frame()
+
+        self.assertEqual(processed, ['accumulated'])
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['version'].rpartition('-')[2], '1')
+        # Not cached, as it is already stale
+        self.assertIsNot(self.pipeline.get_processed_frame(), result)
+
+    def test_reset_clears_accumulated_frame(self):
+        self.pipeline.process_frame('1', np.ones(4))
+        self.pipeline.reset()
+        self.assertIsNone(self.pipeline.accumulated_frame_data)
+
+    def test_process_frame_requires_frame_id(self):
+        with self.assertRaises(ValueError):
+            self.pipeline.process_frame('', np.ones(4))
+
+    def test_concurrent_frames_are_all_accumulated(self):
+        frame = np.random.rand(16, 16, 3) * 255
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda i: self.pipeline.process_frame(str(i), frame), range(32)))
+
+        single = FusedPipeline()
+        single.process_frame('1', frame)
+        self.assertTrue(np.allclose(self.pipeline.accumulated_frame_data, 32 * single.accumulated_frame_data, rtol=1e-4, atol=1e-2))
+        self.assertEqual(self.pipeline.version.rpartition('-')[2], '32')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import http_client
+
+class TestHttpClient(unittest.TestCase):
+
+    def tearDown(self):
+        http_client.close_all()
+
+    def test_one_session_per_service(self):
+        first = http_client.session_for("http://localhost:5002/forward_dct")
+        second = http_client.session_for("http://localhost:5002/inverse_dct")
+        other = http_client.session_for("http://localhost:5003/get_reference_frame")
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    def test_sessions_pool_and_retry(self):
+        adapter = http_client.session_for("http://localhost:5004/").get_adapter("http://localhost:5004/")
+
+        self.assertEqual(adapter._pool_maxsize, http_client.POOL_SIZE)
+        self.assertEqual(adapter.max_retries.connect, http_client.RETRIES)
+        self.assertNotIn("POST", adapter.max_retries.allowed_methods)
+
+    def test_default_timeout_is_applied(self):
+        session = http_client.session_for("http://localhost:5005/")
+        calls = []
+        session.request = lambda method, url, **kwargs: calls.append(kwargs)
+
+        http_client.post("http://localhost:5005/accumulate_frame", data=b"")
+        http_client.get("http://localhost:5005/get_accumulated_frame", timeout=1)
+
+        self.assertEqual(calls, [{"data": b"", "timeout": http_client.TIMEOUT}, {"timeout": 1}])
+
+if __name__ == '__main__':
+    unittest.main()
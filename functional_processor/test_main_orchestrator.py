@@ -0,0 +1,74 @@
+import unittest
+import sys
+from unittest.mock import patch, MagicMock
+import main_orchestrator
+from main_orchestrator import DCTCache, process_video_frame, DCT_SERVICE
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestDCTCache(unittest.TestCase):
+
+    def test_keys_on_content(self):
+        self.assertEqual(DCTCache.key('1,2,3'), DCTCache.key(b'1,2,3'))
+        self.assertNotEqual(DCTCache.key('1,2,3'), DCTCache.key('1,2,4'))
+
+    def test_evicts_least_recently_used_over_budget(self):
+        size = sys.getsizeof('aaaa')
+        cache = DCTCache(max_bytes=2 * size + 1, ttl=60)
+        cache.put('a', 'aaaa')
+        cache.put('b', 'bbbb')
+        cache.get('a')
+        cache.put('c', 'cccc')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'aaaa')
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['bytes'], 2 * size)
+
+    def test_sizes_entries_in_bytes_held(self):
+        cache = DCTCache(max_bytes=1000, ttl=60)
+        cache.put('ascii', '1,2')
+        cache.put('wide', '\u00e9' * 3)
+
+        # Larger than their length in characters, and wider characters take more bytes
+        self.assertGreater(cache.stats()['bytes'], 6)
+        self.assertGreater(DCTCache.sizeof('\u20ac' * 100), DCTCache.sizeof('a' * 100))
+        self.assertEqual(DCTCache.sizeof([1.5, 2.5]), sys.getsizeof('[1.5, 2.5]'))
+
+    def test_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = DCTCache(max_bytes=100, ttl=5, clock=clock)
+        cache.put('a', 'aaaa')
+        clock.now = 4
+        self.assertEqual(cache.get('a'), 'aaaa')
+        clock.now = 10
+        self.assertIsNone(cache.get('a'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations'], stats['entries']), (1, 1, 1, 0))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+class TestMainOrchestrator(unittest.TestCase):
+
+    @patch('http_client.get')
+    @patch('http_client.post')
+    def test_repeated_content_skips_the_dct(self, mock_post, mock_get):
+        response = MagicMock()
+        response.json.return_value = {"dct_data": "1,2", "reference_frame": "1,2", "difference_data": "0,0", "accumulated_frame": "0,0"}
+        mock_post.return_value = mock_get.return_value = response
+
+        with patch.object(main_orchestrator, 'dct_cache', DCTCache(max_bytes=1000, ttl=60)) as cache:
+            process_video_frame(1, "frame_content")
+            process_video_frame(2, "frame_content")
+
+        dct_calls = [call for call in mock_post.call_args_list if call.args[0] == f"{DCT_SERVICE}/forward_dct"]
+        self.assertEqual(len(dct_calls), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,34 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
+import base64
 import numpy as np
+import cv2
 from orchestration_service import app
 from frame_processor import process_frame_logic, DCT_SERVICE_URL, REFERENCE_FRAME_SERVICE_URL, DIFFERENCE_SERVICE_URL, ACCUMULATOR_SERVICE_URL
+import output_retriever
 from output_retriever import get_processed_frame_logic
+import dct_service
+from dct_service import _perform_forward_dct, _perform_inverse_dct
 from reference_manager import set_reference_logic
+from frame_codec import encode_frames, decode_frames, OCTET_STREAM
+from fused_pipeline import FusedPipeline
+from frame_pipeline import FramePipeline
+from session_store import SessionStore, DEFAULT_SESSION
+
+def _binary_response(meta=None, **arrays):
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {'Content-Type': OCTET_STREAM}
+    response.content = encode_frames(arrays, **(meta or {}))
+    return response
+
+def _json_response(status_code=200, **body):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = {'Content-Type': 'application/json'}
+    response.json.return_value = body
+    return response
 
 class TestOrchestrationService(unittest.TestCase):
 
@@ -13,37 +36,25 @@ class TestOrchestrationService(unittest.TestCase):
         self.app = app.test_client()
         self.app.testing = True
 
-    @patch('requests.post')
-    @patch('requests.get')
+    def _posted(self, mock_post, url):
+        """
+        Decodes the binary message of the call to `url`.
+        """
+        for call in mock_post.call_args_list:
+            if call.args[0] == url:
+                self.assertEqual(call.kwargs['headers']['Content-Type'], OCTET_STREAM)
+                return decode_frames(call.kwargs['data'])
+        self.fail(f"No POST to {url}")
+
+    @patch('http_client.post')
+    @patch('http_client.get')
     def test_process_frame_with_reference(self, mock_get, mock_post):
-        # Mock DCT service response for forward_dct
-        mock_dct_fwd_response = MagicMock()
-        mock_dct_fwd_response.status_code = 200
-        mock_dct_fwd_response.json.return_value = {'dct_data': ",".join(map(str, np.array([0.1, 0.2])))}
-        mock_post.return_value = mock_dct_fwd_response
-
-        # Mock Reference Frame service response for get_reference_frame
-        mock_ref_get_response = MagicMock()
-        mock_ref_get_response.status_code = 200
-        mock_ref_get_response.json.return_value = {'reference_frame': ",".join(map(str, np.array([0.05, 0.1])))}
-        mock_get.return_value = mock_ref_get_response
-
-        # Mock Difference service response
-        mock_diff_response = MagicMock()
-        mock_diff_response.status_code = 200
-        mock_diff_response.json.return_value = {'difference_data': ",".join(map(str, np.array([0.05, 0.1])))}
-        mock_post.side_effect = [mock_dct_fwd_response, mock_diff_response, MagicMock(status_code=200)] # Order matters for side_effect
-
-        # Mock Accumulator service response
-        mock_accumulate_response = MagicMock()
-        mock_accumulate_response.status_code = 200
-
-        # Adjust side_effect for mock_post to handle multiple calls correctly
+        mock_get.return_value = _binary_response(reference_frame=np.array([0.05, 0.1]))
         # First call: DCT forward, Second call: Difference, Third call: Accumulate
         mock_post.side_effect = [
-            mock_dct_fwd_response, # for /forward_dct
-            mock_diff_response,    # for /calculate_difference
-            mock_accumulate_response # for /accumulate_frame
+            _binary_response(dct_data=np.array([0.1, 0.2])), # for /forward_dct
+            _binary_response(difference_data=np.array([0.05, 0.1])), # for /calculate_difference
+            _json_response(status="frame accumulated") # for /accumulate_frame
         ]
 
         response = self.app.post('/process_frame', data=json.dumps({'frame_id': '1', 'image_data': '1,2'}), content_type='application/json')
@@ -51,32 +62,24 @@ class TestOrchestrationService(unittest.TestCase):
         self.assertEqual(json.loads(response.data), {'status': 'frame processed', 'frame_id': '1'})
 
         # Verify calls
-        mock_post.assert_any_call(f"{DCT_SERVICE_URL}/forward_dct", json={'frame_id': '1', 'image_data': '1,2'})
-        mock_get.assert_any_call(f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame")
-        mock_post.assert_any_call(f"{DIFFERENCE_SERVICE_URL}/calculate_difference", json={'dct1': ",".join(map(str, np.array([0.1, 0.2]))), 'dct2': ",".join(map(str, np.array([0.05, 0.1])))})
-        mock_post.assert_any_call(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame", json={'frame_part': ",".join(map(str, np.array([0.05, 0.1])))})
+        arrays, meta = self._posted(mock_post, f"{DCT_SERVICE_URL}/forward_dct")
+        self.assertTrue(np.array_equal(arrays['image_data'], [1, 2]))
+        self.assertEqual(meta, {'frame_id': '1'})
+        mock_get.assert_called_once_with(f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame", headers={'Accept': OCTET_STREAM})
+        arrays, _ = self._posted(mock_post, f"{DIFFERENCE_SERVICE_URL}/calculate_difference")
+        self.assertTrue(np.array_equal(arrays['dct1'], [0.1, 0.2]))
+        self.assertTrue(np.array_equal(arrays['dct2'], [0.05, 0.1]))
+        arrays, _ = self._posted(mock_post, f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame")
+        self.assertTrue(np.array_equal(arrays['frame_part'], [0.05, 0.1]))
 
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('http_client.post')
+    @patch('http_client.get')
     def test_process_frame_no_reference(self, mock_get, mock_post):
-        # Mock DCT service response for forward_dct
-        mock_dct_fwd_response = MagicMock()
-        mock_dct_fwd_response.status_code = 200
-        mock_dct_fwd_response.json.return_value = {'dct_data': ",".join(map(str, np.array([0.1, 0.2])))}
-
-        # Mock Reference Frame service response for get_reference_frame (no reference)
-        mock_ref_get_response = MagicMock()
-        mock_ref_get_response.status_code = 200
-        mock_ref_get_response.json.return_value = {'reference_frame': None}
-        mock_get.return_value = mock_ref_get_response
-
-        # Mock Accumulator service response
-        mock_accumulate_response = MagicMock()
-        mock_accumulate_response.status_code = 200
-
+        # The reference frame service answers 404 until a reference is set
+        mock_get.return_value = _json_response(404, error="Reference frame not set")
         mock_post.side_effect = [
-            mock_dct_fwd_response, # for /forward_dct
-            mock_accumulate_response # for /accumulate_frame
+            _binary_response(dct_data=np.array([0.1, 0.2])), # for /forward_dct
+            _json_response(status="frame accumulated") # for /accumulate_frame
         ]
 
         response = self.app.post('/process_frame', data=json.dumps({'frame_id': '1', 'image_data': '1,2'}), content_type='application/json')
@@ -84,57 +87,301 @@ class TestOrchestrationService(unittest.TestCase):
         self.assertEqual(json.loads(response.data), {'status': 'frame processed', 'frame_id': '1'})
 
         # Verify calls
-        mock_post.assert_any_call(f"{DCT_SERVICE_URL}/forward_dct", json={'frame_id': '1', 'image_data': '1,2'})
-        mock_get.assert_any_call(f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame")
-        mock_post.assert_any_call(f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame", json={'frame_part': ",".join(map(str, np.array([0.1, 0.2])))})
+        self._posted(mock_post, f"{DCT_SERVICE_URL}/forward_dct")
+        arrays, _ = self._posted(mock_post, f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame")
+        self.assertTrue(np.array_equal(arrays['frame_part'], [0.1, 0.2]))
         # Ensure difference service was NOT called
+        self.assertEqual(mock_post.call_count, 2)
 
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_process_frame_binary_request(self, mock_get, mock_post):
+        frame = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+        mock_get.return_value = _json_response(404, error="Reference frame not set")
+        mock_post.side_effect = [_binary_response(dct_data=frame.astype(float)), _json_response(status="frame accumulated")]
+
+        response = self.app.post('/process_frame', data=encode_frames({'image_data': frame}, frame_id='7'), content_type=OCTET_STREAM)
+        self.assertEqual(response.status_code, 200)
+
+        arrays, meta = self._posted(mock_post, f"{DCT_SERVICE_URL}/forward_dct")
+        self.assertEqual(arrays['image_data'].dtype, np.uint8)
+        self.assertEqual(arrays['image_data'].shape, (2, 2, 3))
+        self.assertEqual(meta, {'frame_id': '7'})
+
+    @patch('http_client.post')
+    @patch('http_client.get')
     def test_get_processed_frame(self, mock_get, mock_post):
-        # Mock Accumulator service response
-        mock_accumulated_response = MagicMock()
-        mock_accumulated_response.status_code = 200
-        mock_accumulated_response.json.return_value = {'accumulated_frame': ",".join(map(str, np.array([0.3, 0.4])))}
-        mock_get.return_value = mock_accumulated_response
-
-        # Mock IDCT service response
-        mock_idct_response = MagicMock()
-        mock_idct_response.status_code = 200
-        mock_idct_response.json.return_value = {'image_data': ",".join(map(str, np.array([1.0, 2.0])))}
-        mock_post.return_value = mock_idct_response
+        frame = np.full((4, 6, 3), 128.0)
+        mock_get.return_value = _binary_response(accumulated_frame=np.zeros((4, 6, 3)))
+        mock_post.return_value = _binary_response(image_data=frame)
 
         response = self.app.get('/get_processed_frame')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(json.loads(response.data), {'status': 'success', 'image_data': ",".join(map(str, np.array([1.0, 2.0])))})
+        self.assertEqual(response.content_type, 'image/jpeg')
+        decoded = cv2.imdecode(np.frombuffer(response.data, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, (4, 6, 3))
 
-        mock_get.assert_called_once_with(f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame")
-        expected_idct_payload = {'frame_id': 'accumulated', 'dct_data': ",".join(map(str, np.array([0.3, 0.4])))}
-        mock_post.assert_called_once_with(f"{DCT_SERVICE_URL}/inverse_dct", json=expected_idct_payload)
+        mock_get.assert_called_once_with(f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame", headers={'Accept': OCTET_STREAM})
+        arrays, meta = self._posted(mock_post, f"{DCT_SERVICE_URL}/inverse_dct")
+        self.assertEqual(arrays['dct_data'].shape, (4, 6, 3))
+        self.assertEqual(meta, {'frame_id': 'accumulated'})
 
-    @patch('requests.post')
-    def test_set_reference(self, mock_post):
-        # Mock DCT service response for forward_dct
-        mock_dct_fwd_response = MagicMock()
-        mock_dct_fwd_response.status_code = 200
-        mock_dct_fwd_response.json.return_value = {'dct_data': ",".join(map(str, np.array([0.1, 0.2])))}
+        # Clients that only accept JSON still get the base64 encoded JPEG
+        jpeg = response.data
+        response = self.app.get('/get_processed_frame', headers={'Accept': 'application/json'})
+        result = json.loads(response.data)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(base64.b64decode(result['image_data_b64']), jpeg)
+
+    @patch('frame_processor.SPARSE_BLOCK_SIZE', 4)
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_process_frame_sparse_difference(self, mock_get, mock_post):
+        mock_get.return_value = _binary_response(reference_frame=np.zeros((4, 8)))
+        sparse = _binary_response({'shape': [4, 8], 'block_size': 4}, block_indices=np.array([1], dtype=np.uint32), block_data=np.ones((1, 4, 4)))
+        mock_post.side_effect = [_binary_response(dct_data=np.ones((4, 8))), sparse, _json_response(status="frame accumulated")]
+
+        response = self.app.post('/process_frame', data=json.dumps({'frame_id': '1', 'image_data': '1,2'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        _, meta = self._posted(mock_post, f"{DIFFERENCE_SERVICE_URL}/calculate_difference")
+        self.assertEqual(meta, {'block_size': 4, 'threshold': 0.0})
+        arrays, meta = self._posted(mock_post, f"{ACCUMULATOR_SERVICE_URL}/accumulate_blocks")
+        self.assertEqual(arrays['block_indices'].tolist(), [1])
+        self.assertEqual(meta, {'shape': [4, 8], 'block_size': 4})
+
+    @patch('dct_service.DCT_BLOCK_SIZE', 4)
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_json_client_in_block_mode(self, mock_get, mock_post):
+        dct_client = dct_service.app.test_client()
+
+        def post(url, data, headers):
+            # The forward DCT runs on the real DCT service
+            if url == f"{DCT_SERVICE_URL}/forward_dct":
+                reply = dct_client.post('/forward_dct', data=data, headers=headers)
+                self.assertEqual(reply.status_code, 200, reply.data)
+                return _binary_response(**decode_frames(reply.data)[0])
+            return _json_response(status="ok")
+        mock_post.side_effect = post
+        mock_get.return_value = _json_response(404, error="Reference frame not set")
+        frame = np.random.randint(0, 256, (16, 24, 3))
+        body = {'image_data': ','.join(map(str, frame.reshape(-1))), 'shape': [16, 24, 3]}
+
+        reference = self.app.post('/set_reference', data=json.dumps(body), content_type='application/json')
+        response = self.app.post('/process_frame', data=json.dumps({'frame_id': '1', **body}), content_type='application/json')
+        invalid = self.app.post('/process_frame', data=json.dumps({'frame_id': '2', **body, 'shape': [16, 24]}), content_type='application/json')
+
+        self.assertEqual(reference.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(invalid.status_code, 400)
+        arrays, _ = self._posted(mock_post, f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame")
+        self.assertTrue(np.allclose(arrays['frame_part'], _perform_forward_dct(frame.astype(float), '1', block_size=4), atol=1e-3))
+
+    @patch('dct_service.DCT_BLOCK_SIZE', 4)
+    def test_json_client_in_block_mode_fused(self):
+        pipeline = FusedPipeline()
+        frame = np.random.randint(0, 256, (16, 24, 3))
+        body = {'frame_id': '1', 'image_data': ','.join(map(str, frame.reshape(-1))), 'shape': [16, 24, 3]}
+        with patch('orchestration_service.fused_pipeline', pipeline):
+            response = self.app.post('/process_frame', data=json.dumps(body), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(pipeline.accumulated_frame_data.shape, (16, 24, 3))
+
+    @patch('dct_service.DCT_BLOCK_SIZE', 4)
+    @patch('output_retriever.OUTPUT_IDCT', 'local')
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_get_processed_frame_local_idct(self, mock_get, mock_post):
+        frame = np.random.randint(0, 256, (8, 12, 3)).astype(float)
+        mock_get.return_value = _binary_response(accumulated_frame=_perform_forward_dct(frame, 'f', block_size=4))
+
+        result = get_processed_frame_logic()
+        buffer = output_retriever._image_buffers._image
+        get_processed_frame_logic()
+
+        self.assertEqual(result['status'], 'success')
+        decoded = cv2.imdecode(np.frombuffer(result['image_jpeg'], np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, (8, 12, 3))
+        mock_post.assert_not_called()
+        # The conversion buffers are reused between polls
+        self.assertIs(output_retriever._image_buffers._image, buffer)
+
+    @patch('output_retriever.OUTPUT_IDCT', 'incremental')
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_get_processed_frame_incremental(self, mock_get, mock_post):
+        accumulated = _perform_forward_dct(np.random.randint(0, 256, (8, 12, 3)).astype(float), 'f', block_size=4)
+        changed = accumulated.copy()
+        changed[4:8, 0:4] += 40.0
+        mock_get.side_effect = [
+            _binary_response({'version': 1}, accumulated_frame=accumulated),
+            _binary_response({'version': 2, 'shape': [8, 12, 3], 'block_size': 4}, block_indices=np.array([3], dtype=np.uint32), block_data=changed[None, 4:8, 0:4]),
+            _binary_response({'version': 2, 'shape': [8, 12, 3], 'block_size': 4}, block_indices=np.zeros(0, dtype=np.uint32), block_data=np.zeros((0, 4, 4, 3))),
+        ]
 
-        # Mock Reference Frame service response for set_reference_frame
-        mock_set_ref_response = MagicMock()
-        mock_set_ref_response.status_code = 200
+        frames = SessionStore(output_retriever._IncrementalFrame, idle_timeout=60, max_sessions=4)
+        with patch('dct_service.DCT_BLOCK_SIZE', 4), patch.object(output_retriever, '_incremental_frames', frames):
+            first = get_processed_frame_logic()
+            second = get_processed_frame_logic()
+            third = get_processed_frame_logic()
 
+            self.assertEqual(first['status'], 'success')
+            with frames.session(DEFAULT_SESSION) as frame:
+                self.assertTrue(np.allclose(frame.image, _perform_inverse_dct(changed, 'f', block_size=4), atol=1e-3))
+        # Nothing changed on the last poll, so the previous JPEG is returned as is
+        self.assertIs(third, second)
+        self.assertEqual([call.args[0] for call in mock_get.call_args_list], [
+            f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_blocks",
+            f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_blocks?since=1",
+            f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_blocks?since=2",
+        ])
+        mock_post.assert_not_called()
+
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_get_processed_frame_conditional(self, mock_get, mock_post):
+        not_modified = MagicMock()
+        not_modified.status_code = 304
+        mock_get.side_effect = [_binary_response({'version': 'abc-1'}, accumulated_frame=np.zeros((4, 6, 3))), not_modified]
+        mock_post.return_value = _binary_response(image_data=np.full((4, 6, 3), 128.0))
+
+        with patch.object(output_retriever, '_encoded_frames', SessionStore(output_retriever._EncodedFrame, idle_timeout=60, max_sessions=4)):
+            response = self.app.get('/get_processed_frame', headers={'Accept': 'application/json'})
+            self.assertEqual(response.headers['ETag'], '"abc-1"')
+            self.assertEqual(response.headers['Vary'], 'Accept')
+            self.assertEqual(json.loads(response.data)['version'], 'abc-1')
+
+            # Unchanged accumulator: no IDCT or encode, and 304 for a client that has this version
+            response = self.app.get('/get_processed_frame', headers={'If-None-Match': '"abc-1"'})
+            self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(mock_get.call_args_list[1].kwargs['headers'], {'Accept': OCTET_STREAM, 'If-None-Match': '"abc-1"'})
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch('http_client.post')
+    def test_set_reference(self, mock_post):
         mock_post.side_effect = [
-            mock_dct_fwd_response, # for /forward_dct
-            mock_set_ref_response  # for /set_reference_frame
+            _binary_response(dct_data=np.array([0.1, 0.2])), # for /forward_dct
+            _json_response(status="reference frame set")  # for /set_reference_frame
         ]
 
         response = self.app.post('/set_reference', data=json.dumps({'image_data': '1,2,3'}), content_type='application/json')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(json.loads(response.data), {'status': 'reference frame set'})
 
-        mock_post.assert_any_call(f"{DCT_SERVICE_URL}/forward_dct", json={'frame_id': 'reference', 'image_data': '1,2,3'})
-        expected_set_ref_payload = {'frame_data': ",".join(map(str, np.array([0.1, 0.2])))}
-        mock_post.assert_any_call(f"{REFERENCE_FRAME_SERVICE_URL}/set_reference_frame", json=expected_set_ref_payload)
+        arrays, meta = self._posted(mock_post, f"{DCT_SERVICE_URL}/forward_dct")
+        self.assertTrue(np.array_equal(arrays['image_data'], [1, 2, 3]))
+        self.assertEqual(meta, {'frame_id': 'reference'})
+        arrays, _ = self._posted(mock_post, f"{REFERENCE_FRAME_SERVICE_URL}/set_reference_frame")
+        self.assertTrue(np.array_equal(arrays['frame_data'], [0.1, 0.2]))
+
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_process_frames_streams_through_the_pipeline(self, mock_get, mock_post):
+        mock_get.return_value = _json_response(404, error="Reference frame not set")
+        accumulated = []
+
+        def post(url, data, headers):
+            arrays, _ = decode_frames(data)
+            if url == f"{DCT_SERVICE_URL}/forward_dct":
+                return _binary_response(dct_data=arrays['image_data'].astype(float))
+            accumulated.append(arrays['frame_part'][0, 0])
+            return _json_response(status="frame accumulated")
+        mock_post.side_effect = post
+
+        frames = np.arange(5, dtype=np.uint8)[:, None, None].repeat(2, axis=1).repeat(2, axis=2)
+        pipeline = FramePipeline(3)
+        with patch('orchestration_service.frame_pipeline', pipeline):
+            response = self.app.post('/process_frames', data=encode_frames({'image_data': frames}, frame_ids=list('abcde')), content_type=OCTET_STREAM)
+        pipeline.shutdown()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {'status': 'frames processed', 'frame_ids': list('abcde')})
+        self.assertEqual(accumulated, [0, 1, 2, 3, 4])
+
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_process_frames_json(self, mock_get, mock_post):
+        mock_get.return_value = _json_response(404, error="Reference frame not set")
+        mock_post.side_effect = [
+            _binary_response(dct_data=np.array([0.1, 0.2])), _json_response(status="frame accumulated"),
+            _binary_response(dct_data=np.array([0.3, 0.4])), _json_response(status="frame accumulated"),
+        ]
+
+        frames = [{'frame_id': '1', 'image_data': '1,2'}, {'frame_id': '2', 'image_data': '3,4'}]
+        response = self.app.post('/process_frames', data=json.dumps({'frames': frames}), content_type='application/json')
+        self.assertEqual(json.loads(response.data), {'status': 'frames processed', 'frame_ids': ['1', '2']})
+
+        response = self.app.post('/process_frames', data=encode_frames({'image_data': np.zeros((2, 4))}, frame_ids=['1']), content_type=OCTET_STREAM)
+        self.assertEqual(response.status_code, 400)
+
+    @patch('http_client.request')
+    def test_proxy_passes_not_modified_through(self, mock_request):
+        not_modified = MagicMock()
+        not_modified.status_code = 304
+        not_modified.headers = {'ETag': '"abc-1"'}
+        mock_request.return_value = not_modified
+
+        response = self.app.get('/accumulator_service/get_accumulated_frame', headers={'If-None-Match': '"abc-1"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], '"abc-1"')
+        self.assertEqual(mock_request.call_args.kwargs['headers']['If-None-Match'], '"abc-1"')
+
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_sessions_are_passed_to_the_services(self, mock_get, mock_post):
+        mock_get.return_value = _json_response(404, error="Reference frame not set")
+        mock_post.side_effect = [
+            _binary_response(dct_data=np.array([0.1, 0.2])), _json_response(status="frame accumulated"),
+            _binary_response(dct_data=np.array([0.1, 0.2])), _json_response(status="reference frame set"),
+        ]
+
+        self.app.post('/process_frame?session=s1', data=json.dumps({'frame_id': '1', 'image_data': '1,2'}), content_type='application/json')
+        self.app.post('/set_reference?session=s1', data=json.dumps({'image_data': '1,2'}), content_type='application/json')
+        with patch.object(output_retriever, '_encoded_frames', SessionStore(output_retriever._EncodedFrame, idle_timeout=60, max_sessions=4)) as encoded:
+            self.app.get('/get_processed_frame?session=s1')
+            self.assertEqual(encoded.metrics()['created'], 1)
+
+        self.assertEqual([call.args[0] for call in mock_get.call_args_list], [
+            f"{REFERENCE_FRAME_SERVICE_URL}/get_reference_frame?session=s1",
+            f"{ACCUMULATOR_SERVICE_URL}/get_accumulated_frame?session=s1",
+        ])
+        self.assertEqual([call.args[0] for call in mock_post.call_args_list], [
+            f"{DCT_SERVICE_URL}/forward_dct", f"{ACCUMULATOR_SERVICE_URL}/accumulate_frame?session=s1",
+            f"{DCT_SERVICE_URL}/forward_dct", f"{REFERENCE_FRAME_SERVICE_URL}/set_reference_frame?session=s1",
+        ])
+
+    @patch('http_client.request')
+    def test_reset_accumulator_passes_the_session(self, mock_request):
+        mock_request.return_value = _json_response(status="accumulator reset")
+        self.app.post('/reset_accumulator?session=s1')
+        self.assertEqual(mock_request.call_args.args[1], f"{ACCUMULATOR_SERVICE_URL}/reset_accumulator?session=s1")
+
+    def test_fused_engine_rejects_sessions(self):
+        with patch('orchestration_service.fused_pipeline', FusedPipeline()):
+            response = self.app.post('/process_frame?session=s1', data=json.dumps({'frame_id': '1', 'image_data': '1,2'}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_process_frame_missing_image_data(self):
+        response = self.app.post('/process_frame', data=json.dumps({'frame_id': '1'}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @patch('http_client.request')
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_fused_engine_skips_the_network(self, mock_get, mock_post, mock_request):
+        with patch('orchestration_service.fused_pipeline', FusedPipeline()):
+            self.app.post('/set_reference', data=json.dumps({'image_data': '1,2,3,4'}), content_type='application/json')
+            response = self.app.post('/process_frame', data=json.dumps({'frame_id': '1', 'image_data': '2,3,4,5'}), content_type='application/json')
+            self.assertEqual(json.loads(response.data), {'status': 'frame processed', 'frame_id': '1'})
+            response = self.app.post('/reset_accumulator')
+            self.assertEqual(json.loads(response.data), {'status': 'accumulator reset'})
+
+        mock_get.assert_not_called()
+        mock_post.assert_not_called()
+        mock_request.assert_not_called()
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import numpy as np
-from reference_frame_service import _set_reference_frame_data
+from reference_frame_service import app, _set_reference_frame_data
+from frame_codec import decode_frames, OCTET_STREAM
 
 class TestReferenceFrameService(unittest.TestCase):
 
@@ -40,5 +41,25 @@ class TestReferenceFrameService(unittest.TestCase):
 
         self.assertTrue(np.allclose(set_data_array, frame_data2))
 
+    def test_set_reference_frame_array_is_owned_float32(self):
+        frame_data = np.arange(6, dtype=np.uint8).reshape(2, 3)
+
+        set_data = _set_reference_frame_data(frame_data)
+
+        self.assertEqual(set_data.dtype, np.float32)
+        self.assertEqual(set_data.shape, (2, 3))
+        self.assertFalse(np.shares_memory(set_data, frame_data))
+
+    def test_reference_frames_per_session(self):
+        client = app.test_client()
+        client.post('/set_reference_frame?session=a', json={'frame_data': '1,2'})
+        client.post('/set_reference_frame?session=b', json={'frame_data': '3,4,5'})
+
+        arrays, _ = decode_frames(client.get('/get_reference_frame?session=a', headers={'Accept': OCTET_STREAM}).data)
+        self.assertEqual(arrays['reference_frame'].tolist(), [1, 2])
+        arrays, _ = decode_frames(client.get('/get_reference_frame?session=b', headers={'Accept': OCTET_STREAM}).data)
+        self.assertEqual(arrays['reference_frame'].tolist(), [3, 4, 5])
+        self.assertEqual(client.get('/get_reference_frame?session=c').status_code, 404)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
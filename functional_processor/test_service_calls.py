@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+from frame_codec import encode_frames, decode_frames, OCTET_STREAM
+from service_calls import PostFrames, GetFrames, Compute, NOT_MODIFIED, run
+
+def _response(status_code, **arrays):
+    return MagicMock(status_code=status_code, content=encode_frames(arrays), headers={'Content-Type': OCTET_STREAM})
+
+class TestServiceCalls(unittest.TestCase):
+
+    @patch('http_client.post')
+    @patch('http_client.get')
+    def test_run_sends_back_results(self, mock_get, mock_post):
+        mock_post.return_value = _response(200, dct_data=np.array([1.0, 2.0]))
+        mock_get.return_value = _response(404)
+
+        def steps():
+            (posted, _), missing = yield (PostFrames("http://dct/forward_dct", {'image_data': np.ones(2)}, frame_id='1'), GetFrames("http://reference/get"))
+            doubled = yield Compute(np.multiply, posted['dct_data'], 2)
+            return doubled, missing
+
+        doubled, missing = run(steps())
+        self.assertEqual(doubled.tolist(), [2.0, 4.0])
+        self.assertIsNone(missing)
+        arrays, meta = decode_frames(mock_post.call_args.kwargs['data'])
+        self.assertEqual(meta, {'frame_id': '1'})
+        self.assertEqual(mock_post.call_args.kwargs['headers']['Content-Type'], OCTET_STREAM)
+
+    @patch('http_client.get')
+    def test_conditional_get(self, mock_get):
+        mock_get.return_value = _response(304)
+
+        def steps():
+            return (yield GetFrames("http://accumulator/get", version='abc-1'))
+
+        self.assertIs(run(steps()), NOT_MODIFIED)
+        self.assertEqual(mock_get.call_args.kwargs['headers']['If-None-Match'], '"abc-1"')
+
+    @patch('http_client.post')
+    def test_errors_are_raised(self, mock_post):
+        mock_post.return_value = _response(500)
+        mock_post.return_value.raise_for_status.side_effect = RuntimeError("boom")
+
+        def steps():
+            yield PostFrames("http://dct/forward_dct", {'image_data': np.ones(2)})
+
+        with self.assertRaises(RuntimeError):
+            run(steps())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from session_store import SessionStore, DEFAULT_SESSION
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestSessionStore(unittest.TestCase):
+
+    def test_sessions_have_their_own_state(self):
+        store = SessionStore(dict, idle_timeout=60, max_sessions=10)
+        with store.session('a') as state:
+            state['frame'] = 1
+        with store.session('b') as state:
+            self.assertEqual(state, {})
+        with store.session('a') as state:
+            self.assertEqual(state, {'frame': 1})
+        with store.session('c', create=False) as state:
+            self.assertIsNone(state)
+        self.assertEqual(store.metrics()['sessions'], 2)
+
+    def test_evicts_idle_sessions(self):
+        clock = FakeClock()
+        store = SessionStore(dict, idle_timeout=10, max_sessions=10, clock=clock)
+        with store.session('a'):
+            pass
+        clock.now = 5
+        with store.session('b'):
+            pass
+        clock.now = 12
+        with store.session('b') as state:
+            self.assertEqual(state, {})
+            with store.session('a', create=False) as evicted:
+                self.assertIsNone(evicted)
+            # A session in use is not idle, however long the request takes
+            clock.now = 100
+            with store.session('c'):
+                pass
+            self.assertEqual(store.metrics()['sessions'], 2)
+        self.assertEqual(store.metrics()['idle_evictions'], 1)
+
+    def test_evicts_least_recently_used_over_cap(self):
+        store = SessionStore(dict, idle_timeout=60, max_sessions=2)
+        for session in ('a', 'b', 'a', 'c'):
+            with store.session(session) as state:
+                state['used'] = True
+        with store.session('b', create=False) as state:
+            self.assertIsNone(state)
+        with store.session('a', create=False) as state:
+            self.assertEqual(state, {'used': True})
+        self.assertEqual(store.metrics()['evictions'], 1)
+
+    def test_never_evicts_the_default_session(self):
+        clock = FakeClock()
+        store = SessionStore(dict, idle_timeout=10, max_sessions=1, clock=clock)
+        with store.session(DEFAULT_SESSION) as state:
+            state['frame'] = 1
+        clock.now = 100
+        for session in ('a', 'b'):
+            with store.session(session):
+                pass
+
+        with store.session(DEFAULT_SESSION, create=False) as state:
+            self.assertEqual(state, {'frame': 1})
+        with store.session('a', create=False) as state:
+            self.assertIsNone(state)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,75 +1,205 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from pydantic import BaseModel
 import numpy as np
 
+from wire_format import read_payload, array_response
+from server_timing import ServerTimingMiddleware, LatencyMetrics, phase
+
+latency_metrics = LatencyMetrics()
+
 app = FastAPI()
+app.add_middleware(ServerTimingMiddleware, metrics=latency_metrics)
 
 class FFTFloatRequest(BaseModel):
     data: list[list[float]]
 
+class RFFTRequest(BaseModel):
+    data: list[list[float]] | list[list[list[float]]]
+
 class FFTStringRequest(BaseModel):
     data: list[list[str]]
 
+class IRFFTRequest(BaseModel):
+    data: list[list[list[float]]] | list[list[list[list[float]]]]
+    width: int | None = None
+
+def _pack_complex(values: np.ndarray) -> np.ndarray:
+    """
+    Reinterprets a complex array as interleaved real/imag floats with a trailing axis of 2.
+    complex64 and (float32, float32) pairs share a memory layout, so this is a view, not a copy.
+    """
+    return np.ascontiguousarray(values).view(values.real.dtype).reshape(values.shape + (2,))
+
+def _unpack_complex(interleaved: np.ndarray) -> np.ndarray:
+    """
+    Inverse of `_pack_complex`: turns a (..., 2) real/imag array back into complex values.
+    """
+    if interleaved.ndim < 1 or interleaved.shape[-1] != 2:
+        raise ValueError(f"Expected interleaved real/imag data with a trailing axis of 2, got shape {interleaved.shape}")
+    complex_dtype = np.complex128 if interleaved.dtype == np.float64 else np.complex64
+    interleaved = np.ascontiguousarray(interleaved, dtype=np.finfo(complex_dtype).dtype)
+    return interleaved.view(complex_dtype)[..., 0]
+
 @app.get("/")
 async def read_root():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def read_metrics():
+    """
+    API Contract:
+    - Response Body:
+        - `bucket_bounds_ms`: `list[float]` - Upper bounds of the latency histogram buckets; the last bucket is unbounded.
+        - `series`: `list[dict]` - One entry per route and input matrix size (e.g. "1080x1920"), with the request
+                    `count`, `mean_ms`, histogram `buckets` and the `mean_phases_ms` spent decoding, transforming
+                    and encoding.
+    """
+    return latency_metrics.snapshot()
+
 @app.post("/fft2")
-async def calculate_fft2(request: FFTFloatRequest):
+async def calculate_fft2(request: Request):
     """
     API Contract:
-    - Request Body:
+    - Request Body (`application/json`):
         - `data`: `list[list[float]]` - A 2D list of floats representing the input matrix.
                   Each inner list is a row. Must be a rectangular matrix.
                   Expected values are typically 0-255 (pixel intensities).
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the 2D input matrix (any numeric dtype, e.g. uint8).
     - Response Body (Success):
         - `result`: `list[list[str]]` - A 2D list of strings, where each string represents a complex number.
                     Dimensions are the same as the input `data`.
+                    Binary requests get a `wire_format` message of native complex values instead
+                    (complex64 unless the input was float64).
     - Response Body (Error):
         - `error`: `str` - A string containing the error message.
     """
+    data_array, params, binary = await read_payload(request, FFTFloatRequest)
     try:
-        # Convert list of lists to a NumPy array
-        data_array = np.array(request.data)
-        
         # Perform 2D FFT
-        fft_result = np.fft.fft2(data_array)
-        
+        with phase("transform"):
+            fft_result = np.fft.fft2(data_array)
+
+        if binary:
+            # The binary format carries complex values natively, no string conversion needed
+            complex_dtype = np.complex128 if data_array.dtype == np.float64 else np.complex64
+            return array_response(fft_result.astype(complex_dtype, copy=False), binary)
+
         # FFT results are complex, convert to a format that can be JSON serialized
         # For simplicity, we'll return the real and imaginary parts separately or magnitude/phase
         # For this benchmark, we'll return a list of lists of complex numbers as strings
         # The client (benchmark_dct.py) will need to parse these back into complex numbers
-        return {"result": fft_result.astype(str).tolist()}
+        with phase("encode"):
+            return {"result": fft_result.astype(str).tolist()}
     except Exception as e:
         return {"error": str(e)}
 
 @app.post("/ifft2")
-async def calculate_ifft2(request: FFTStringRequest):
+async def calculate_ifft2(request: Request):
     """
     API Contract:
-    - Request Body:
+    - Request Body (`application/json`):
         - `data`: `list[list[str]]` - A 2D list of strings, where each string represents a complex number.
                   Each inner list is a row. Must be a rectangular matrix.
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the 2D complex matrix (complex64 or complex128).
     - Response Body (Success):
         - `result`: `list[list[float]]` - A 2D list of floats representing the reconstructed matrix.
                     Dimensions are the same as the input `data`.
                     Expected values are typically 0-255 (pixel intensities).
+                    Binary requests get a `wire_format` message instead (float32 unless the input was complex128).
     - Response Body (Error):
         - `error`: `str` - A string containing the error message.
     """
+    data_array, params, binary = await read_payload(request, FFTStringRequest)
     try:
-        # Convert list of lists to a NumPy array
-        # The input data will be a list of lists of complex numbers (as strings)
+        # The JSON input is a list of lists of complex numbers (as strings)
         # We need to convert them back to complex numbers
-        data_array = np.array(request.data, dtype=complex)
-        
+        if not binary:
+            with phase("decode"):
+                data_array = data_array.astype(complex)
+
         # Perform 2D IFFT
-        ifft_result = np.fft.ifft2(data_array)
-        
+        with phase("transform"):
+            ifft_result = np.fft.ifft2(data_array)
+
         # IFFT results can have small imaginary components due to floating point inaccuracies.
         # Since the original image data is real, we take the real part.
-        return {"result": ifft_result.real.astype(float).tolist()}
+        if binary:
+            real_dtype = np.float64 if data_array.dtype == np.complex128 else np.float32
+            return array_response(ifft_result.real.astype(real_dtype), binary)
+        with phase("encode"):
+            return {"result": ifft_result.real.astype(float).tolist()}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/rfft2")
+async def calculate_rfft2(request: Request):
+    """
+    API Contract:
+    - Request Body (`application/json`):
+        - `data`: `list[list[float]]` - A 2D list of floats representing the (real) input matrix.
+                  Each inner list is a row. Must be a rectangular matrix.
+                  Expected values are typically 0-255 (pixel intensities).
+                  An (H, W, C) multi-channel frame (e.g. RGB) is also accepted; every channel is
+                  transformed in the same call.
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the 2D input matrix or (H, W, C) frame (any numeric dtype, e.g. uint8).
+    - Response Body (Success):
+        - `result`: `list[list[list[float]]]` - The Hermitian half-spectrum of shape (H, W // 2 + 1, 2),
+                    with real and imaginary parts interleaved on the last axis.
+                    Multi-channel frames get shape (H, W // 2 + 1, C, 2).
+        - `width`: `int` - The input width W, needed by `/irfft2` to restore odd widths.
+                    Binary requests get a `wire_format` message instead (float32 unless the input was
+                    float64), with `width` in the header.
+    - Response Body (Error):
+        - `error`: `str` - A string containing the error message.
+    """
+    data_array, params, binary = await read_payload(request, RFFTRequest)
+    try:
+        if data_array.ndim not in (2, 3):
+            raise ValueError(f"Expected a 2D matrix or an (H, W, C) frame, got shape {data_array.shape}")
+
+        # Real input only needs the non-negative frequencies along the width
+        with phase("transform"):
+            rfft_result = np.fft.rfft2(data_array, axes=(0, 1))
+
+        complex_dtype = np.complex128 if data_array.dtype == np.float64 else np.complex64
+        packed = _pack_complex(rfft_result.astype(complex_dtype, copy=False))
+        return array_response(packed, binary, width=data_array.shape[1])
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/irfft2")
+async def calculate_irfft2(request: Request):
+    """
+    API Contract:
+    - Request Body (`application/json`):
+        - `data`: `list[list[list[float]]]` - A half-spectrum of shape (H, W // 2 + 1, 2) with real and
+                  imaginary parts interleaved on the last axis, as returned by `/rfft2`.
+                  Multi-channel half-spectra of shape (H, W // 2 + 1, C, 2) are also accepted.
+        - `width`: `int` (optional) - The original width W. Defaults to 2 * (columns - 1), i.e. an even width.
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the interleaved half-spectrum, with `width` in the header.
+    - Response Body (Success):
+        - `result`: `list[list[float]]` - A 2D list of floats representing the reconstructed matrix
+                    ((H, W, C) for multi-channel input).
+                    Expected values are typically 0-255 (pixel intensities).
+                    Binary requests get a `wire_format` message instead (float32 unless the input was float64).
+    - Response Body (Error):
+        - `error`: `str` - A string containing the error message.
+    """
+    data_array, params, binary = await read_payload(request, IRFFTRequest)
+    try:
+        spectrum = _unpack_complex(data_array)
+        if spectrum.ndim not in (2, 3):
+            raise ValueError(f"Expected a 2D or (H, W, C) half-spectrum, got shape {spectrum.shape}")
+
+        width = params.width if params.width is not None else 2 * (spectrum.shape[1] - 1)
+        with phase("transform"):
+            irfft_result = np.fft.irfft2(spectrum, s=(spectrum.shape[0], width), axes=(0, 1))
+
+        return array_response(irfft_result.astype(spectrum.real.dtype, copy=False), binary)
+    except Exception as e:
+        return {"error": str(e)}
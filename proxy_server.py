@@ -35,9 +35,47 @@ SERVICE_MAP = {
 }
 
 
+# Formats the processed frame can be returned in, by `Accept`; the first is the default.
+# PIL format names for the raw image types, and JSON for the base64 form.
+RESPONSE_FORMATS = {
+    "image/png": "PNG",
+    "image/jpeg": "JPEG",
+    "image/webp": "WEBP",
+    "application/json": "PNG",
+}
 
 
-
+def _read_client_image():
+    """
+    Returns the encoded image bytes of a client request: a raw `image/*` body, the 'image' file
+    of a multipart form, or (for older clients) base64 in the 'image' field of a JSON body.
+    """
+    if request.mimetype.startswith('image/'):
+        return request.get_data()
+    if request.mimetype == 'multipart/form-data':
+        if 'image' not in request.files:
+            raise ValueError("'image' field missing.")
+        return request.files['image'].read()
+    client_data = request.get_json(silent=True)
+    if not client_data or 'image' not in client_data:
+        raise ValueError("'image' field missing.")
+    return base64.b64decode(client_data['image'])
+
+
+def _image_response(image):
+    """
+    Encodes the processed image in the format the client accepts: raw PNG, JPEG or WebP bytes,
+    or JSON with the base64 encoded PNG as 'image'.
+    """
+    mimetype = request.accept_mimetypes.best_match(list(RESPONSE_FORMATS)) or "image/png"
+    buf = io.BytesIO()
+    image.save(buf, format=RESPONSE_FORMATS[mimetype])
+    if mimetype == "application/json":
+        response = jsonify({"image": base64.b64encode(buf.getvalue()).decode('utf-8'), "mimetype": "image/png"})
+    else:
+        response = Response(buf.getvalue(), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
 
 
 @app.route('/api/v1/process-frame', methods=['POST'])
@@ -47,18 +85,19 @@ def process_frame():
     sends it through the entire backend processing pipeline, and returns the
     final processed image. This function implements the logic defined in the
     `DCT-DIFF-DELAY-DATAMOSH.png` architectural schema.
+
+    The image is sent and returned as raw bytes (see `_read_client_image` and
+    `_image_response`); base64 in JSON is still accepted both ways.
     """
     logging.info("Received request at /api/v1/process-frame")
 
     # 1. Get the image data from the client request
     try:
-        client_data = request.get_json()
-        if not client_data or 'image' not in client_data:
-            logging.error("Invalid request: 'image' field missing.")
-            return jsonify({"error": "Invalid request: 'image' field missing."}), 400
-        image_data_b64 = client_data['image']
-        # Decode the Base64 string and open it as an image
-        image_bytes = base64.b64decode(image_data_b64)
+        image_bytes = _read_client_image()
+    except ValueError as e:
+        logging.error(f"Invalid request: {e}")
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    try:
         image = Image.open(io.BytesIO(image_bytes)).convert('L') # Convert to grayscale
         image_shape = np.array(image).shape
         image_array = np.array(image)
@@ -140,13 +179,8 @@ def process_frame():
         # Reshape the array to the original image dimensions.
         final_image_array = final_image_array.reshape(image_shape)
         final_image = Image.fromarray(final_image_array.astype(np.uint8))
-        
-        # Save the image to a byte buffer
-        buf = io.BytesIO()
-        final_image.save(buf, format='PNG')
-        buf.seek(0)
 
-        return Response(buf, mimetype='image/png')
+        return _image_response(final_image)
 
     except requests.exceptions.RequestException as e:
         # This is a catch-all for network errors during backend communication.
@@ -1,67 +1,801 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
+from typing import Literal
 import numpy as np
-from scipy.fftpack import dct, idct
+from scipy.fft import dctn, idctn
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from multiprocessing import shared_memory
+import multiprocessing
+import functools
+import asyncio
+import json
+import os
 
-app = FastAPI()
+from wire_format import read_payload, read_arrays_payload, array_response, arrays_response, result_dtype, encode_array, decode_array
+from server_timing import ServerTimingMiddleware, LatencyMetrics, phase
 
-class DCTRequest(BaseModel):
+# Number of worker processes that run transforms. 0 (the default) runs every transform
+# inline on the event loop, as a single uvicorn worker always has.
+WORKER_PROCESSES = int(os.environ.get("DCT_SERVER_WORKERS", "0"))
+# Arrays at least this large are handed to workers through shared memory instead of being pickled.
+SHARED_MEMORY_MIN_BYTES = int(os.environ.get("DCT_SERVER_SHM_MIN_BYTES", str(1 << 20)))
+# Frames a WebSocket client may have in flight before the server stops reading from it.
+WEBSOCKET_WINDOW = int(os.environ.get("DCT_SERVER_WS_WINDOW", "4"))
+
+_executor = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _executor
+    if WORKER_PROCESSES > 0:
+        # spawn rather than fork: the server process already has event loop and executor threads running
+        _executor = ProcessPoolExecutor(max_workers=WORKER_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield
+    finally:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+latency_metrics = LatencyMetrics()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ServerTimingMiddleware, metrics=latency_metrics)
+
+class QuantizationParams(BaseModel):
+    quality: int | None = None
+    quant_table: list[list[float]] | None = None
+
+class DCTRequest(QuantizationParams):
+    data: list[list[float]]
+    keep: int | None = None
+
+class DCTBlocksRequest(QuantizationParams):
     data: list[list[float]]
+    block_size: int = 8
+    keep: int | None = None
+
+class ZigzagRequest(QuantizationParams):
+    values: list[float]
+    counts: list[int]
+    shape: list[int]
+    block_size: int | None = None
+
+class ColorDCTRequest(QuantizationParams):
+    data: list[list[list[float]]]
+    block_size: int = 8
+    color_space: Literal["rgb", "ycbcr"] = "rgb"
+    subsample: bool = False
+
+class ColorPlanesRequest(QuantizationParams):
+    block_size: int = 8
+    color_space: Literal["rgb", "ycbcr"] = "rgb"
+    subsample: bool = False
+    r: list[list[float]] | None = None
+    g: list[list[float]] | None = None
+    b: list[list[float]] | None = None
+    y: list[list[float]] | None = None
+    cb: list[list[float]] | None = None
+    cr: list[list[float]] | None = None
+
+class DCTStreamFrame(BaseModel):
+    block_size: int = 8
+    direction: Literal["forward", "inverse"] = "forward"
+
+def _to_blocks(frame: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    Views an (H, W) frame as a (ny, nx, block_size, block_size) grid of blocks.
+    No data is copied; the blocks are strided views into the frame.
+    """
+    if frame.ndim != 2:
+        raise ValueError(f"Expected a 2D frame, got shape {frame.shape}")
+    if block_size <= 0:
+        raise ValueError(f"Block size must be positive, got {block_size}")
+    height, width = frame.shape
+    if height % block_size or width % block_size:
+        raise ValueError(f"Frame shape {frame.shape} is not divisible by block size {block_size}")
+    ny, nx = height // block_size, width // block_size
+    return frame.reshape(ny, block_size, nx, block_size).swapaxes(1, 2)
+
+def _from_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    Inverse of `_to_blocks`: lays a (ny, nx, bs, bs) block grid back out as an (H, W) frame.
+    """
+    ny, nx, bs_y, bs_x = blocks.shape
+    return blocks.swapaxes(1, 2).reshape(ny * bs_y, nx * bs_x)
+
+# JPEG (ITU T.81 Annex K) luminance quantization table for 8x8 blocks at quality 50
+JPEG_LUMINANCE_TABLE = np.array([
+    [16, 11, 10, 16, 24, 40, 51, 61],
+    [12, 12, 14, 19, 26, 58, 60, 55],
+    [14, 13, 16, 24, 40, 57, 69, 56],
+    [14, 17, 22, 29, 51, 87, 80, 62],
+    [18, 22, 37, 56, 68, 109, 103, 77],
+    [24, 35, 55, 64, 81, 104, 113, 92],
+    [49, 64, 78, 87, 103, 121, 120, 101],
+    [72, 92, 95, 98, 112, 100, 103, 99],
+], dtype=float)
+
+# JPEG (ITU T.81 Annex K) chrominance quantization table for 8x8 blocks at quality 50
+JPEG_CHROMINANCE_TABLE = np.array([
+    [17, 18, 24, 47, 99, 99, 99, 99],
+    [18, 21, 26, 66, 99, 99, 99, 99],
+    [24, 26, 56, 99, 99, 99, 99, 99],
+    [47, 66, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+    [99, 99, 99, 99, 99, 99, 99, 99],
+], dtype=float)
+
+def _quant_table(shape: tuple[int, int], params: QuantizationParams, base: np.ndarray = JPEG_LUMINANCE_TABLE) -> np.ndarray | None:
+    """
+    Resolves the quantization table for transforms of the given shape, or None if the request
+    asks for unquantized output. An explicit `quant_table` wins over `quality`, which scales `base`.
+    """
+    if params.quant_table is not None:
+        table = np.array(params.quant_table, dtype=float)
+        if table.shape != tuple(shape):
+            raise ValueError(f"Quantization table shape {table.shape} does not match block shape {tuple(shape)}")
+        if (table <= 0).any():
+            raise ValueError("Quantization table entries must be positive")
+        return table
+    if params.quality is None:
+        return None
+    if not 1 <= params.quality <= 100:
+        raise ValueError(f"Quality must be between 1 and 100, got {params.quality}")
+
+    # IJG quality scaling of the quality-50 table
+    scale = 5000 / params.quality if params.quality < 50 else 200 - 2 * params.quality
+    table = np.clip(np.floor((base * scale + 50) / 100), 1, 255)
+
+    # Stretch the 8x8 table over other shapes by frequency, and scale it with the orthonormal
+    # DCT gain, which grows with sqrt(m * n) and is 8 for the 8x8 blocks JPEG is defined on
+    m, n = shape
+    table = table[np.ix_(np.arange(m) * 8 // m, np.arange(n) * 8 // n)]
+    return table * (np.sqrt(m * n) / 8)
+
+# Plane names of each color space, in channel order
+COLOR_CHANNELS = {"rgb": ("r", "g", "b"), "ycbcr": ("y", "cb", "cr")}
+
+# JFIF full-range RGB -> YCbCr; chroma is centered on 128 like the 0-255 pixel values
+_RGB_TO_YCBCR = np.array([
+    [0.299, 0.587, 0.114],
+    [-0.168736, -0.331264, 0.5],
+    [0.5, -0.418688, -0.081312],
+])
+_YCBCR_TO_RGB = np.linalg.inv(_RGB_TO_YCBCR)
+_YCBCR_OFFSET = np.array([0.0, 128.0, 128.0])
+
+def _split_planes(frame: np.ndarray, color_space: str, subsample: bool) -> list[np.ndarray]:
+    """
+    Splits an (H, W, 3) RGB frame into the planes of `color_space`. With `subsample`, the chroma
+    planes are averaged over 2x2 pixels (4:2:0).
+    """
+    if frame.ndim != 3 or frame.shape[2] != 3:
+        raise ValueError(f"Expected an (H, W, 3) frame, got shape {frame.shape}")
+    if subsample and color_space != "ycbcr":
+        raise ValueError("Chroma subsampling requires the ycbcr color space")
+    frame = frame.astype(result_dtype(frame), copy=False)
+    if color_space == "ycbcr":
+        frame = frame @ _RGB_TO_YCBCR.T.astype(frame.dtype) + _YCBCR_OFFSET.astype(frame.dtype)
+    planes = list(np.moveaxis(frame, -1, 0))
+
+    if subsample:
+        height, width = frame.shape[:2]
+        if height % 2 or width % 2:
+            raise ValueError(f"Frame shape {frame.shape[:2]} must be even to subsample chroma")
+        planes[1:] = [plane.reshape(height // 2, 2, width // 2, 2).mean(axis=(1, 3)) for plane in planes[1:]]
+    return planes
+
+def _merge_planes(planes: list[np.ndarray], color_space: str, subsample: bool) -> np.ndarray:
+    """
+    Inverse of `_split_planes`: upsamples subsampled chroma and converts back to an (H, W, 3) RGB frame.
+    """
+    if subsample:
+        planes = [planes[0]] + [plane.repeat(2, axis=0).repeat(2, axis=1) for plane in planes[1:]]
+    if any(plane.shape != planes[0].shape for plane in planes):
+        raise ValueError(f"Plane shapes {[plane.shape for plane in planes]} do not match")
+    frame = np.stack(planes, axis=-1)
+    if color_space == "ycbcr":
+        frame = (frame - _YCBCR_OFFSET.astype(frame.dtype)) @ _YCBCR_TO_RGB.T.astype(frame.dtype)
+    return frame
+
+def _stack_blocks(planes: list[np.ndarray], block_size: int) -> tuple[np.ndarray, list[tuple]]:
+    """
+    Cuts every plane into blocks and stacks all of them along one axis, so a single `_dct2`
+    call transforms the whole frame. Returns the stack and each plane's block grid shape.
+    """
+    grids = [_to_blocks(plane, block_size) for plane in planes]
+    stacked = np.concatenate([grid.reshape(-1, block_size, block_size) for grid in grids])
+    return stacked, [grid.shape for grid in grids]
+
+def _unstack_blocks(stacked: np.ndarray, grids: list[tuple]) -> list[np.ndarray]:
+    """
+    Inverse of `_stack_blocks`: returns each plane's (ny, nx, bs, bs) block grid.
+    """
+    sizes = [ny * nx for ny, nx, _, _ in grids]
+    return [part.reshape(grid) for part, grid in zip(np.split(stacked, np.cumsum(sizes)[:-1]), grids)]
+
+def _plane_tables(params: ColorDCTRequest | ColorPlanesRequest) -> list[np.ndarray | None]:
+    """
+    Quantization table of each plane. With `quality`, YCbCr chroma planes use the JPEG chrominance table.
+    """
+    block_shape = (params.block_size, params.block_size)
+    luma = _quant_table(block_shape, params)
+    if params.color_space != "ycbcr":
+        return [luma] * 3
+    chroma = _quant_table(block_shape, params, base=JPEG_CHROMINANCE_TABLE)
+    return [luma, chroma, chroma]
+
+def _quantize(coeffs: np.ndarray, table: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(coeffs / table), np.iinfo(np.int16).min, np.iinfo(np.int16).max).astype(np.int16)
+
+def _dequantize(quantized: np.ndarray, table: np.ndarray) -> np.ndarray:
+    return (quantized * table).astype(result_dtype(quantized), copy=False)
+
+@functools.lru_cache(maxsize=None)
+def _zigzag_order(m: int, n: int) -> np.ndarray:
+    """
+    Flat indices of an m x n block in JPEG zig-zag order: by anti-diagonal, with odd diagonals
+    running top to bottom and even ones bottom to top.
+    """
+    rows, cols = np.indices((m, n)).reshape(2, -1)
+    diagonal = rows + cols
+    order = np.lexsort((np.where(diagonal % 2, rows, -rows), diagonal))
+    order.flags.writeable = False
+    return order
+
+def _truncate_zigzag(blocks: np.ndarray, keep: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Keeps the first `keep` zig-zag coefficients of every block in a (ny, nx, m, n) grid and drops
+    trailing zeros. Returns `(values, counts)`: the kept coefficients of all blocks concatenated in
+    raster order, and how many of them belong to each block.
+    """
+    if keep <= 0:
+        raise ValueError(f"keep must be positive, got {keep}")
+    m, n = blocks.shape[-2:]
+    zigzag = blocks.reshape(-1, m * n)[:, _zigzag_order(m, n)[:keep]]
+
+    nonzero = zigzag != 0
+    last_nonzero = zigzag.shape[1] - np.argmax(nonzero[:, ::-1], axis=1)
+    counts = np.where(nonzero.any(axis=1), last_nonzero, 0).astype(np.int32)
+
+    kept = np.arange(zigzag.shape[1]) < counts[:, None]
+    return zigzag[kept], counts
+
+def _expand_zigzag(values: np.ndarray, counts: np.ndarray, grid: tuple[int, int], block_shape: tuple[int, int]) -> np.ndarray:
+    """
+    Inverse of `_truncate_zigzag`: rebuilds the (ny, nx, m, n) block grid, with dropped coefficients as zero.
+    """
+    ny, nx = grid
+    m, n = block_shape
+    if counts.shape != (ny * nx,):
+        raise ValueError(f"Expected {ny * nx} block counts, got {counts.size}")
+    if counts.min(initial=0) < 0 or counts.max(initial=0) > m * n:
+        raise ValueError(f"Block counts must be between 0 and {m * n}")
+    if values.shape != (counts.sum(),):
+        raise ValueError(f"Counts add up to {counts.sum()} values, got {values.size}")
+
+    width = int(counts.max(initial=0))
+    zigzag = np.zeros((ny * nx, width), dtype=values.dtype)
+    zigzag[np.arange(width) < counts[:, None]] = values
+
+    blocks = np.zeros((ny * nx, m * n), dtype=values.dtype)
+    blocks[:, _zigzag_order(m, n)[:width]] = zigzag
+    return blocks.reshape(ny, nx, m, n)
+
+# Transforms whose edges are all at or below this size run as matrix products against a
+# cached basis; larger ones use the FFT-based scipy.fft.dctn. Measured crossover is 16-32.
+MATMUL_MAX_SIZE = 16
+
+class DCTBasisCache:
+    """
+    Cache of orthonormal DCT-II basis matrices keyed by (size, dtype, norm).
+    Only a handful of block sizes and resolutions are ever requested, so entries are never evicted.
+    """
+    def __init__(self):
+        self._bases = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, size: int, dtype: np.dtype, norm: str = 'ortho') -> np.ndarray:
+        key = (size, np.dtype(dtype).str, norm)
+        basis = self._bases.get(key)
+        if basis is not None:
+            self.hits += 1
+            return basis
+
+        self.misses += 1
+        if norm != 'ortho':
+            raise ValueError(f"Unsupported DCT normalization: {norm}")
+        # C[k, n] = sqrt(2 / N) * cos(pi * (2n + 1) * k / (2N)), with the DC row scaled by 1 / sqrt(2)
+        k = np.arange(size)
+        basis = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * size))
+        basis[0] /= np.sqrt(2.0)
+        basis = basis.astype(dtype)
+        basis.flags.writeable = False
+        self._bases[key] = basis
+        return basis
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": [{"size": size, "dtype": dtype, "norm": norm} for size, dtype, norm in self._bases],
+        }
+
+basis_cache = DCTBasisCache()
+
+def _apply_basis(x: np.ndarray, row_basis: np.ndarray, col_basis: np.ndarray) -> np.ndarray:
+    """
+    Computes `row_basis @ x @ col_basis.T` over the last two axes of `x`.
+    Each product is done as a single large GEMM over every block rather than one small GEMM per block.
+    """
+    *batch, m, n = x.shape
+    y = (x.reshape(-1, n) @ col_basis.T).reshape(*batch, m, n)
+    y = y.swapaxes(-1, -2).reshape(-1, m) @ row_basis.T
+    return y.reshape(*batch, n, m).swapaxes(-1, -2)
+
+def _dct2(x: np.ndarray, inverse: bool = False) -> np.ndarray:
+    """
+    Orthonormal 2D DCT-II (or its inverse) over the last two axes of `x`.
+    Results are in `result_dtype(x)`: single precision unless `x` is double precision.
+    """
+    m, n = x.shape[-2:]
+    dtype = result_dtype(x)
+    if max(m, n) > MATMUL_MAX_SIZE:
+        transform = idctn if inverse else dctn
+        return transform(x, axes=(-2, -1), norm='ortho').astype(dtype, copy=False)
+
+    row_basis = basis_cache.get(m, dtype)
+    col_basis = basis_cache.get(n, dtype)
+    x = x.astype(dtype, copy=False)
+    if inverse:
+        # The orthonormal basis is orthogonal, so its inverse is its transpose
+        return _apply_basis(x, row_basis.T, col_basis.T)
+    return _apply_basis(x, row_basis, col_basis)
+
+def _dct2_blocks(frame: np.ndarray, block_size: int, inverse: bool = False) -> np.ndarray:
+    """
+    Blockwise 2D DCT (or inverse) of a whole frame, with the coefficients laid out in place.
+    """
+    return _from_blocks(_dct2(_to_blocks(frame, block_size), inverse))
+
+def _transform_shared(fn, in_name: str, shape: tuple, in_dtype: str, out_name: str, out_dtype: str, args: tuple):
+    """
+    Worker-side half of the shared-memory hand-off: reads the input from one segment and
+    writes the result into another, so neither array crosses the process boundary by pickle.
+    """
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        source = np.ndarray(shape, dtype=in_dtype, buffer=in_shm.buf)
+        target = np.ndarray(shape, dtype=out_dtype, buffer=out_shm.buf)
+        target[...] = fn(source, *args)
+        # Views must be released before the segments can be closed
+        del source, target
+    finally:
+        in_shm.close()
+        out_shm.close()
+
+async def _run_transform(fn, array: np.ndarray, *args) -> np.ndarray:
+    """
+    Runs `fn(array, *args)` inline, or on the worker pool when one is configured, and times it
+    as the request's `transform` phase.
+    """
+    with phase("transform"):
+        return await _dispatch_transform(fn, array, *args)
+
+async def _dispatch_transform(fn, array: np.ndarray, *args) -> np.ndarray:
+    """
+    `fn` must preserve the shape of `array` and return `result_dtype(array)`, which holds for
+    every transform in this server; that is what lets the output segment be sized up front.
+    """
+    if _executor is None:
+        return fn(array, *args)
+
+    loop = asyncio.get_running_loop()
+    if array.nbytes < SHARED_MEMORY_MIN_BYTES:
+        return await loop.run_in_executor(_executor, fn, array, *args)
+
+    out_dtype = result_dtype(array)
+    in_shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    out_shm = shared_memory.SharedMemory(create=True, size=max(array.size * out_dtype.itemsize, 1))
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=in_shm.buf)[...] = array
+        await loop.run_in_executor(
+            _executor, _transform_shared,
+            fn, in_shm.name, array.shape, array.dtype.str, out_shm.name, out_dtype.str, args,
+        )
+        # Copy out before the segment is unlinked
+        return np.ndarray(array.shape, dtype=out_dtype, buffer=out_shm.buf).copy()
+    finally:
+        in_shm.close()
+        in_shm.unlink()
+        out_shm.close()
+        out_shm.unlink()
 
 @app.get("/")
 async def read_root():
     return {"status": "ok"}
 
+@app.get("/stats")
+async def read_stats():
+    """
+    API Contract:
+    - Response Body:
+        - `basis_cache`: `dict` - `hits`, `misses`, `hit_rate` and cached `entries` of the DCT basis cache.
+                         With `DCT_SERVER_WORKERS` set, each worker keeps its own cache and this reports
+                         only the server process.
+        - `matmul_max_size`: `int` - Largest transform edge that uses the cached-basis matmul path.
+        - `worker_processes`: `int` - Size of the transform worker pool (0 means transforms run inline).
+    """
+    return {"basis_cache": basis_cache.stats(), "matmul_max_size": MATMUL_MAX_SIZE, "worker_processes": WORKER_PROCESSES}
+
+@app.get("/metrics")
+async def read_metrics():
+    """
+    API Contract:
+    - Response Body:
+        - `bucket_bounds_ms`: `list[float]` - Upper bounds of the latency histogram buckets; the last bucket is unbounded.
+        - `series`: `list[dict]` - One entry per route and input matrix size (e.g. "1080x1920"), with the request
+                    `count`, `mean_ms`, histogram `buckets` and the `mean_phases_ms` spent decoding, transforming
+                    and encoding.
+    """
+    return latency_metrics.snapshot()
+
 @app.post("/dct")
-async def calculate_dct(request: DCTRequest):
+async def calculate_dct(request: Request):
     """
     API Contract:
-    - Request Body:
+    - Request Body (`application/json`):
         - `data`: `list[list[float]]` - A 2D list of floats representing the input matrix.
                   Each inner list is a row. Must be a rectangular matrix.
                   Expected values are typically 0-255 (pixel intensities).
+        - `quality`: `int` (optional) - JPEG quality factor (1-100). When set, the coefficients are quantized
+                     with the JPEG luminance table scaled to this quality and to the matrix shape.
+        - `quant_table`: `list[list[float]]` (optional) - An explicit quantization table with the same shape
+                     as `data`. Takes precedence over `quality`.
+        - `keep`: `int` (optional) - Return only the first `keep` coefficients in zig-zag order, treating
+                  the whole matrix as one block (see the truncated response below).
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the 2D input matrix (any numeric dtype, e.g. uint8), with
+          `quality`, `quant_table` or `keep` in the header if wanted.
     - Response Body (Success):
         - `result`: `list[list[float]]` - A 2D list of floats representing the DCT coefficients.
                     Dimensions are the same as the input `data`.
+                    Quantized requests get `list[list[int]]` quantized coefficients instead.
+                    Binary requests get a `wire_format` message instead (float32 unless the input was float64,
+                    int16 when quantized).
+    - Response Body (Success, with `keep`):
+        - `values`: `list[float]` - The kept coefficients in zig-zag order, with trailing zeros dropped.
+        - `counts`: `list[int]` - The number of values (a single entry, for the one block).
+        - `shape`: `list[int]` - The input shape, needed by `/idct_zigzag`.
+        - `quality` / `quant_table`: Echoed back when given, so the response can be passed to `/idct_zigzag` as is.
+                    Binary requests get a multi-array `wire_format` message with `values` and `counts`.
     - Response Body (Error):
         - `error`: `str` - A string containing the error message.
     """
+    data_array, params, binary = await read_payload(request, DCTRequest)
     try:
-        # Convert list of lists to a NumPy array
-        data_array = np.array(request.data)
-        
+        table = _quant_table(data_array.shape, params)
+
         # Perform 2D DCT
-        # Apply DCT along rows, then along columns
-        dct_result = dct(dct(data_array, axis=0, norm='ortho'), axis=1, norm='ortho')
-        
-        return {"result": dct_result.tolist()}
+        dct_result = await _run_transform(_dct2, data_array)
+        if table is not None:
+            dct_result = _quantize(dct_result, table)
+
+        if params.keep is not None:
+            values, counts = _truncate_zigzag(dct_result[None, None], params.keep)
+            return arrays_response(
+                {"values": values, "counts": counts}, binary, shape=list(data_array.shape),
+                **params.model_dump(include={"quality", "quant_table"}, exclude_none=True),
+            )
+        return array_response(dct_result, binary)
     except Exception as e:
         return {"error": str(e)}
 
 @app.post("/idct")
-async def calculate_idct(request: DCTRequest):
+async def calculate_idct(request: Request):
     """
     API Contract:
-    - Request Body:
+    - Request Body (`application/json`):
         - `data`: `list[list[float]]` - A 2D list of floats representing the DCT coefficients.
                   Each inner list is a row. Must be a rectangular matrix.
+        - `quality` / `quant_table` (optional) - If the coefficients are quantized, the same
+                  quantization parameters that were passed to `/dct`.
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the 2D coefficient matrix (int16 when quantized), with
+          `quality` or `quant_table` in the header if quantized.
     - Response Body (Success):
         - `result`: `list[list[float]]` - A 2D list of floats representing the reconstructed matrix.
                     Dimensions are the same as the input `data`.
                     Expected values are typically 0-255 (pixel intensities).
+                    Binary requests get a `wire_format` message instead (float32 unless the input was float64).
     - Response Body (Error):
         - `error`: `str` - A string containing the error message.
     """
+    data_array, params, binary = await read_payload(request, DCTRequest)
     try:
-        # Convert list of lists to a NumPy array
-        data_array = np.array(request.data)
-        
+        table = _quant_table(data_array.shape, params)
+        if table is not None:
+            data_array = _dequantize(data_array, table)
+
         # Perform 2D IDCT
-        # Apply IDCT along columns, then along rows
-        idct_result = idct(idct(data_array, axis=0, norm='ortho'), axis=1, norm='ortho')
-        
-        return {"result": idct_result.tolist()}
+        idct_result = await _run_transform(_dct2, data_array, True)
+
+        return array_response(idct_result, binary)
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/dct_blocks")
+async def calculate_dct_blocks(request: Request):
+    """
+    API Contract:
+    - Request Body (`application/json`):
+        - `data`: `list[list[float]]` - A 2D list of floats representing a full grayscale frame.
+                  Height and width must both be divisible by `block_size`.
+        - `block_size`: `int` - Edge length of the square blocks (default 8).
+        - `quality`: `int` (optional) - JPEG quality factor (1-100); quantizes every block as in `/dct`.
+        - `quant_table`: `list[list[float]]` (optional) - An explicit `block_size` x `block_size`
+                     quantization table. Takes precedence over `quality`.
+        - `keep`: `int` (optional) - Return only the first `keep` zig-zag coefficients of each block
+                  (see the truncated response below).
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the frame (e.g. uint8), with `block_size` (and optionally
+          `quality`, `quant_table` or `keep`) in the header.
+    - Response Body (Success):
+        - `result`: `list[list[float]]` - The DCT coefficients of every block, laid out in place:
+                    the `block_size` x `block_size` tile at each block position holds that block's
+                    coefficients. Dimensions are the same as the input `data`.
+                    Quantized requests get `list[list[int]]` quantized coefficients instead.
+        - `block_size`: `int` - The block size that was used.
+                    Binary requests get a `wire_format` message instead (int16 when quantized),
+                    with `block_size` in the header.
+    - Response Body (Success, with `keep`):
+        - `values`: `list[float]` - The kept coefficients of every block in zig-zag order, blocks in raster
+                    order, each with its trailing zeros dropped.
+        - `counts`: `list[int]` - The number of values belonging to each block.
+        - `shape`: `list[int]` - The frame shape, needed by `/idct_zigzag`.
+        - `block_size`: `int` - The block size that was used.
+        - `quality` / `quant_table`: Echoed back when given, so the response can be passed to `/idct_zigzag` as is.
+                    Binary requests get a multi-array `wire_format` message with `values` and `counts`.
+    - Response Body (Error):
+        - `error`: `str` - A string containing the error message.
+    """
+    frame, params, binary = await read_payload(request, DCTBlocksRequest)
+    try:
+        table = _quant_table((params.block_size, params.block_size), params)
+
+        # One vectorized 2D DCT over the last two axes transforms every block at once
+        dct_frame = await _run_transform(_dct2_blocks, frame, params.block_size)
+        if table is not None:
+            dct_frame = _from_blocks(_quantize(_to_blocks(dct_frame, params.block_size), table))
+
+        if params.keep is not None:
+            values, counts = _truncate_zigzag(_to_blocks(dct_frame, params.block_size), params.keep)
+            return arrays_response(
+                {"values": values, "counts": counts}, binary,
+                shape=list(frame.shape), block_size=params.block_size,
+                **params.model_dump(include={"quality", "quant_table"}, exclude_none=True),
+            )
+
+        return array_response(dct_frame, binary, block_size=params.block_size)
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/idct_blocks")
+async def calculate_idct_blocks(request: Request):
+    """
+    API Contract:
+    - Request Body (`application/json`):
+        - `data`: `list[list[float]]` - Block DCT coefficients laid out in place, as returned by `/dct_blocks`.
+                  Height and width must both be divisible by `block_size`.
+        - `block_size`: `int` - Edge length of the square blocks (default 8).
+        - `quality` / `quant_table` (optional) - If the coefficients are quantized, the same
+                  quantization parameters that were passed to `/dct_blocks`.
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the coefficients (int16 when quantized), with `block_size`
+          (and the quantization parameters, if any) in the header.
+    - Response Body (Success):
+        - `result`: `list[list[float]]` - The reconstructed frame.
+                    Dimensions are the same as the input `data`.
+                    Expected values are typically 0-255 (pixel intensities).
+        - `block_size`: `int` - The block size that was used.
+                    Binary requests get a `wire_format` message instead, with `block_size` in the header.
+    - Response Body (Error):
+        - `error`: `str` - A string containing the error message.
+    """
+    coeffs, params, binary = await read_payload(request, DCTBlocksRequest)
+    try:
+        table = _quant_table((params.block_size, params.block_size), params)
+        if table is not None:
+            coeffs = _from_blocks(_dequantize(_to_blocks(coeffs, params.block_size), table))
+
+        idct_frame = await _run_transform(_dct2_blocks, coeffs, params.block_size, True)
+
+        return array_response(idct_frame, binary, block_size=params.block_size)
     except Exception as e:
         return {"error": str(e)}
 
+async def _transform_stream_frame(message: bytes) -> bytes | str:
+    """
+    Transforms one WebSocket frame. Failures are returned as a JSON text message so they
+    still occupy the frame's slot in the ordered output stream.
+    """
+    try:
+        frame, meta = decode_array(message)
+        params = DCTStreamFrame.model_validate(meta)
+        result = await _run_transform(_dct2_blocks, frame, params.block_size, params.direction == "inverse")
+        # Echo the request header back so clients can tag frames (e.g. with a frame id)
+        return encode_array(result, **{**meta, **params.model_dump()})
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+@app.websocket("/ws/dct")
+async def dct_stream(websocket: WebSocket):
+    """
+    API Contract:
+    - Client messages (binary): `wire_format` messages holding a frame, with optional header
+      parameters `block_size` (`int`, default 8) and `direction` (`"forward"` or `"inverse"`,
+      default `"forward"`). Any other header keys are echoed back unchanged.
+    - Server messages, one per client message and in the same order:
+        - (binary) A `wire_format` message with the block coefficients laid out in place (or the
+          reconstructed frame for `"inverse"`), carrying the request header.
+        - (text) `{"error": str}` if that frame could not be transformed.
+    - Up to `DCT_SERVER_WS_WINDOW` frames are transformed concurrently. Beyond that the server stops
+      reading, so a client that does not keep up with the results is slowed down by TCP back-pressure.
+    """
+    await websocket.accept()
+    pending = asyncio.Queue(maxsize=WEBSOCKET_WINDOW)
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            # Text messages are not valid frames; they fail to decode and get an error reply
+            payload = message.get("bytes") or (message.get("text") or "").encode()
+            # Blocks once the window is full, which stops reading from the socket
+            await pending.put(asyncio.ensure_future(_transform_stream_frame(payload)))
+        await pending.put(None)
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while (task := await pending.get()) is not None:
+            result = await task
+            if isinstance(result, bytes):
+                await websocket.send_bytes(result)
+            else:
+                await websocket.send_text(result)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        while not pending.empty():
+            task = pending.get_nowait()
+            if task is not None:
+                task.cancel()
+
+@app.post("/idct_zigzag")
+async def calculate_idct_zigzag(request: Request):
+    """
+    API Contract:
+    - Request Body (`application/json`):
+        - `values`: `list[float]` - Zig-zag truncated coefficients, as returned by `/dct` or `/dct_blocks` with `keep`.
+        - `counts`: `list[int]` - The number of values belonging to each block.
+        - `shape`: `list[int]` - The shape of the frame to reconstruct.
+        - `block_size`: `int` (optional) - The block size. Omit it for a single block covering the whole frame.
+        - `quality` / `quant_table` (optional) - If the coefficients are quantized, the same
+                  quantization parameters that were passed to the forward transform.
+    - Request Body (`application/octet-stream`):
+        - A multi-array `wire_format` message with `values` and `counts` arrays and the other fields in
+          the header. The binary response of `/dct_blocks` with `keep` can be sent back unchanged.
+    - Response Body (Success):
+        - `result`: `list[list[float]]` - The reconstructed frame, with dropped coefficients treated as zero.
+                    Binary requests get a `wire_format` message instead (float32 unless the values were float64).
+    - Response Body (Error):
+        - `error`: `str` - A string containing the error message.
+    """
+    arrays, params, binary = await read_arrays_payload(request, ZigzagRequest, ("values", "counts"))
+    try:
+        if len(params.shape) != 2:
+            raise ValueError(f"Expected a 2D shape, got {params.shape}")
+        height, width = params.shape
+        block_shape = (params.block_size, params.block_size) if params.block_size else (height, width)
+        if block_shape[0] <= 0 or height % block_shape[0] or width % block_shape[1]:
+            raise ValueError(f"Frame shape {tuple(params.shape)} is not divisible by block shape {block_shape}")
+        grid = (height // block_shape[0], width // block_shape[1])
+
+        blocks = _expand_zigzag(arrays["values"], arrays["counts"].astype(np.int64), grid, block_shape)
+        table = _quant_table(block_shape, params)
+        if table is not None:
+            blocks = _dequantize(blocks, table)
+
+        frame = await _run_transform(_dct2_blocks, _from_blocks(blocks), block_shape[0], True) if params.block_size \
+            else await _run_transform(_dct2, _from_blocks(blocks), True)
+        return array_response(frame, binary)
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/dct_color")
+async def calculate_dct_color(request: Request):
+    """
+    API Contract:
+    - Request Body (`application/json`):
+        - `data`: `list[list[list[float]]]` - An (H, W, 3) RGB frame, typically 0-255.
+                  Height and width must both be divisible by `block_size` (by `2 * block_size` with `subsample`).
+        - `block_size`: `int` - Edge length of the square blocks (default 8).
+        - `color_space`: `str` - "rgb" (default) transforms the R, G and B planes as they are; "ycbcr"
+                         converts to JFIF YCbCr first.
+        - `subsample`: `bool` - With "ycbcr", halve the chroma planes in both directions (4:2:0) before
+                       transforming them (default false).
+        - `quality` / `quant_table` (optional) - Quantize the coefficients as in `/dct_blocks`. With `quality`,
+                  the chroma planes use the JPEG chrominance table.
+    - Request Body (`application/octet-stream`):
+        - A `wire_format` message holding the (H, W, 3) frame (e.g. uint8), with the other fields in the header.
+    - Response Body (Success):
+        - `r`, `g`, `b` (or `y`, `cb`, `cr`): `list[list[float]]` - Block DCT coefficients of each plane, laid out
+                    in place as in `/dct_blocks`. Subsampled chroma planes are (H / 2, W / 2).
+                    Quantized requests get `list[list[int]]` quantized coefficients instead.
+        - `block_size`, `color_space`, `subsample` (and `quality` / `quant_table` when given) - Echoed back, so
+                    the response can be passed to `/idct_color` as is.
+                    Binary requests get a multi-array `wire_format` message with one array per plane instead
+                    (float32 unless the input was float64, int16 when quantized).
+    - Response Body (Error):
+        - `error`: `str` - A string containing the error message.
+    """
+    frame, params, binary = await read_payload(request, ColorDCTRequest)
+    try:
+        planes = _split_planes(frame, params.color_space, params.subsample)
+        tables = _plane_tables(params)
+
+        # Blocks of all planes go through one vectorized DCT
+        stacked, grids = _stack_blocks(planes, params.block_size)
+        coeffs = _unstack_blocks(await _run_transform(_dct2, stacked), grids)
+        coeffs = [blocks if table is None else _quantize(blocks, table) for blocks, table in zip(coeffs, tables)]
+
+        names = COLOR_CHANNELS[params.color_space]
+        return arrays_response(
+            {name: _from_blocks(blocks) for name, blocks in zip(names, coeffs)}, binary,
+            **params.model_dump(include={"block_size", "color_space", "subsample", "quality", "quant_table"}, exclude_none=True),
+        )
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/idct_color")
+async def calculate_idct_color(request: Request):
+    """
+    API Contract:
+    - Request Body (`application/json`):
+        - `r`, `g`, `b` (or `y`, `cb`, `cr` with `color_space` "ycbcr"): `list[list[float]]` - Block DCT
+                  coefficients of each plane, as returned by `/dct_color`.
+        - `block_size`, `color_space`, `subsample`, `quality` / `quant_table` - The parameters that were passed
+                  to `/dct_color`.
+    - Request Body (`application/octet-stream`):
+        - A multi-array `wire_format` message with one array per plane and the other fields in the header.
+          The binary response of `/dct_color` can be sent back unchanged.
+    - Response Body (Success):
+        - `result`: `list[list[list[float]]]` - The reconstructed (H, W, 3) RGB frame.
+                    Binary requests get a `wire_format` message instead (float32 unless the planes were float64).
+    - Response Body (Error):
+        - `error`: `str` - A string containing the error message.
+    """
+    arrays, params, binary = await read_arrays_payload(
+        request, ColorPlanesRequest, lambda params: COLOR_CHANNELS[params.color_space],
+    )
+    try:
+        tables = _plane_tables(params)
+        planes = [_to_blocks(plane, params.block_size) for plane in arrays.values()]
+        planes = [_from_blocks(blocks if table is None else _dequantize(blocks, table)) for blocks, table in zip(planes, tables)]
+
+        stacked, grids = _stack_blocks(planes, params.block_size)
+        planes = [_from_blocks(blocks) for blocks in _unstack_blocks(await _run_transform(_dct2, stacked, True), grids)]
+        return array_response(_merge_planes(planes, params.color_space, params.subsample), binary)
+    except Exception as e:
+        return {"error": str(e)}
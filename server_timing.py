@@ -0,0 +1,136 @@
+"""
+Per-request timing shared by the transform servers (`scipy_dct_server.py`, `numpy_dct_server.py`).
+
+`ServerTimingMiddleware` gives every HTTP request a `RequestTimer`. Code on the request path
+times its work with `phase(name)` (the wire format does this for `decode` and `encode`, the
+servers for `transform`), and the middleware reports the phases in a `Server-Timing` header:
+
+    Server-Timing: decode;dur=0.412, transform;dur=3.108, encode;dur=0.957, total;dur=4.630
+
+Durations are in milliseconds. `phase` is a no-op outside a request (e.g. on the WebSocket
+channel or in worker processes), so helpers can use it unconditionally.
+
+The middleware also feeds a `LatencyMetrics`, which aggregates latency histograms per route
+and input matrix size for the servers' `/metrics` endpoints.
+"""
+import bisect
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Distinct matrix sizes tracked per route before further sizes are folded into "other"
+MAX_SIZES_PER_ROUTE = 64
+
+_current_timer = contextvars.ContextVar("server_timing", default=None)
+
+class RequestTimer:
+    """
+    Accumulates the phase durations (seconds) and input size of one request.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.size = None
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> bytes:
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries).encode("latin-1")
+
+@contextmanager
+def phase(name: str):
+    """
+    Times the enclosed block as phase `name` of the current request, if there is one.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+def record_size(shape: tuple):
+    """
+    Records the input matrix shape of the current request, which keys its `/metrics` series.
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.size = "x".join(map(str, shape))
+
+class LatencyMetrics:
+    """
+    Latency histograms per (route, matrix size), with the time spent in each phase.
+    """
+    def __init__(self):
+        self.series = {}
+
+    def observe(self, route: str, size: str | None, total: float, phases: dict):
+        sizes = self.series.setdefault(route, {})
+        size = size or "none"
+        if size not in sizes and len(sizes) >= MAX_SIZES_PER_ROUTE:
+            size = "other"
+        entry = sizes.get(size)
+        if entry is None:
+            entry = sizes[size] = {"count": 0, "total_ms": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1), "phases_ms": {}}
+
+        total_ms = total * 1000
+        entry["count"] += 1
+        entry["total_ms"] += total_ms
+        entry["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+        for name, seconds in phases.items():
+            entry["phases_ms"][name] = entry["phases_ms"].get(name, 0.0) + seconds * 1000
+
+    def snapshot(self) -> dict:
+        series = [
+            {
+                "route": route,
+                "size": size,
+                "count": entry["count"],
+                "mean_ms": entry["total_ms"] / entry["count"],
+                "buckets": list(entry["buckets"]),
+                "mean_phases_ms": {name: total / entry["count"] for name, total in entry["phases_ms"].items()},
+            }
+            for route, sizes in self.series.items()
+            for size, entry in sizes.items()
+        ]
+        return {"bucket_bounds_ms": list(LATENCY_BUCKETS_MS), "series": series}
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that times HTTP requests, adds the `Server-Timing` header and, when given
+    a `LatencyMetrics`, records requests that matched a route.
+    """
+    def __init__(self, app, metrics: LatencyMetrics | None = None):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                # The handler has returned and its response body is already rendered
+                total = time.perf_counter() - timer.start
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timer.header(total))]}
+                route = scope.get("route")
+                if self.metrics is not None and route is not None:
+                    self.metrics.observe(route.path, timer.size, total, timer.phases)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timer.reset(token)
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from fastapi.testclient import TestClient
+from numpy_dct_server import app
+from wire_format import encode_array, decode_array, OCTET_STREAM
+
+class TestNumpyDCTServer(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def _post_binary(self, path, array, **meta):
+        response = self.client.post(path, content=encode_array(array, **meta), headers={"Content-Type": OCTET_STREAM})
+        self.assertEqual(response.headers["content-type"], OCTET_STREAM)
+        return decode_array(response.content)
+
+    def test_fft2_binary_returns_native_complex(self):
+        frame = (np.random.rand(8, 8) * 255).astype(np.uint8)
+
+        coeffs, _ = self._post_binary("/fft2", frame)
+
+        self.assertEqual(coeffs.dtype, np.complex64)
+        self.assertTrue(np.allclose(coeffs, np.fft.fft2(frame), atol=1e-2))
+
+    def test_fft2_ifft2_binary_identity(self):
+        frame = np.random.rand(8, 12) * 255
+
+        coeffs, _ = self._post_binary("/fft2", frame)
+        reconstructed, _ = self._post_binary("/ifft2", coeffs)
+
+        self.assertEqual(reconstructed.dtype, np.float64)
+        self.assertTrue(np.allclose(reconstructed, frame))
+
+    def test_fft2_json_still_returns_strings(self):
+        response = self.client.post("/fft2", json={"data": [[1.0, 2.0], [3.0, 4.0]]})
+        result = response.json()["result"]
+
+        self.assertIsInstance(result[0][0], str)
+        self.assertTrue(np.allclose(np.array(result, dtype=complex), np.fft.fft2([[1.0, 2.0], [3.0, 4.0]])))
+
+    def test_rfft2_binary_is_interleaved_half_spectrum(self):
+        frame = (np.random.rand(8, 10) * 255).astype(np.uint8)
+
+        packed, meta = self._post_binary("/rfft2", frame)
+
+        self.assertEqual(packed.dtype, np.float32)
+        self.assertEqual(packed.shape, (8, 6, 2))
+        self.assertEqual(meta, {"width": 10})
+        expected = np.fft.rfft2(frame)
+        self.assertTrue(np.allclose(packed[..., 0], expected.real, atol=1e-2))
+        self.assertTrue(np.allclose(packed[..., 1], expected.imag, atol=1e-2))
+
+    def test_rfft2_irfft2_odd_width_identity(self):
+        frame = np.random.rand(6, 9) * 255
+
+        packed, meta = self._post_binary("/rfft2", frame)
+        reconstructed, _ = self._post_binary("/irfft2", packed, width=meta["width"])
+
+        self.assertTrue(np.allclose(reconstructed, frame))
+
+    def test_rfft2_irfft2_json_identity(self):
+        frame = np.random.rand(4, 8) * 255
+
+        response = self.client.post("/rfft2", json={"data": frame.tolist()}).json()
+        reconstructed = self.client.post("/irfft2", json={"data": response["result"], "width": response["width"]}).json()["result"]
+
+        self.assertTrue(np.allclose(np.array(reconstructed), frame))
+
+    def test_rfft2_irfft2_multichannel_identity(self):
+        frame = (np.random.rand(6, 9, 3) * 255).astype(np.uint8)
+
+        packed, meta = self._post_binary("/rfft2", frame)
+        self.assertEqual(packed.shape, (6, 5, 3, 2))
+        self.assertTrue(np.allclose(packed[:, :, 1, 0], np.fft.rfft2(frame[:, :, 1]).real, atol=1e-2))
+
+        reconstructed, _ = self._post_binary("/irfft2", packed, width=meta["width"])
+        self.assertTrue(np.allclose(reconstructed, frame, atol=1e-3))
+
+    def test_fft2_json_server_timing_header(self):
+        response = self.client.post("/fft2", json={"data": np.ones((4, 4)).tolist()})
+
+        phases = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+        self.assertEqual(phases, ["decode", "transform", "encode", "total"])
+        self.assertIn("/fft2", [s["route"] for s in self.client.get("/metrics").json()["series"]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,333 @@
+import unittest
+from unittest.mock import patch
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+from scipy.fftpack import dct
+from fastapi.testclient import TestClient
+from scipy.fft import dctn
+from scipy_dct_server import app, _to_blocks, _from_blocks, _dct2, _quant_table, _zigzag_order, _truncate_zigzag, DCTBasisCache, QuantizationParams, MATMUL_MAX_SIZE, JPEG_LUMINANCE_TABLE, _split_planes, _merge_planes
+from wire_format import encode_array, decode_array, encode_arrays, decode_arrays, OCTET_STREAM
+
+class TestScipyDCTServer(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_blocks_round_trip_layout(self):
+        frame = np.arange(16 * 24, dtype=float).reshape(16, 24)
+        blocks = _to_blocks(frame, 8)
+
+        self.assertEqual(blocks.shape, (2, 3, 8, 8))
+        self.assertTrue(np.array_equal(blocks[1, 2], frame[8:16, 16:24]))
+        self.assertTrue(np.array_equal(_from_blocks(blocks), frame))
+
+    def test_to_blocks_rejects_indivisible_frame(self):
+        with self.assertRaises(ValueError):
+            _to_blocks(np.zeros((10, 16)), 8)
+
+    def test_dct_blocks_matches_per_block_dct(self):
+        frame = np.random.rand(16, 32) * 255
+
+        response = self.client.post("/dct_blocks", json={"data": frame.tolist(), "block_size": 8})
+        result = np.array(response.json()["result"])
+
+        block = frame[8:16, 24:32]
+        expected = dct(dct(block, axis=0, norm='ortho'), axis=1, norm='ortho')
+        self.assertTrue(np.allclose(result[8:16, 24:32], expected))
+
+    def test_dct_idct_blocks_identity(self):
+        frame = np.random.rand(32, 16) * 255
+
+        coeffs = self.client.post("/dct_blocks", json={"data": frame.tolist(), "block_size": 16}).json()["result"]
+        reconstructed = self.client.post("/idct_blocks", json={"data": coeffs, "block_size": 16}).json()["result"]
+
+        self.assertTrue(np.allclose(np.array(reconstructed), frame))
+
+    def test_dct_blocks_indivisible_frame_returns_error(self):
+        response = self.client.post("/dct_blocks", json={"data": np.zeros((10, 16)).tolist(), "block_size": 8})
+        self.assertIn("error", response.json())
+
+    def test_dct_blocks_binary_round_trip(self):
+        frame = (np.random.rand(16, 24) * 255).astype(np.uint8)
+        headers = {"Content-Type": OCTET_STREAM}
+
+        response = self.client.post("/dct_blocks", content=encode_array(frame, block_size=8), headers=headers)
+        coeffs, meta = decode_array(response.content)
+        self.assertEqual(coeffs.dtype, np.float32)
+        self.assertEqual(meta, {"block_size": 8})
+
+        response = self.client.post("/idct_blocks", content=encode_array(coeffs, block_size=8), headers=headers)
+        reconstructed, _ = decode_array(response.content)
+        self.assertTrue(np.allclose(reconstructed, frame, atol=1e-3))
+
+    def test_dct_json_unchanged(self):
+        data = np.random.rand(4, 4)
+
+        result = self.client.post("/dct", json={"data": data.tolist()}).json()["result"]
+
+        expected = dct(dct(data, axis=0, norm='ortho'), axis=1, norm='ortho')
+        self.assertTrue(np.allclose(np.array(result), expected))
+
+    def test_malformed_binary_payload_is_rejected(self):
+        response = self.client.post("/dct", content=b"not an array", headers={"Content-Type": OCTET_STREAM})
+        self.assertEqual(response.status_code, 400)
+
+    def test_basis_cache_counts_hits_and_misses(self):
+        cache = DCTBasisCache()
+
+        first = cache.get(8, np.float32)
+        second = cache.get(8, np.float32)
+        cache.get(8, np.float64)
+
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertTrue(np.allclose(first @ first.T, np.eye(8), atol=1e-6))
+
+    def test_matmul_path_matches_dctn(self):
+        blocks = np.random.rand(3, 5, 8, 8) * 255
+
+        self.assertLessEqual(8, MATMUL_MAX_SIZE)
+        self.assertTrue(np.allclose(_dct2(blocks), dctn(blocks, axes=(-2, -1), norm='ortho')))
+        self.assertTrue(np.allclose(_dct2(_dct2(blocks), inverse=True), blocks))
+
+    def test_large_transform_uses_fft_path(self):
+        data = np.random.rand(MATMUL_MAX_SIZE + 1, 40)
+
+        self.assertTrue(np.allclose(_dct2(data), dctn(data, norm='ortho')))
+
+    def test_stats_endpoint_reports_basis_cache(self):
+        self.client.post("/dct_blocks", json={"data": np.zeros((8, 16)).tolist(), "block_size": 8})
+
+        stats = self.client.get("/stats").json()
+
+        self.assertIn({"size": 8, "dtype": "<f8", "norm": "ortho"}, stats["basis_cache"]["entries"])
+        self.assertGreater(stats["basis_cache"]["hits"], 0)
+
+    def test_server_timing_header_and_metrics(self):
+        frame = np.zeros((24, 32), dtype=np.uint8)
+
+        response = self.client.post("/dct_blocks", content=encode_array(frame, block_size=8), headers={"Content-Type": OCTET_STREAM})
+
+        phases = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+        self.assertEqual(phases, ["decode", "transform", "encode", "total"])
+        series = self.client.get("/metrics").json()["series"]
+        self.assertTrue(any(s["route"] == "/dct_blocks" and s["size"] == "24x32" for s in series))
+
+    def test_websocket_stream_preserves_order_and_tags(self):
+        frames = [(np.random.rand(16, 16) * 255).astype(np.uint8) for _ in range(6)]
+
+        with self.client.websocket_connect("/ws/dct") as websocket:
+            for i, frame in enumerate(frames):
+                websocket.send_bytes(encode_array(frame, block_size=8, frame_id=i))
+            replies = [decode_array(websocket.receive_bytes()) for _ in frames]
+
+        for i, (coeffs, meta) in enumerate(replies):
+            self.assertEqual(meta, {"block_size": 8, "direction": "forward", "frame_id": i})
+            self.assertTrue(np.allclose(coeffs, _from_blocks(_dct2(_to_blocks(frames[i], 8))), atol=1e-3))
+
+    def test_websocket_inverse_direction(self):
+        frame = np.random.rand(16, 32) * 255
+
+        with self.client.websocket_connect("/ws/dct") as websocket:
+            websocket.send_bytes(encode_array(frame, block_size=16))
+            coeffs, _ = decode_array(websocket.receive_bytes())
+            websocket.send_bytes(encode_array(coeffs, block_size=16, direction="inverse"))
+            reconstructed, _ = decode_array(websocket.receive_bytes())
+
+        self.assertTrue(np.allclose(reconstructed, frame))
+
+    def test_websocket_bad_frame_reports_error_in_order(self):
+        frame = np.zeros((8, 8), dtype=np.uint8)
+
+        with self.client.websocket_connect("/ws/dct") as websocket:
+            websocket.send_bytes(encode_array(np.zeros((10, 8)), block_size=8))
+            websocket.send_bytes(encode_array(frame, block_size=8))
+            error = websocket.receive_json()
+            coeffs, _ = decode_array(websocket.receive_bytes())
+
+        self.assertIn("error", error)
+        self.assertEqual(coeffs.shape, (8, 8))
+
+    def test_quant_table_quality_scaling(self):
+        self.assertTrue(np.array_equal(_quant_table((8, 8), QuantizationParams(quality=50)), JPEG_LUMINANCE_TABLE))
+        self.assertTrue((_quant_table((8, 8), QuantizationParams(quality=100)) == 1).all())
+        self.assertIsNone(_quant_table((8, 8), QuantizationParams()))
+        self.assertEqual(_quant_table((16, 16), QuantizationParams(quality=50))[0, 0], 32)
+
+    def test_quantized_dct_blocks_binary_round_trip(self):
+        frame = (np.random.rand(16, 32) * 255).astype(np.uint8)
+        headers = {"Content-Type": OCTET_STREAM}
+
+        response = self.client.post("/dct_blocks", content=encode_array(frame, block_size=8, quality=90), headers=headers)
+        quantized, _ = decode_array(response.content)
+        self.assertEqual(quantized.dtype, np.int16)
+
+        response = self.client.post("/idct_blocks", content=encode_array(quantized, block_size=8, quality=90), headers=headers)
+        reconstructed, _ = decode_array(response.content)
+        self.assertEqual(reconstructed.dtype, np.float32)
+        self.assertLess(np.abs(reconstructed - frame).mean(), 8)
+
+    def test_dct_with_explicit_quant_table(self):
+        data = np.random.rand(4, 4) * 255
+        table = np.full((4, 4), 2.0)
+
+        result = self.client.post("/dct", json={"data": data.tolist(), "quant_table": table.tolist()}).json()["result"]
+
+        expected = np.rint(dct(dct(data, axis=0, norm='ortho'), axis=1, norm='ortho') / 2)
+        self.assertTrue(all(isinstance(v, int) for row in result for v in row))
+        self.assertTrue(np.array_equal(np.array(result), expected))
+
+    def test_quant_table_shape_mismatch_returns_error(self):
+        response = self.client.post("/dct_blocks", json={"data": np.zeros((8, 8)).tolist(), "quant_table": np.ones((4, 4)).tolist()})
+        self.assertIn("error", response.json())
+
+    def test_zigzag_order(self):
+        order = _zigzag_order(8, 8)
+        self.assertEqual([divmod(i, 8) for i in order[:6]], [(0, 0), (0, 1), (1, 0), (2, 0), (1, 1), (0, 2)])
+        self.assertEqual(divmod(order[-1], 8), (7, 7))
+        self.assertEqual(sorted(order), list(range(64)))
+
+    def test_truncate_zigzag_drops_trailing_zeros(self):
+        blocks = np.zeros((1, 2, 4, 4))
+        blocks[0, 0, 0, :2] = [5, 3]
+        blocks[0, 1, 0, 0] = 7
+
+        values, counts = _truncate_zigzag(blocks, 6)
+
+        self.assertEqual(counts.tolist(), [2, 1])
+        self.assertEqual(values.tolist(), [5, 3, 7])
+
+    def test_dct_blocks_keep_binary_round_trip(self):
+        frame = (np.random.rand(16, 32) * 255).astype(np.uint8)
+        headers = {"Content-Type": OCTET_STREAM}
+
+        response = self.client.post("/dct_blocks", content=encode_array(frame, block_size=8, keep=10, quality=75), headers=headers)
+        arrays, meta = decode_arrays(response.content)
+        self.assertEqual(meta, {"shape": [16, 32], "block_size": 8, "quality": 75})
+        self.assertEqual(arrays["values"].dtype, np.int16)
+        self.assertLessEqual(arrays["counts"].max(), 10)
+
+        response = self.client.post("/idct_zigzag", content=response.content, headers=headers)
+        truncated, _ = decode_array(response.content)
+
+        reference = self.client.post("/dct_blocks", content=encode_array(frame, block_size=8, quality=75), headers=headers)
+        full, _ = decode_array(reference.content)
+        full_blocks = _to_blocks(full, 8).reshape(-1, 64)
+        full_blocks[:, _zigzag_order(8, 8)[10:]] = 0
+        expected = self.client.post("/idct_blocks", content=encode_array(_from_blocks(full_blocks.reshape(2, 4, 8, 8)), block_size=8, quality=75), headers=headers)
+        self.assertTrue(np.allclose(truncated, decode_array(expected.content)[0], atol=1e-3))
+
+    def test_dct_keep_json_round_trip(self):
+        data = np.random.rand(8, 8) * 255
+
+        response = self.client.post("/dct", json={"data": data.tolist(), "keep": 64}).json()
+        self.assertEqual(response["counts"], [64])
+        self.assertEqual(response["shape"], [8, 8])
+
+        result = self.client.post("/idct_zigzag", json=response).json()["result"]
+        self.assertTrue(np.allclose(np.array(result), data))
+
+    def test_idct_zigzag_rejects_single_array_payload(self):
+        response = self.client.post("/idct_zigzag", content=encode_array(np.zeros((8, 8))), headers={"Content-Type": OCTET_STREAM})
+        self.assertEqual(response.status_code, 400)
+
+    def test_idct_zigzag_count_mismatch_returns_error(self):
+        response = self.client.post("/idct_zigzag", json={"values": [1.0, 2.0], "counts": [1], "shape": [8, 8]})
+        self.assertIn("error", response.json())
+
+    def test_ycbcr_planes_round_trip(self):
+        frame = np.random.rand(4, 6, 3) * 255
+
+        y, cb, cr = _split_planes(frame, "ycbcr", subsample=False)
+
+        self.assertTrue(np.allclose(y, frame @ [0.299, 0.587, 0.114]))
+        self.assertTrue(np.allclose(_merge_planes([y, cb, cr], "ycbcr", subsample=False), frame))
+        self.assertEqual(_split_planes(frame, "ycbcr", subsample=True)[1].shape, (2, 3))
+
+    def test_dct_color_matches_per_plane_dct_blocks(self):
+        frame = (np.random.rand(16, 24, 3) * 255).astype(np.uint8)
+        headers = {"Content-Type": OCTET_STREAM}
+
+        response = self.client.post("/dct_color", content=encode_array(frame, block_size=8), headers=headers)
+        planes, meta = decode_arrays(response.content)
+
+        self.assertEqual(list(planes), ["r", "g", "b"])
+        self.assertEqual(meta, {"block_size": 8, "color_space": "rgb", "subsample": False})
+        green = _from_blocks(_dct2(_to_blocks(frame[:, :, 1].astype(np.float32), 8)))
+        self.assertTrue(np.allclose(planes["g"], green, atol=1e-3))
+
+    def test_dct_color_ycbcr_subsampled_binary_round_trip(self):
+        # A smooth frame, so 4:2:0 subsampling loses little
+        rows, cols = np.mgrid[0:32, 0:32]
+        frame = np.stack([rows * 8, cols * 8, (rows + cols) * 4], axis=-1).astype(np.uint8)
+        headers = {"Content-Type": OCTET_STREAM}
+
+        response = self.client.post("/dct_color", content=encode_array(frame, color_space="ycbcr", subsample=True, quality=90), headers=headers)
+        planes, _ = decode_arrays(response.content)
+        self.assertEqual(planes["y"].shape, (32, 32))
+        self.assertEqual(planes["cb"].shape, (16, 16))
+        self.assertEqual(planes["cr"].dtype, np.int16)
+
+        response = self.client.post("/idct_color", content=response.content, headers=headers)
+        reconstructed, _ = decode_array(response.content)
+        self.assertEqual(reconstructed.shape, (32, 32, 3))
+        self.assertLess(np.abs(reconstructed - frame).mean(), 4)
+
+    def test_dct_color_json_round_trip(self):
+        frame = np.random.rand(8, 16, 3) * 255
+
+        response = self.client.post("/dct_color", json={"data": frame.tolist(), "color_space": "ycbcr"}).json()
+        result = self.client.post("/idct_color", json=response).json()["result"]
+
+        self.assertTrue(np.allclose(np.array(result), frame))
+
+    def test_idct_color_missing_plane_is_rejected(self):
+        payload = encode_arrays({"y": np.zeros((8, 8)), "cb": np.zeros((8, 8))}, color_space="ycbcr")
+        response = self.client.post("/idct_color", content=payload, headers={"Content-Type": OCTET_STREAM})
+        self.assertEqual(response.status_code, 400)
+
+    def test_dct_color_subsample_requires_ycbcr(self):
+        response = self.client.post("/dct_color", json={"data": np.zeros((16, 16, 3)).tolist(), "subsample": True})
+        self.assertIn("error", response.json())
+
+class TestScipyDCTServerWorkerPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def _dct_blocks_via_pool(self, frame, shm_min_bytes):
+        with patch('scipy_dct_server._executor', self.executor), patch('scipy_dct_server.SHARED_MEMORY_MIN_BYTES', shm_min_bytes):
+            response = self.client.post("/dct_blocks", content=encode_array(frame, block_size=8), headers={"Content-Type": OCTET_STREAM})
+        return decode_array(response.content)[0]
+
+    def test_shared_memory_hand_off_matches_inline(self):
+        frame = (np.random.rand(64, 96) * 255).astype(np.uint8)
+
+        coeffs = self._dct_blocks_via_pool(frame, shm_min_bytes=0)
+
+        self.assertTrue(np.allclose(coeffs, _from_blocks(_dct2(_to_blocks(frame, 8))), atol=1e-3))
+
+    def test_small_arrays_are_pickled_to_workers(self):
+        frame = (np.random.rand(16, 16) * 255).astype(np.uint8)
+
+        coeffs = self._dct_blocks_via_pool(frame, shm_min_bytes=1 << 30)
+
+        self.assertTrue(np.allclose(coeffs, _from_blocks(_dct2(_to_blocks(frame, 8))), atol=1e-3))
+
+    def test_worker_errors_are_reported(self):
+        with patch('scipy_dct_server._executor', self.executor), patch('scipy_dct_server.SHARED_MEMORY_MIN_BYTES', 0):
+            response = self.client.post("/dct_blocks", json={"data": np.zeros((10, 16)).tolist(), "block_size": 8})
+
+        self.assertIn("error", response.json())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from server_timing import LatencyMetrics, RequestTimer, phase, MAX_SIZES_PER_ROUTE, LATENCY_BUCKETS_MS
+
+class TestServerTiming(unittest.TestCase):
+
+    def test_header_lists_phases_then_total(self):
+        timer = RequestTimer()
+        timer.add("decode", 0.0015)
+        timer.add("decode", 0.0005)
+        timer.add("transform", 0.010)
+
+        self.assertEqual(timer.header(0.0125), b"decode;dur=2.000, transform;dur=10.000, total;dur=12.500")
+
+    def test_phase_outside_a_request_is_a_no_op(self):
+        with phase("transform"):
+            pass
+
+    def test_metrics_histogram_per_route_and_size(self):
+        metrics = LatencyMetrics()
+        metrics.observe("/dct_blocks", "1080x1920", 0.003, {"transform": 0.002})
+        metrics.observe("/dct_blocks", "1080x1920", 0.030, {"transform": 0.004})
+        metrics.observe("/dct_blocks", "8x8", 0.0001, {})
+
+        snapshot = metrics.snapshot()
+        large = next(s for s in snapshot["series"] if s["size"] == "1080x1920")
+
+        self.assertEqual(snapshot["bucket_bounds_ms"], list(LATENCY_BUCKETS_MS))
+        self.assertEqual(large["count"], 2)
+        self.assertEqual(large["buckets"][LATENCY_BUCKETS_MS.index(5)], 1)
+        self.assertEqual(large["buckets"][LATENCY_BUCKETS_MS.index(50)], 1)
+        self.assertAlmostEqual(large["mean_phases_ms"]["transform"], 3.0)
+
+    def test_metrics_fold_excess_sizes(self):
+        metrics = LatencyMetrics()
+        for size in range(MAX_SIZES_PER_ROUTE + 5):
+            metrics.observe("/dct", f"{size}x{size}", 0.001, {})
+
+        sizes = [s["size"] for s in metrics.snapshot()["series"]]
+
+        self.assertEqual(len(sizes), MAX_SIZES_PER_ROUTE + 1)
+        self.assertEqual(next(s for s in metrics.snapshot()["series"] if s["size"] == "other")["count"], 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from wire_format import encode_array, decode_array, encode_arrays, decode_arrays
+
+class TestWireFormat(unittest.TestCase):
+
+    def test_round_trip_preserves_shape_dtype_and_meta(self):
+        original = np.random.rand(6, 10).astype(np.float32)
+
+        decoded, meta = decode_array(encode_array(original, block_size=8))
+
+        self.assertEqual(decoded.dtype, np.float32)
+        self.assertEqual(decoded.shape, (6, 10))
+        self.assertTrue(np.array_equal(decoded, original))
+        self.assertEqual(meta, {"block_size": 8})
+
+    def test_round_trip_complex(self):
+        original = (np.random.rand(4, 4) + 1j * np.random.rand(4, 4)).astype(np.complex64)
+
+        decoded, _ = decode_array(encode_array(original))
+
+        self.assertTrue(np.array_equal(decoded, original))
+
+    def test_payload_is_aligned_and_not_copied(self):
+        buffer = encode_array(np.arange(5, dtype=np.uint8))
+
+        decoded, _ = decode_array(buffer)
+
+        self.assertEqual((len(buffer) - decoded.nbytes) % 8, 0)
+        self.assertFalse(decoded.flags.writeable)
+
+    def test_non_contiguous_input(self):
+        original = np.arange(24, dtype=np.float64).reshape(4, 6)[:, ::2]
+
+        decoded, _ = decode_array(encode_array(original))
+
+        self.assertTrue(np.array_equal(decoded, original))
+
+    def test_rejects_bad_magic(self):
+        with self.assertRaises(ValueError):
+            decode_array(b"XXXX" + encode_array(np.zeros(2))[4:])
+
+    def test_rejects_truncated_payload(self):
+        with self.assertRaises(ValueError):
+            decode_array(encode_array(np.zeros(4))[:-1])
+
+    def test_multi_array_round_trip(self):
+        values = np.arange(5, dtype=np.int16)
+        counts = np.array([2, 3], dtype=np.int32)
+
+        arrays, meta = decode_arrays(encode_arrays({"values": values, "counts": counts}, shape=[8, 8]))
+
+        self.assertEqual(list(arrays), ["values", "counts"])
+        self.assertTrue(np.array_equal(arrays["values"], values))
+        self.assertTrue(np.array_equal(arrays["counts"], counts))
+        self.assertEqual(arrays["counts"].ctypes.data % 8, 0)
+        self.assertEqual(meta, {"shape": [8, 8]})
+
+    def test_single_and_multi_array_payloads_are_not_interchangeable(self):
+        with self.assertRaises(ValueError):
+            decode_array(encode_arrays({"values": np.zeros(3)}))
+        with self.assertRaises(ValueError):
+            decode_arrays(encode_array(np.zeros(3)))
+
+if __name__ == '__main__':
+    unittest.main()
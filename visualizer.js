@@ -148,10 +148,13 @@ async function visualizeAccumulator() {
 }
 
 async function visualizeOutput() {
+    // Served as a raw JPEG, which fetchData returns as a Blob
     const data = await fetchData(`${PROXY_SERVER}/orchestration_service/get_processed_frame`);
-    if (data && data.image_data_b64) {
+    if (data instanceof Blob) {
+        const imageUrl = URL.createObjectURL(data);
         const img = new Image();
         img.onload = () => {
+            URL.revokeObjectURL(imageUrl);
             clearCanvas(ctxOutput, outputCanvas);
             const aspectRatio = img.width / img.height;
             let drawWidth = outputCanvas.width;
@@ -165,7 +168,7 @@ async function visualizeOutput() {
             const y = (outputCanvas.height - drawHeight) / 2;
             ctxOutput.drawImage(img, x, y, drawWidth, drawHeight);
         };
-        img.src = `data:image/jpeg;base64,${data.image_data_b64}`;
+        img.src = imageUrl;
     } else {
         drawText(ctxOutput, outputCanvas, "No processed output");
     }
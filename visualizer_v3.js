@@ -14,28 +14,28 @@ navigator.mediaDevices.getUserMedia({ video: true })
 async function processFrame() {
     console.log("processFrame called");
     inputCtx.drawImage(video, 0, 0, inputCanvas.width, inputCanvas.height);
-    const imageData = inputCanvas.toDataURL('image/png');
-    
-    // Remove the data URL prefix to send only the Base64 data
-    const base64Data = imageData.replace(/^data:image\/png;base64,/, '');
+    // Send the frame as a raw JPEG body, and ask for the result the same way
+    const imageBlob = await new Promise(resolve => inputCanvas.toBlob(resolve, 'image/jpeg'));
 
     console.log("Sending frame to API");
     const response = await fetch('/api/v1/process-frame', {
         method: 'POST',
         headers: {
-            'Content-Type': 'application/json'
+            'Content-Type': 'image/jpeg',
+            'Accept': 'image/jpeg'
         },
-        body: JSON.stringify({ image: base64Data })
+        body: imageBlob
     });
 
     if (response.ok) {
         console.log("API response OK");
-        const imageBlob = await response.blob();
-        const imageUrl = URL.createObjectURL(imageBlob);
+        const resultBlob = await response.blob();
+        const imageUrl = URL.createObjectURL(resultBlob);
         const image = new Image();
         image.onload = () => {
             console.log("Drawing image to output canvas");
             outputCtx.drawImage(image, 0, 0, outputCanvas.width, outputCanvas.height);
+            URL.revokeObjectURL(imageUrl);
         };
         image.src = imageUrl;
     } else {
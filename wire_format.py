@@ -0,0 +1,203 @@
+"""
+Binary wire format shared by the transform servers (`scipy_dct_server.py`, `numpy_dct_server.py`).
+
+A message is sent with `Content-Type: application/octet-stream` and is laid out as:
+
+    MAGIC (4 bytes) | header length (uint32, little-endian) | JSON header | raw array bytes
+
+The JSON header always carries `dtype` (a NumPy dtype string such as "<f4") and `shape`.
+Any other keys are request/response parameters (e.g. `block_size`). The header is padded
+with spaces so the array payload starts on an 8-byte boundary, which lets the receiver
+wrap it with `np.frombuffer` without copying.
+
+Messages that carry several named arrays (see `encode_arrays`) instead have an `arrays` list
+of `{"name", "dtype", "shape"}` entries in the header, and the payloads follow in that order,
+each padded to an 8-byte boundary.
+"""
+import json
+import struct
+from typing import Callable
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ValidationError
+
+from server_timing import phase, record_size
+
+OCTET_STREAM = "application/octet-stream"
+MAGIC = b"NDAR"
+
+_PREFIX = struct.Struct("<4sI")
+_ALIGNMENT = 8
+
+def _padding(size: int) -> bytes:
+    return b" " * (-size % _ALIGNMENT)
+
+def _payload(array: np.ndarray) -> np.ndarray:
+    if array.dtype.hasobject:
+        raise ValueError(f"Cannot encode arrays of dtype {array.dtype}")
+    return array.reshape(-1).view(np.uint8)
+
+def _pack(header: dict, payloads: list) -> bytes:
+    header = json.dumps(header).encode("utf-8")
+    header += _padding(_PREFIX.size + len(header))
+    return b"".join([_PREFIX.pack(MAGIC, len(header)), header, *payloads])
+
+def encode_array(array: np.ndarray, **meta) -> bytes:
+    """
+    Serializes an array (plus optional parameters) into a single binary message.
+    """
+    array = np.ascontiguousarray(array)
+    return _pack({"dtype": array.dtype.str, "shape": list(array.shape), **meta}, [_payload(array)])
+
+def encode_arrays(arrays: dict[str, np.ndarray], **meta) -> bytes:
+    """
+    Serializes several named arrays (plus optional parameters) into a single binary message.
+    """
+    entries, payloads = [], []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        entries.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape)})
+        payloads += [_payload(array), _padding(array.nbytes)]
+    return _pack({"arrays": entries, **meta}, payloads)
+
+def _unpack_header(buffer: bytes) -> tuple[dict, int]:
+    if len(buffer) < _PREFIX.size:
+        raise ValueError("Binary payload is too short to contain a header")
+    magic, header_len = _PREFIX.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("Binary payload does not start with the expected magic bytes")
+    offset = _PREFIX.size + header_len
+    return json.loads(bytes(buffer[_PREFIX.size:offset])), offset
+
+def _view(buffer: bytes, offset: int, dtype: str, shape: list) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    if dtype.hasobject:
+        raise ValueError(f"Cannot decode arrays of dtype {dtype}")
+    count = int(np.prod(shape, dtype=np.int64))
+    if len(buffer) - offset < count * dtype.itemsize:
+        raise ValueError(f"Binary payload is shorter than its header says (shape {tuple(shape)}, dtype {dtype.str})")
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+def decode_array(buffer: bytes) -> tuple[np.ndarray, dict]:
+    """
+    Parses a binary message. Returns a read-only array that views `buffer` directly,
+    plus a dict of the extra header parameters.
+    """
+    meta, offset = _unpack_header(buffer)
+    if "arrays" in meta:
+        raise ValueError("Expected a single-array payload, got a multi-array one")
+    array = _view(buffer, offset, meta.pop("dtype"), meta.pop("shape"))
+    if len(buffer) - offset != array.nbytes:
+        raise ValueError(f"Binary payload size does not match header (shape {array.shape}, dtype {array.dtype.str})")
+    return array, meta
+
+def decode_arrays(buffer: bytes) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Parses a multi-array message into read-only views keyed by name, plus the extra header parameters.
+    """
+    meta, offset = _unpack_header(buffer)
+    if "arrays" not in meta:
+        raise ValueError("Expected a multi-array payload, got a single-array one")
+    arrays = {}
+    for entry in meta.pop("arrays"):
+        array = _view(buffer, offset, entry["dtype"], entry["shape"])
+        arrays[entry["name"]] = array
+        offset += array.nbytes + len(_padding(array.nbytes))
+    if offset != len(buffer):
+        raise ValueError("Binary payload size does not match header")
+    return arrays, meta
+
+def is_binary(request: Request) -> bool:
+    return request.headers.get("content-type", "").startswith(OCTET_STREAM)
+
+async def read_payload(request: Request, model: type[BaseModel], field: str = "data") -> tuple[np.ndarray, BaseModel, bool]:
+    """
+    Reads a transform request in either wire format.
+
+    JSON bodies are validated against `model` as before. Binary bodies carry the array in
+    the payload and the remaining parameters in the header, which are validated against the
+    same model. Returns `(array, params, binary)`.
+    """
+    body = await request.body()
+    try:
+        with phase("decode"):
+            if is_binary(request):
+                array, meta = decode_array(body)
+                params = model.model_validate({**meta, field: []})
+            else:
+                params = model.model_validate_json(body)
+                array = np.array(getattr(params, field))
+        record_size(array.shape)
+        return array, params, is_binary(request)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def read_arrays_payload(request: Request, model: type[BaseModel], fields: tuple[str, ...] | Callable[[BaseModel], tuple[str, ...]]) -> tuple[dict[str, np.ndarray], BaseModel, bool]:
+    """
+    Like `read_payload`, for requests made of several named arrays. Binary bodies must be
+    multi-array messages containing every name in `fields`.
+
+    When the array names depend on the other parameters, `fields` can be a function of the
+    validated params instead; the model must then declare those array fields as optional.
+    """
+    body = await request.body()
+    try:
+        with phase("decode"):
+            if is_binary(request):
+                arrays, meta = decode_arrays(body)
+                if callable(fields):
+                    params = model.model_validate(meta)
+                    fields = fields(params)
+                else:
+                    params = model.model_validate({**meta, **{field: [] for field in fields}})
+                missing = [field for field in fields if field not in arrays]
+                if missing:
+                    raise ValueError(f"Binary payload is missing arrays: {missing}")
+                arrays = {field: arrays[field] for field in fields}
+            else:
+                params = model.model_validate_json(body)
+                if callable(fields):
+                    fields = fields(params)
+                missing = [field for field in fields if getattr(params, field) is None]
+                if missing:
+                    raise ValueError(f"Request is missing arrays: {missing}")
+                arrays = {field: np.array(getattr(params, field)) for field in fields}
+        # The first array is the main one (e.g. `values`, or the luma plane)
+        record_size(next(iter(arrays.values())).shape)
+        return arrays, params, is_binary(request)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def result_dtype(array: np.ndarray) -> np.dtype:
+    """
+    Binary responses are single precision unless the client sent double precision.
+    """
+    if np.iscomplexobj(array):
+        return np.dtype(np.complex128 if array.dtype == np.complex128 else np.complex64)
+    return np.dtype(np.float64 if array.dtype == np.float64 else np.float32)
+
+def array_response(result: np.ndarray, binary: bool, **meta) -> Response:
+    """
+    Builds the response for a transform result in the same wire format as the request.
+    """
+    with phase("encode"):
+        if binary:
+            return Response(content=encode_array(result, **meta), media_type=OCTET_STREAM)
+        return JSONResponse({"result": result.tolist(), **meta})
+
+def arrays_response(arrays: dict[str, np.ndarray], binary: bool, **meta) -> Response:
+    """
+    Like `array_response`, for results made of several named arrays. JSON responses carry
+    each array under its own key.
+    """
+    with phase("encode"):
+        if binary:
+            return Response(content=encode_arrays(arrays, **meta), media_type=OCTET_STREAM)
+        return JSONResponse({**{name: array.tolist() for name, array in arrays.items()}, **meta})